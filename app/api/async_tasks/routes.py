@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query, Path
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Path, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
+import json
 import logging
 import httpx
 
-from ...schemas.translate import SimpleTextRequest, AsyncTaskRequest
-from ...services.async_task_manager import task_manager, TaskType, TaskStatus
+from ..stream.routes import format_sse
+from ...schemas.translate import SimpleTextRequest, AsyncTaskRequest, SummaryMode, TaskEventsRequest
+from ...services.async_task_manager import task_manager, TaskType, TaskStatus, TASK_FIELDS
 from ...services.callback_registry import callback_registry, create_email_notification_callback
+from ...services.webhook_dispatcher import webhook_dispatcher
 from ...utils.exceptions import (
     EmptyTextError,
     TextTooLongError,
@@ -22,9 +26,24 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/translate/async", tags=["async-tasks"])
 
 
+async def _task_webhooks(success_url: Optional[str], failure_url: Optional[str]) -> Optional[Dict[str, str]]:
+    """校验并组装任务的完成/失败 Webhook（拒绝指向内网等不允许的主机）"""
+    webhooks = {}
+    for kind, url in (("success", success_url), ("failure", failure_url)):
+        if not url:
+            continue
+        try:
+            await webhook_dispatcher.validate_url(url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {kind} webhook url: {e}")
+        webhooks[kind] = url
+    return webhooks or None
+
+
 @router.post("/zh2en")
 async def submit_async_zh2en_task(
     req: AsyncTaskRequest,
+    chunked: Optional[bool] = Query(None, description="是否分块翻译，默认超过阈值的长文本自动分块"),
 ):
     """
     提交异步中译英任务
@@ -60,11 +79,16 @@ async def submit_async_zh2en_task(
 
     task_id = task_manager.create_task(
         task_type=TaskType.ZH2EN,
-        input_data={"text": req.text},
+        input_data={"text": req.text, "chunked": chunked},
         model_name=model_name,
         use_chains=True,
         max_retries=req.config.max_retries if req.config else 3,
-        failure_callback=failure_callback
+        failure_callback=failure_callback,
+        priority=req.priority,
+        webhooks=await _task_webhooks(
+            req.config.success_webhook_url if req.config else None,
+            req.config.failure_webhook_url if req.config else None,
+        ),
     )
 
     logger.info(f"异步中译英任务已提交: task_id={task_id}")
@@ -81,6 +105,10 @@ async def submit_async_zh2en_task(
 @router.post("/en2zh")
 async def submit_async_en2zh_task(
     req: SimpleTextRequest,
+    chunked: Optional[bool] = Query(None, description="是否分块翻译，默认超过阈值的长文本自动分块"),
+    priority: int = Query(0, ge=-10, le=10, description="调度优先级，数值越大越先执行（scheduling 为 priority 时生效）"),
+    success_webhook_url: Optional[str] = Query(None, description="任务完成时推送结果的 Webhook URL"),
+    failure_webhook_url: Optional[str] = Query(None, description="任务最终失败或被取消时推送的 Webhook URL"),
 ):
     """
     提交异步英译中任务
@@ -93,9 +121,11 @@ async def submit_async_en2zh_task(
     model_name = (getattr(req, 'model', None) or "").strip() or None
     task_id = task_manager.create_task(
         task_type=TaskType.EN2ZH,
-        input_data={"text": req.text},
+        input_data={"text": req.text, "chunked": chunked},
         model_name=model_name,
         use_chains=True,
+        priority=priority,
+        webhooks=await _task_webhooks(success_webhook_url, failure_webhook_url),
     )
 
     return {
@@ -111,18 +141,25 @@ async def submit_async_en2zh_task(
 async def submit_async_summarize_task(
     req: SimpleTextRequest,
     max_length: int = Query(200, description="总结最大长度"),
+    mode: Optional[SummaryMode] = Query(None, description="总结模式：single / map_reduce / refine，默认超过阈值的长文本自动 map_reduce"),
+    priority: int = Query(0, ge=-10, le=10, description="调度优先级，数值越大越先执行（scheduling 为 priority 时生效）"),
+    success_webhook_url: Optional[str] = Query(None, description="任务完成时推送结果的 Webhook URL"),
+    failure_webhook_url: Optional[str] = Query(None, description="任务最终失败或被取消时推送的 Webhook URL"),
 ):
     """
     提交异步总结任务
     返回任务ID，客户端可使用此ID轮询结果
     """
+    webhooks = await _task_webhooks(success_webhook_url, failure_webhook_url)
     try:
         model_name = (getattr(req, 'model', None) or "").strip() or None
         task_id = task_manager.create_task(
             task_type=TaskType.SUMMARIZE,
-            input_data={"text": req.text, "max_length": max_length},
+            input_data={"text": req.text, "max_length": max_length, "mode": mode},
             model_name=model_name,
             use_chains=True,
+            priority=priority,
+            webhooks=webhooks,
         )
 
         return {
@@ -133,6 +170,8 @@ async def submit_async_summarize_task(
             "result_url": f"/api/translate/async/result/{task_id}",
         }
 
+    except TranslateAPIException:
+        raise
     except Exception as e:
         logger.error(f"Failed to submit summarize task: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -142,17 +181,24 @@ async def submit_async_summarize_task(
 async def submit_async_keyword_summary_task(
     req: SimpleTextRequest,
     summary_length: int = Query(100, description="总结长度"),
+    mode: Optional[SummaryMode] = Query(None, description="总结模式：single / map_reduce / refine，默认超过阈值的长文本自动 map_reduce"),
+    priority: int = Query(0, ge=-10, le=10, description="调度优先级，数值越大越先执行（scheduling 为 priority 时生效）"),
+    success_webhook_url: Optional[str] = Query(None, description="任务完成时推送结果的 Webhook URL"),
+    failure_webhook_url: Optional[str] = Query(None, description="任务最终失败或被取消时推送的 Webhook URL"),
 ):
     """
     提交异步关键词总结任务
     """
+    webhooks = await _task_webhooks(success_webhook_url, failure_webhook_url)
     try:
         model_name = (getattr(req, 'model', None) or "").strip() or None
         task_id = task_manager.create_task(
             task_type=TaskType.KEYWORD_SUMMARY,
-            input_data={"text": req.text, "summary_length": summary_length},
+            input_data={"text": req.text, "summary_length": summary_length, "mode": mode},
             model_name=model_name,
             use_chains=True,
+            priority=priority,
+            webhooks=webhooks,
         )
 
         return {
@@ -163,6 +209,8 @@ async def submit_async_keyword_summary_task(
             "result_url": f"/api/translate/async/result/{task_id}",
         }
 
+    except TranslateAPIException:
+        raise
     except Exception as e:
         logger.error(f"Failed to submit keyword summary task: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -172,17 +220,24 @@ async def submit_async_keyword_summary_task(
 async def submit_async_structured_summary_task(
     req: SimpleTextRequest,
     max_length: int = Query(300, description="总结最大长度"),
+    mode: Optional[SummaryMode] = Query(None, description="总结模式：single / map_reduce / refine，默认超过阈值的长文本自动 map_reduce"),
+    priority: int = Query(0, ge=-10, le=10, description="调度优先级，数值越大越先执行（scheduling 为 priority 时生效）"),
+    success_webhook_url: Optional[str] = Query(None, description="任务完成时推送结果的 Webhook URL"),
+    failure_webhook_url: Optional[str] = Query(None, description="任务最终失败或被取消时推送的 Webhook URL"),
 ):
     """
     提交异步结构化总结任务
     """
+    webhooks = await _task_webhooks(success_webhook_url, failure_webhook_url)
     try:
         model_name = (getattr(req, 'model', None) or "").strip() or None
         task_id = task_manager.create_task(
             task_type=TaskType.STRUCTURED_SUMMARY,
-            input_data={"text": req.text, "max_length": max_length},
+            input_data={"text": req.text, "max_length": max_length, "mode": mode},
             model_name=model_name,
             use_chains=True,
+            priority=priority,
+            webhooks=webhooks,
         )
 
         return {
@@ -193,6 +248,8 @@ async def submit_async_structured_summary_task(
             "result_url": f"/api/translate/async/result/{task_id}",
         }
 
+    except TranslateAPIException:
+        raise
     except Exception as e:
         logger.error(f"Failed to submit structured summary task: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -213,12 +270,18 @@ async def get_task_status(task_id: str):
 
 
 @router.get("/result/{task_id}")
-async def get_task_result(task_id: str):
+async def get_task_result(
+    task_id: str,
+    wait: float = Query(0, ge=0, le=60, description="长轮询等待秒数：任务未结束时最多等待该时长，结束后立即返回"),
+):
     """
     获取任务结果
-    仅返回已完成任务的结果
+    仅返回已完成任务的结果；指定 wait 时挂起请求直到任务结束或等待超时，替代高频轮询
     """
-    result = task_manager.get_task_result(task_id)
+    if wait > 0:
+        result = await task_manager.wait_for_result(task_id, wait)
+    else:
+        result = task_manager.get_task_result(task_id)
 
     if not result:
         raise TaskNotFoundException(task_id)
@@ -242,11 +305,17 @@ async def cancel_task(task_id: str):
 @router.get("/tasks")
 async def list_tasks(
     status: Optional[str] = Query(None, description="过滤任务状态 (pending, running, completed, failed, expired)"),
-    limit: int = Query(50, description="返回任务数量限制"),
+    task_type: Optional[str] = Query(None, description="过滤任务类型 (zh2en, en2zh, summarize, keyword_summary, structured_summary)"),
+    limit: int = Query(50, ge=1, le=1000, description="每页任务数"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    fields: Optional[str] = Query(
+        None,
+        description="返回字段，逗号分隔（如 task_id,status,result）；all 表示全部字段，默认不含 input_data 与 result",
+    ),
 ):
     """
-    列出所有任务
-    支持按状态过滤
+    列出任务（按创建时间倒序，游标分页）
+    支持按状态、类型过滤与字段投影
     """
     try:
         filter_status = None
@@ -256,13 +325,38 @@ async def list_tasks(
             except ValueError:
                 raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
 
-        tasks = task_manager.list_tasks(status=filter_status)
-
-        if limit > 0:
-            tasks = tasks[:limit]
+        filter_type = None
+        if task_type:
+            try:
+                filter_type = TaskType(task_type.lower())
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid task_type: {task_type}")
+
+        projection = None
+        if fields:
+            projection = [f.strip() for f in fields.split(",") if f.strip()]
+            if projection == ["all"]:
+                projection = list(TASK_FIELDS)
+            unknown = [f for f in projection if f not in TASK_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(unknown)}")
+
+        try:
+            page = task_manager.query_tasks(
+                status=filter_status, task_type=filter_type, limit=limit, cursor=cursor, fields=projection
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        return {"tasks": tasks, "total": len(tasks), "filtered_by": status}
+        return {
+            "tasks": page["tasks"],
+            "total": len(page["tasks"]),
+            "next_cursor": page["next_cursor"],
+            "filtered_by": status,
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to list tasks: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -271,34 +365,176 @@ async def list_tasks(
 @router.get("/stats")
 async def get_async_stats():
     """
-    获取异步任务系统统计信息
+    获取异步任务系统统计信息（计数由任务存储的索引增量维护）
     """
     try:
-        all_tasks = task_manager.list_tasks()
+        counts = task_manager.get_task_counts()
 
-        stats = {
-            "total_tasks": len(all_tasks),
-            "by_status": {},
-            "by_type": {},
+        return {
+            "total_tasks": counts["total"],
+            "by_status": counts["by_status"],
+            "by_type": counts["by_type"],
             "system_info": {
                 "max_concurrent_tasks": task_manager.max_concurrent_tasks,
-                "active_tasks": len([t for t in all_tasks if t["status"] == "running"]),
+                "active_tasks": counts["by_status"].get(TaskStatus.RUNNING.value, 0),
             },
+            "queue": task_manager.get_queue_stats(),
+            "webhooks": webhook_dispatcher.get_stats(),
         }
 
-        for task in all_tasks:
-            st = task["status"]
-            stats["by_status"][st] = stats["by_status"].get(st, 0) + 1
+    except Exception as e:
+        logger.error(f"Failed to get async stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        for task in all_tasks:
-            t = task["task_type"]
-            stats["by_type"][t] = stats["by_type"].get(t, 0) + 1
 
-        return stats
+def _parse_bulk_items(raw: bytes, content_type: str) -> List[Any]:
+    """解析批量提交的请求体：JSON 数组（或 {"items": [...]}），或 NDJSON（每行一个条目）"""
+    text = raw.decode("utf-8")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise ValueError("body must be a JSON array, an object with an items array, or NDJSON")
+    return data
+
+
+def _bulk_input(task_type: TaskType, item: Any, index: int) -> Dict[str, Any]:
+    """把一个条目（字符串或含 text 及可选参数的对象）转换为任务输入，默认值与单条提交接口一致；参数不合法时返回 400 并指明条目下标"""
+    if isinstance(item, str):
+        item = {"text": item}
+    if not isinstance(item, dict) or not isinstance(item.get("text"), str) or not item["text"].strip():
+        raise HTTPException(status_code=400, detail=f"Item {index}: text must be a non-empty string")
+    if task_type in (TaskType.ZH2EN, TaskType.EN2ZH):
+        chunked = item.get("chunked")
+        if chunked is not None and not isinstance(chunked, bool):
+            raise HTTPException(status_code=400, detail=f"Item {index}: chunked must be a boolean")
+        return {"text": item["text"], "chunked": chunked}
+
+    mode = item.get("mode")
+    if mode is not None:
+        try:
+            mode = SummaryMode(mode)
+        except ValueError:
+            allowed = ", ".join(m.value for m in SummaryMode)
+            raise HTTPException(status_code=400, detail=f"Item {index}: mode must be one of {allowed}")
+    if task_type == TaskType.KEYWORD_SUMMARY:
+        length_field, default_length = "summary_length", 100
+    else:
+        length_field, default_length = "max_length", 300 if task_type == TaskType.STRUCTURED_SUMMARY else 200
+    length = item.get(length_field, default_length)
+    # bool 是 int 的子类，需单独排除
+    if isinstance(length, bool) or not isinstance(length, int) or length <= 0:
+        raise HTTPException(status_code=400, detail=f"Item {index}: {length_field} must be a positive integer")
+    return {"text": item["text"], length_field: length, "mode": mode}
+
+
+@router.post("/bulk")
+async def submit_bulk_job(
+    request: Request,
+    task_type: str = Query("zh2en", description="任务类型 (zh2en, en2zh, summarize, keyword_summary, structured_summary)"),
+    model: Optional[str] = Query(None, description="模型名称，默认使用默认模型"),
+    priority: int = Query(0, ge=-10, le=10, description="调度优先级，数值越大越先执行（scheduling 为 priority 时生效）"),
+    max_retries: int = Query(3, ge=0, le=10, description="每个条目的最大重试次数"),
+):
+    """
+    批量提交异步任务（一次请求）
+    请求体为 JSON 数组（条目为字符串或 {"text": ..., 其他参数}），或 Content-Type 为 application/x-ndjson 的逐行条目；
+    返回作业ID与各条目的任务ID（与条目顺序一致）
+    """
+    try:
+        job_type = TaskType(task_type.lower())
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid task_type: {task_type}")
+    try:
+        raw_items = _parse_bulk_items(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bulk body: {e}")
+    if not raw_items:
+        raise HTTPException(status_code=400, detail="No items submitted")
+    if len(raw_items) > task_manager.max_bulk_items:
+        raise HTTPException(status_code=400, detail=f"At most {task_manager.max_bulk_items} items per bulk job")
+    items = [_bulk_input(job_type, item, i) for i, item in enumerate(raw_items)]
+
+    model_name = (model or "").strip() or None
+    job = task_manager.create_bulk_job(
+        job_type, items, model_name=model_name, max_retries=max_retries, priority=priority
+    )
+    return {
+        "job_id": job.job_id,
+        "status": "submitted",
+        "total": len(job.task_ids),
+        "task_ids": job.task_ids,
+        "job_url": f"/api/translate/async/jobs/{job.job_id}",
+    }
 
+
+@router.get("/jobs/{job_id}")
+async def get_bulk_job(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="条目起始位置"),
+    limit: int = Query(100, ge=1, le=1000, description="每页条目数"),
+):
+    """
+    批量作业的汇总进度与分页的条目状态/结果
+    """
+    job = task_manager.get_job(job_id, offset=offset, limit=limit)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+async def _task_event_stream(subscription):
+    """按 SSE 输出订阅的任务事件；无事件时发送心跳，全部任务结束后发送 end 事件"""
+    heartbeat = task_manager.events.heartbeat_seconds
+    try:
+        while not subscription.done:
+            events = await subscription.next_events(heartbeat)
+            if not events:
+                task_manager.refresh_subscription(subscription)
+                yield ": heartbeat\n\n"
+                continue
+            for event in events:
+                yield format_sse(json.dumps(event, ensure_ascii=False, default=str), event=event["event"])
+        yield format_sse("[DONE]", event="end")
     except Exception as e:
-        logger.error(f"Failed to get async stats: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.warning(f"Task event stream closed or failed: {e}")
+    finally:
+        task_manager.events.unsubscribe(subscription)
+
+
+def _subscribe(task_ids: List[str]) -> StreamingResponse:
+    subscription = task_manager.subscribe(task_ids)
+    return StreamingResponse(
+        _task_event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events")
+async def stream_task_events(
+    ids: str = Query(..., description="订阅的任务ID，逗号分隔"),
+):
+    """
+    在一条 SSE 连接上订阅多个任务的状态、进度与完成事件
+    事件类型：status / completed / failed / removed / not_found，全部任务结束后发送 end
+    """
+    task_ids = [i.strip() for i in ids.split(",") if i.strip()]
+    if not task_ids:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(task_ids) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 task ids per subscription")
+    return _subscribe(task_ids)
+
+
+@router.post("/events")
+async def stream_task_events_for(req: TaskEventsRequest):
+    """
+    与 GET /events 相同，任务ID列表放在请求体中（适合 ID 较多、超出 URL 长度的情况）
+    """
+    return _subscribe(req.task_ids)
 
 
 # 便捷别名：直接用 task_id 查询
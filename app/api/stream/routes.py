@@ -4,7 +4,7 @@ from typing import Optional, AsyncGenerator
 import logging
 
 from ...schemas.translate import SimpleTextRequest
-from ...services.langchain_translate import LangChainTranslationService
+from ...services.langchain_translate import LangChainTranslationService, get_shared_translation_service
 from ...services.prompt.templates import (
     TranslationPromptType,
     SummarizationPromptType,
@@ -17,29 +17,35 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/translate/stream", tags=["streaming"])
 
 
+def format_sse(data: str, event: Optional[str] = None) -> str:
+    """编码一条 SSE 消息：可选的 event 行，数据按行拆成 data: 行，以空行结束。"""
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return (f"event: {event}\n" if event else "") + lines + "\n"
+
+
 async def _text_stream(gen: AsyncGenerator[str, None]):
     """将异步文本片段按 SSE 文本流（text/event-stream）输出，带断连保护。"""
     try:
         async for piece in gen:
-            # 简单 SSE 格式：每条消息一行，以 data: 开头
-            yield f"data: {piece}\n\n"
+            yield format_sse(piece)
         # 结束事件（可被前端识别）
-        yield "event: end\ndata: [DONE]\n\n"
+        yield format_sse("[DONE]", event="end")
     except Exception as e:
         # 客户端断开或网络异常
         logger.warning(f"SSE stream closed or failed: {e}")
 
 
-def _service(model: Optional[str]) -> LangChainTranslationService:
-    svc = LangChainTranslationService(model_name=model, use_chains=True)
-    return svc
+def _service() -> LangChainTranslationService:
+    # 共享实例；模型在调用时按参数传入
+    return get_shared_translation_service()
 
 
 @router.post("/zh2en")
 async def stream_zh2en(req: SimpleTextRequest, model: Optional[str] = Query(None)):
     logger.info(f"开始流式中译英: text_length={len(req.text)}, model={model or getattr(req, 'model', None)}")
     try:
-        svc = _service(model or getattr(req, 'model', None))
+        svc = _service()
+        model_name = model or getattr(req, 'model', None)
         # 使用与非流式一致的提示词模板，确保真正执行"中译英"
         prompt = prompt_manager.get_translation_prompt(
             TranslationPromptType.ZH_TO_EN,
@@ -47,7 +53,7 @@ async def stream_zh2en(req: SimpleTextRequest, model: Optional[str] = Query(None
         )
 
         async def gen():
-            async for piece in svc.langchain_manager.generate_text_stream(prompt, model_name=svc.model_name):
+            async for piece in svc.langchain_manager.generate_text_stream(prompt, model_name=model_name):
                 yield piece
 
         return StreamingResponse(_text_stream(gen()), media_type="text/event-stream")
@@ -62,7 +68,8 @@ async def stream_zh2en(req: SimpleTextRequest, model: Optional[str] = Query(None
 @router.post("/en2zh")
 async def stream_en2zh(req: SimpleTextRequest, model: Optional[str] = Query(None)):
     try:
-        svc = _service(model or getattr(req, 'model', None))
+        svc = _service()
+        model_name = model or getattr(req, 'model', None)
         # 使用与非流式一致的提示词模板，确保真正执行“英译中”
         prompt = prompt_manager.get_translation_prompt(
             TranslationPromptType.EN_TO_ZH,
@@ -70,7 +77,7 @@ async def stream_en2zh(req: SimpleTextRequest, model: Optional[str] = Query(None
         )
 
         async def gen():
-            async for piece in svc.langchain_manager.generate_text_stream(prompt, model_name=svc.model_name):
+            async for piece in svc.langchain_manager.generate_text_stream(prompt, model_name=model_name):
                 yield piece
 
         return StreamingResponse(_text_stream(gen()), media_type="text/event-stream")
@@ -86,7 +93,8 @@ async def stream_summarize(
     max_length: int = Query(200),
 ):
     try:
-        svc = _service(model or getattr(req, 'model', None))
+        svc = _service()
+        model_name = model or getattr(req, 'model', None)
         # 与非流式一致的“总结”模板，避免原文回显
         prompt = prompt_manager.get_summarization_prompt(
             SummarizationPromptType.BASIC_SUMMARY,
@@ -95,7 +103,7 @@ async def stream_summarize(
         )
 
         async def gen():
-            async for piece in svc.langchain_manager.generate_text_stream(prompt, model_name=svc.model_name):
+            async for piece in svc.langchain_manager.generate_text_stream(prompt, model_name=model_name):
                 yield piece
 
         return StreamingResponse(_text_stream(gen()), media_type="text/event-stream")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import Optional, List, Dict, Any
 import logging
 from ...schemas.translate import (
@@ -9,16 +9,26 @@ from ...schemas.translate import (
     Feature,
     FeatureListResponse,
     SimpleTextRequest,
+    SummaryMode,
+    BatchTranslateRequest,
+    BatchTranslateResponse,
 )
 from ...services.translate import TranslationService
-from ...services.langchain_translate import LangChainTranslationService
+from ...services.langchain_translate import LangChainTranslationService, get_shared_translation_service
 from ...services.async_task_manager import task_manager, TaskType, TaskStatus
+from ...services.result_cache import result_cache, cache_bypass_requested
 from ...schemas.translate import FeatureCode, Endpoint, HttpMethod, FeatureName, FeatureDescription, ValidatePromptRequest
 
 logger = logging.getLogger(__name__)
 
 
-router = APIRouter(prefix="/api/translate", tags=["translate"])
+async def hedging_scope(request: Request) -> None:
+    """同步翻译接口内的模型调用允许按 hedging 配置发出对冲请求"""
+    from ...services.hedging import enter_route
+    enter_route(request.url.path)
+
+
+router = APIRouter(prefix="/api/translate", tags=["translate"], dependencies=[Depends(hedging_scope)])
 
 
 def get_translation_service(req: TranslateRequest) -> TranslationService:
@@ -37,7 +47,13 @@ def get_simple_translation_service() -> TranslationService:
 
 
 def get_langchain_service() -> LangChainTranslationService:
-    return LangChainTranslationService()
+    # 复用进程级共享实例，避免每个请求重建LLM客户端与链
+    return get_shared_translation_service()
+
+
+def use_result_cache(request: Request) -> bool:
+    # 请求头 X-Cache-Bypass: 1 或 Cache-Control: no-cache 时跳过结果缓存
+    return not cache_bypass_requested(request.headers)
 
 
 #根据参数选择要执行的任务
@@ -45,31 +61,32 @@ def get_langchain_service() -> LangChainTranslationService:
 async def run_translate(
     req: TranslateRequest,
     service: TranslationService = Depends(get_translation_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     logger.info(f"收到翻译请求: task={req.task.value}, text_length={len(req.text)}, model={req.model}")
 
     if req.task == FeatureCode.zh2en:
-        result = await service.zh2en(req.text)
+        result = await service.zh2en(req.text, use_cache=use_cache)
         target_lang = "英文"
         source_lang = "中文"
     elif req.task == FeatureCode.en2zh:
-        result = await service.en2zh(req.text)
+        result = await service.en2zh(req.text, use_cache=use_cache)
         target_lang = "中文"
         source_lang = "英文"
     elif req.task == FeatureCode.auto_translate:
-        result = await service.auto_translate(req.text)
+        result = await service.auto_translate(req.text, use_cache=use_cache)
         target_lang = "自动检测"
         source_lang = "自动检测"
     elif req.task == FeatureCode.keyword_summary:
-        result = await service.keyword_summary(req.text)
+        result = await service.keyword_summary(req.text, use_cache=use_cache)
         target_lang = "关键词总结"
         source_lang = "原文"
     elif req.task == FeatureCode.structured_summary:
-        result = await service.structured_summary(req.text)
+        result = await service.structured_summary(req.text, use_cache=use_cache)
         target_lang = "结构化总结"
         source_lang = "原文"
     else:  # FeatureCode.summarize
-        result = await service.summarize(req.text)
+        result = await service.summarize(req.text, use_cache=use_cache)
         target_lang = "总结"
         source_lang = "原文"
 
@@ -93,6 +110,7 @@ async def list_features() -> FeatureListResponse:
     Feature(code=FeatureCode.auto_translate, name=FeatureName.AUTO_TRANSLATE, description=FeatureDescription.AUTO_TRANSLATE, url=Endpoint.TRANSLATE_AUTO, method=HttpMethod.POST),
     Feature(code=FeatureCode.keyword_summary, name=FeatureName.KEYWORD_SUMMARY, description=FeatureDescription.KEYWORD_SUMMARY, url=Endpoint.TRANSLATE_KEYWORD_SUMMARY, method=HttpMethod.POST),
     Feature(code=FeatureCode.structured_summary, name=FeatureName.STRUCTURED_SUMMARY, description=FeatureDescription.STRUCTURED_SUMMARY, url=Endpoint.TRANSLATE_STRUCTURED_SUMMARY, method=HttpMethod.POST),
+    Feature(code=FeatureCode.batch_translate, name=FeatureName.BATCH_TRANSLATE, description=FeatureDescription.BATCH_TRANSLATE, url=Endpoint.TRANSLATE_BATCH, method=HttpMethod.POST),
 
         # LangChain 功能
     Feature(code=FeatureCode.langchain_translate, name=FeatureName.LC_TRANSLATE, description=FeatureDescription.LC_TRANSLATE, url=Endpoint.LC_TRANSLATE, method=HttpMethod.POST),
@@ -126,15 +144,71 @@ async def list_features() -> FeatureListResponse:
 #可以使用的模型
 @router.get("/models")
 async def list_available_models():
-    """获取可用的AI模型列表"""
+    """获取可用的AI模型列表，以及各路由组后端的实时负载得分"""
     try:
+        from ...services.model_router import model_router
         service = TranslationService()
         models = service.get_available_models()
-        return {"models": models}
+        return {"models": models, "routing": model_router.get_stats()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get models: {str(e)}")
 
 
+@router.get("/models/pool")
+async def get_model_pool_stats():
+    """获取各模型服务的HTTP连接池饱和度"""
+    from ...services.ai_model import ai_model_manager
+    return {"pools": ai_model_manager.get_pool_stats()}
+
+
+@router.get("/models/rate-limits")
+async def get_model_rate_limit_stats():
+    """获取各模型 RPM/TPM 限流器的剩余额度与排队情况"""
+    from ...services.rate_limiter import rate_limiter_registry
+    return {"rate_limits": rate_limiter_registry.get_stats()}
+
+
+@router.get("/models/keys")
+async def get_model_key_pool_stats():
+    """获取各模型 API Key 池的在途请求数、429 次数与冷却状态"""
+    from ...services.key_pool import key_pools
+    return {"key_pools": key_pools.get_stats()}
+
+
+@router.get("/models/concurrency")
+async def get_model_concurrency_stats():
+    """获取各模型后端当前的自适应并发上限、在途与排队请求数"""
+    from ...services.adaptive_concurrency import concurrency_limiters
+    return {"concurrency": concurrency_limiters.get_stats()}
+
+
+@router.get("/models/health")
+async def get_model_health():
+    """获取各模型熔断器状态、滚动错误率与延迟"""
+    from ...services.circuit_breaker import circuit_breakers
+    return {"circuits": circuit_breakers.get_stats()}
+
+
+@router.get("/models/hedging")
+async def get_hedging_stats():
+    """获取对冲请求的发送次数、胜率与各模型的对冲触发延迟"""
+    from ...services.hedging import hedging
+    return hedging.get_stats()
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """获取结果缓存的命中/未命中/淘汰统计"""
+    return result_cache.get_stats()
+
+
+@router.delete("/cache")
+async def clear_result_cache():
+    """清空结果缓存"""
+    result_cache.clear()
+    return {"message": "Result cache cleared"}
+
+
 #获得提示词（翻译，总结，系统提示词）
 @router.get("/prompt-types")
 async def list_prompt_types():
@@ -154,23 +228,21 @@ async def list_prompt_types():
 @router.post("/langchain/translate", response_model=TranslateResponse)
 async def langchain_translate(
     request: TranslateRequest,
-    service: LangChainTranslationService = Depends(get_langchain_service)
+    service: LangChainTranslationService = Depends(get_langchain_service),
+    use_cache: bool = Depends(use_result_cache),
 ):
     """
     使用LangChain框架进行翻译
     支持链式调用和对话上下文管理
     """
     try:
-        if hasattr(service, 'model_name') and request.model:
-            service.model_name = request.model
-        if hasattr(service, 'use_chains'):
-            service.use_chains = True
-            
         result = await service.translate(
             text=request.text,
             target_language=request.target_language,
             source_language=request.source_language,
-            context=request.context
+            context=request.context,
+            model_name=request.model,
+            use_cache=use_cache
         )
         return TranslateResponse(
             translated_text=result,
@@ -186,18 +258,14 @@ async def langchain_translate(
 @router.post("/langchain/zh2en", response_model=TranslateResponse)
 async def langchain_translate_zh2en(
     req: SimpleTextRequest,
-    service: LangChainTranslationService = Depends(get_langchain_service)
+    service: LangChainTranslationService = Depends(get_langchain_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     """
     使用LangChain框架将中文翻译成英文
     """
     try:
-        if hasattr(service, 'model_name') and getattr(req, 'model', None):
-            service.model_name = req.model
-        if hasattr(service, 'use_chains'):
-            service.use_chains = True
-            
-        result = await service.zh2en(req.text)
+        result = await service.zh2en(req.text, model_name=getattr(req, 'model', None), use_cache=use_cache)
         return TranslateResponse(
             result=result, 
             translated_text=result,
@@ -213,18 +281,14 @@ async def langchain_translate_zh2en(
 @router.post("/langchain/en2zh", response_model=TranslateResponse)
 async def langchain_translate_en2zh(
     req: SimpleTextRequest,
-    service: LangChainTranslationService = Depends(get_langchain_service)
+    service: LangChainTranslationService = Depends(get_langchain_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     """
     使用LangChain框架将英文翻译成中文
     """
     try:
-        if hasattr(service, 'model_name') and getattr(req, 'model', None):
-            service.model_name = req.model
-        if hasattr(service, 'use_chains'):
-            service.use_chains = True
-            
-        result = await service.en2zh(req.text)
+        result = await service.en2zh(req.text, model_name=getattr(req, 'model', None), use_cache=use_cache)
         return TranslateResponse(
             result=result, 
             translated_text=result,
@@ -240,22 +304,21 @@ async def langchain_translate_en2zh(
 @router.post("/langchain/summarize", response_model=SummarizeResponse)
 async def langchain_summarize(
     request: SummarizeRequest,
-    service: LangChainTranslationService = Depends(get_langchain_service)
+    service: LangChainTranslationService = Depends(get_langchain_service),
+    use_cache: bool = Depends(use_result_cache),
 ):
     """
     使用LangChain框架进行文本总结
     支持链式调用和上下文管理
     """
     try:
-        if hasattr(service, 'model_name') and request.model:
-            service.model_name = request.model
-        if hasattr(service, 'use_chains'):
-            service.use_chains = True
-            
         result = await service.summarize(
             text=request.text,
             max_length=request.max_length,
-            context=request.context
+            context=request.context,
+            model_name=request.model,
+            use_cache=use_cache,
+            mode=request.mode
         )
         return SummarizeResponse(summary=result)
     except Exception as e:
@@ -325,13 +388,14 @@ async def validate_prompt_type(req: ValidatePromptRequest):
 async def translate_zh2en(
     req: SimpleTextRequest,
     service: TranslationService = Depends(get_simple_translation_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     # 使用查询参数中的模型或请求体中的模型
     actual_model = getattr(req, 'model', None)
     if actual_model:
         service = TranslationService(model_name=actual_model)
     
-    result = await service.zh2en(req.text)
+    result = await service.zh2en(req.text, use_cache=use_cache)
     return TranslateResponse(
         result=result, 
         translated_text=result,
@@ -345,13 +409,14 @@ async def translate_zh2en(
 async def translate_en2zh(
     req: SimpleTextRequest,
     service: TranslationService = Depends(get_simple_translation_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     actual_model = getattr(req, 'model', None)
     logger.info(actual_model)
     if actual_model:
         service = TranslationService(model_name=actual_model)
     
-    result = await service.en2zh(req.text)
+    result = await service.en2zh(req.text, use_cache=use_cache)
     return TranslateResponse(
         result=result, 
         translated_text=result,
@@ -365,13 +430,14 @@ async def translate_en2zh(
 async def auto_translate(
     req: SimpleTextRequest,
     service: TranslationService = Depends(get_simple_translation_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     """自动检测语言并翻译"""
     actual_model = getattr(req, 'model', None)
     if actual_model:
         service = TranslationService(model_name=actual_model)
     
-    result = await service.auto_translate(req.text)
+    result = await service.auto_translate(req.text, use_cache=use_cache)
     return TranslateResponse(
         result=result, 
         translated_text=result,
@@ -385,13 +451,15 @@ async def auto_translate(
 async def translate_summarize(
     req: SimpleTextRequest,
     max_length: int = Query(200, description="总结最大长度"),
+    mode: Optional[SummaryMode] = Query(None, description="总结模式：single / map_reduce / refine，默认超过阈值的长文本自动 map_reduce"),
     service: TranslationService = Depends(get_simple_translation_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     actual_model = getattr(req, 'model', None)
     if actual_model:
         service = TranslationService(model_name=actual_model)
     
-    result = await service.summarize(req.text, max_length=max_length)
+    result = await service.summarize(req.text, max_length=max_length, use_cache=use_cache, mode=mode)
     return TranslateResponse(
         result=result, 
         translated_text=result,
@@ -405,14 +473,16 @@ async def translate_summarize(
 async def keyword_summary(
     req: SimpleTextRequest,
     summary_length: int = Query(100, description="总结长度"),
+    mode: Optional[SummaryMode] = Query(None, description="总结模式：single / map_reduce / refine，默认超过阈值的长文本自动 map_reduce"),
     service: TranslationService = Depends(get_simple_translation_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     """关键词提取总结"""
     actual_model = getattr(req, 'model', None)
     if actual_model:
         service = TranslationService(model_name=actual_model)
     
-    result = await service.keyword_summary(req.text, summary_length=summary_length)
+    result = await service.keyword_summary(req.text, summary_length=summary_length, use_cache=use_cache, mode=mode)
     return TranslateResponse(
         result=result, 
         translated_text=result,
@@ -426,14 +496,16 @@ async def keyword_summary(
 async def structured_summary(
     req: SimpleTextRequest,
     max_length: int = Query(300, description="总结最大长度"),
+    mode: Optional[SummaryMode] = Query(None, description="总结模式：single / map_reduce / refine，默认超过阈值的长文本自动 map_reduce"),
     service: TranslationService = Depends(get_simple_translation_service),
+    use_cache: bool = Depends(use_result_cache),
 ) -> TranslateResponse:
     """结构化总结"""
     actual_model = getattr(req, 'model', None)
     if actual_model:
         service = TranslationService(model_name=actual_model)
     
-    result = await service.structured_summary(req.text, max_length=max_length)
+    result = await service.structured_summary(req.text, max_length=max_length, use_cache=use_cache, mode=mode)
     return TranslateResponse(
         result=result, 
         translated_text=result,
@@ -443,3 +515,23 @@ async def structured_summary(
     )
 
 
+@router.post("/batch", response_model=BatchTranslateResponse)
+async def batch_translate(
+    req: BatchTranslateRequest,
+    use_cache: bool = Depends(use_result_cache),
+) -> BatchTranslateResponse:
+    """批量翻译大量短文本：按 token 预算打包为少量模型调用，结果与输入一一对应"""
+    if req.model:
+        from ...services.ai_model import ai_model_manager
+        available_services = ai_model_manager.get_available_services()
+        if req.model not in available_services:
+            raise HTTPException(status_code=400, detail=f"Model '{req.model}' is not available. Available models: {available_services}")
+
+    logger.info(f"收到批量翻译请求: operation={req.operation.value}, segments={len(req.segments)}, model={req.model}")
+    service = TranslationService(model_name=req.model)
+    result = await service.batch_translate(req.segments, operation=req.operation, use_cache=use_cache)
+    return BatchTranslateResponse(
+        operation=req.operation,
+        model=req.model or "default",
+        **result
+    )
@@ -22,6 +22,15 @@ class Settings(BaseModel):
     log_level: str
     version: str
     ai_model: Optional[Dict[str, Any]] = None
+    cache: Optional[Dict[str, Any]] = None
+    chunking: Optional[Dict[str, Any]] = None
+    batch: Optional[Dict[str, Any]] = None
+    async_tasks: Optional[Dict[str, Any]] = None
+    circuit_breaker: Optional[Dict[str, Any]] = None
+    routing: Optional[Dict[str, Any]] = None
+    hedging: Optional[Dict[str, Any]] = None
+    concurrency: Optional[Dict[str, Any]] = None
+    webhooks: Optional[Dict[str, Any]] = None
 
     # 新增的环境变量配置
     database_url: Optional[str] = None
@@ -137,6 +146,42 @@ class Settings(BaseModel):
                 if 'ai_model' in config_data:
                     env_config['ai_model'] = config_data['ai_model']
 
+                # 结果缓存配置
+                if 'cache' in config_data:
+                    env_config['cache'] = config_data['cache']
+
+                # 长文档分块配置
+                if 'chunking' in config_data:
+                    env_config['chunking'] = config_data['chunking']
+
+                # 批量翻译配置
+                if 'batch' in config_data:
+                    env_config['batch'] = config_data['batch']
+
+                # 异步任务配置
+                if 'async_tasks' in config_data:
+                    env_config['async_tasks'] = config_data['async_tasks']
+
+                # 模型熔断与故障转移配置
+                if 'circuit_breaker' in config_data:
+                    env_config['circuit_breaker'] = config_data['circuit_breaker']
+
+                # 模型路由组配置
+                if 'routing' in config_data:
+                    env_config['routing'] = config_data['routing']
+
+                # 对冲请求配置
+                if 'hedging' in config_data:
+                    env_config['hedging'] = config_data['hedging']
+
+                # 自适应并发控制配置
+                if 'concurrency' in config_data:
+                    env_config['concurrency'] = config_data['concurrency']
+
+                # 任务 Webhook 投递配置
+                if 'webhooks' in config_data:
+                    env_config['webhooks'] = config_data['webhooks']
+
             except Exception as e:
                 logger.error(f"加载配置文件失败: {e}")
 
@@ -189,6 +234,33 @@ class Settings(BaseModel):
             if 'ai_model' in config_data:
                 merged_config['ai_model'] = config_data['ai_model']
 
+            if 'cache' in config_data:
+                merged_config['cache'] = config_data['cache']
+
+            if 'chunking' in config_data:
+                merged_config['chunking'] = config_data['chunking']
+
+            if 'batch' in config_data:
+                merged_config['batch'] = config_data['batch']
+
+            if 'async_tasks' in config_data:
+                merged_config['async_tasks'] = config_data['async_tasks']
+
+            if 'circuit_breaker' in config_data:
+                merged_config['circuit_breaker'] = config_data['circuit_breaker']
+
+            if 'routing' in config_data:
+                merged_config['routing'] = config_data['routing']
+
+            if 'hedging' in config_data:
+                merged_config['hedging'] = config_data['hedging']
+
+            if 'concurrency' in config_data:
+                merged_config['concurrency'] = config_data['concurrency']
+
+            if 'webhooks' in config_data:
+                merged_config['webhooks'] = config_data['webhooks']
+
             return cls(**merged_config)
         except Exception as e:
             logger.error(f"加载配置文件失败: {e}")
@@ -1,10 +1,14 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .api.v1.routes import router as v1_router
 from .api.translate.routes import router as translate_router
 from .api.async_tasks.routes import router as async_router
 from .api.stream.routes import router as stream_router
 from .core.config import settings
+from .services.ai_model import ai_model_manager
+from .services.async_task_manager import task_manager
+from .services.webhook_dispatcher import webhook_dispatcher
 from .utils.error_handlers import register_exception_handlers
 from .utils.logging_config import setup_logging, get_logger
 import uvicorn
@@ -27,7 +31,24 @@ logger.info(f"应用名称: {settings.app_name}")
 logger.info(f"调试模式: {settings.debug}")
 logger.info(f"主机: {settings.host}:{settings.port}")
 
-app = FastAPI(title=settings.app_name, debug=settings.debug)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时打开模型连接池并恢复待处理任务，关闭时释放"""
+    await ai_model_manager.startup()
+    logger.info("AI模型连接池已打开")
+    await task_manager.startup()
+    try:
+        yield
+    finally:
+        await task_manager.shutdown()
+        await webhook_dispatcher.shutdown()
+        await ai_model_manager.shutdown()
+        logger.info("AI模型连接池已关闭")
+
+
+app = FastAPI(title=settings.app_name, debug=settings.debug, lifespan=lifespan)
 
 # 注册全局异常处理器
 register_exception_handlers(app)
@@ -10,6 +10,7 @@ class FeatureCode(str, Enum):
     auto_translate = "auto_translate"
     keyword_summary = "keyword_summary"
     structured_summary = "structured_summary"
+    batch_translate = "batch_translate"
     # LangChain 专用功能
     langchain_translate = "langchain_translate"
     langchain_zh2en = "langchain_zh2en"
@@ -34,6 +35,7 @@ class FeatureName(str, Enum):
     AUTO_TRANSLATE = "自动翻译"
     KEYWORD_SUMMARY = "关键词总结"
     STRUCTURED_SUMMARY = "结构化总结"
+    BATCH_TRANSLATE = "批量翻译"
 
     # LangChain
     LC_TRANSLATE = "LangChain 通用翻译"
@@ -66,6 +68,7 @@ class FeatureDescription(str, Enum):
     AUTO_TRANSLATE = "自动检测语言并翻译"
     KEYWORD_SUMMARY = "提取关键词并总结"
     STRUCTURED_SUMMARY = "按结构化格式总结"
+    BATCH_TRANSLATE = "一次提交大量短文本，打包为少量模型调用翻译"
 
     # LangChain
     LC_TRANSLATE = "LangChain 框架下的通用翻译"
@@ -115,6 +118,7 @@ class Endpoint(str, Enum):
     TRANSLATE_AUTO = "/api/translate/auto"
     TRANSLATE_KEYWORD_SUMMARY = "/api/translate/keyword-summary"
     TRANSLATE_STRUCTURED_SUMMARY = "/api/translate/structured-summary"
+    TRANSLATE_BATCH = "/api/translate/batch"
 
     # LangChain
     LC_TRANSLATE = "/api/translate/langchain/translate"
@@ -170,11 +174,19 @@ class TranslateResponse(BaseModel):
         super().__init__(**data)
 
 
+class SummaryMode(str, Enum):
+    """总结模式"""
+    single = "single"            # 一次调用总结全文
+    map_reduce = "map_reduce"    # 分块并行总结后树形归并
+    refine = "refine"            # 逐块滚动精炼
+
+
 class SummarizeRequest(BaseModel):
     text: str = Field(..., min_length=1)
     max_length: Optional[int] = Field(default=100, description="总结最大长度")
     context: Optional[str] = Field(default=None, description="总结上下文")
     model: Optional[str] = None
+    mode: Optional[SummaryMode] = Field(default=None, description="总结模式，None 表示超过阈值的长文本自动使用 map_reduce")
 
 
 class SummarizeResponse(BaseModel):
@@ -185,6 +197,34 @@ class SummarizeResponse(BaseModel):
 
 
 
+class BatchOperation(str, Enum):
+    """批量翻译支持的操作"""
+    zh2en = "zh2en"
+    en2zh = "en2zh"
+    auto_translate = "auto_translate"
+
+
+class BatchTranslateRequest(BaseModel):
+    segments: List[str] = Field(..., min_length=1, max_length=5000, description="待翻译的短文本列表")
+    operation: BatchOperation = Field(default=BatchOperation.zh2en, description="翻译操作")
+    model: Optional[str] = None
+
+
+class BatchSegmentError(BaseModel):
+    index: int = Field(..., description="失败条目在 segments 中的下标")
+    error: str
+
+
+class BatchTranslateResponse(BaseModel):
+    translations: List[str] = Field(..., description="与 segments 一一对应的译文")
+    operation: BatchOperation
+    model: Optional[str] = None
+    packs: int = Field(default=0, description="实际发送的打包请求数")
+    cached: int = Field(default=0, description="命中缓存的条目数")
+    fallbacks: int = Field(default=0, description="拆分失败后单独重译的条目数")
+    errors: List[BatchSegmentError] = Field(default_factory=list, description="单独重译仍失败的条目（对应译文为空）")
+
+
 class FeatureListResponse(BaseModel):
     features: List[Feature]
 
@@ -206,6 +246,13 @@ class AsyncTaskConfig(BaseModel):
     save_failure_details: Optional[bool] = Field(default=True, description="是否保存失败详情到文件")
     notification_email: Optional[str] = Field(default=None, description="失败通知邮箱")
     custom_callback_name: Optional[str] = Field(default=None, description="自定义回调函数名称")
+    success_webhook_url: Optional[str] = Field(default=None, description="任务完成时推送结果的 Webhook URL")
+    failure_webhook_url: Optional[str] = Field(default=None, description="任务最终失败或被取消时推送的 Webhook URL")
+
+
+class TaskEventsRequest(BaseModel):
+    """多任务事件订阅请求"""
+    task_ids: List[str] = Field(..., min_length=1, max_length=1000, description="订阅的任务ID列表")
 
 
 class AsyncTaskRequest(BaseModel):
@@ -213,5 +260,6 @@ class AsyncTaskRequest(BaseModel):
     text: str = Field(..., min_length=1)
     model: Optional[str] = None
     config: Optional[AsyncTaskConfig] = Field(default_factory=AsyncTaskConfig)
+    priority: int = Field(default=0, ge=-10, le=10, description="调度优先级，数值越大越先执行（scheduling 为 priority 时生效）")
 
 
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按后端的自适应并发控制（AIMD）
+每个模型后端维护一个在途请求上限：延迟平稳且上限被用满时加性增大（约每个往返 +1），
+遇到 429、5xx、超时或延迟明显升高时乘性减小。同步、流式与异步任务的模型调用共用
+同一个上限，超出上限的调用按到达顺序排队等待。
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 调用结果分类
+SUCCESS = "success"
+OVERLOAD = "overload"    # 429 / 5xx / 超时：后端过载，收缩上限
+IGNORED = "ignored"      # 参数错误、取消等与后端负载无关的结果，不调整上限
+
+_DEFAULTS: Dict[str, Any] = {
+    "enabled": False,
+    "initial_limit": 4,
+    "min_limit": 1,
+    "max_limit": 64,
+    "backoff_ratio": 0.5,
+    "latency_tolerance": 2.0,
+    "ewma_alpha": 0.2,
+    "window_size": 100,
+    "min_samples": 10,
+}
+
+
+def get_concurrency_config(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """合并默认值、全局 concurrency 配置与模型级覆盖"""
+    config = dict(_DEFAULTS)
+    config.update(getattr(settings, "concurrency", None) or {})
+    config.update(overrides or {})
+    return config
+
+
+def classify_status(status_code: Optional[int]) -> str:
+    """按 HTTP 状态码分类调用结果"""
+    if status_code is None:
+        return IGNORED
+    if status_code == 429 or status_code >= 500:
+        return OVERLOAD
+    return SUCCESS if status_code < 400 else IGNORED
+
+
+def classify_error(error: BaseException) -> str:
+    """按异常分类调用结果：限流、服务端错误、超时与连接失败视为过载"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return classify_status(int(status))
+    name = type(error).__name__
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in name or name in (
+        "RateLimitError", "APIConnectionError", "ConnectError", "NetworkError",
+    ):
+        return OVERLOAD
+    return IGNORED
+
+
+class Permit:
+    """一次调用占用的并发名额（异步上下文管理器）
+
+    正常退出按成功计；抛出异常时按 classify_error 分类；调用方可用 record 显式指定结果
+    （例如 HTTP 调用按响应状态码）。tokens 用于把延迟折算为每 token 耗时，避免长文本被误判为延迟尖峰。
+    """
+
+    def __init__(self, limiter: Optional["AdaptiveConcurrencyLimiter"], tokens: int = 0):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.outcome: Optional[str] = None
+        self._started = 0.0
+        self._generation = 0
+        self._in_flight = 0
+
+    def record(self, outcome: str) -> None:
+        self.outcome = outcome
+
+    async def __aenter__(self) -> "Permit":
+        if self.limiter is not None:
+            self._in_flight, self._generation = await self.limiter.acquire()
+        self._started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self.limiter is None:
+            return
+        outcome = self.outcome
+        if outcome is None:
+            if exc is None:
+                outcome = SUCCESS
+            elif isinstance(exc, asyncio.CancelledError):
+                outcome = IGNORED
+            else:
+                outcome = classify_error(exc)
+        self.limiter.release(
+            outcome, time.monotonic() - self._started, self.tokens, self._in_flight, self._generation
+        )
+
+
+class AdaptiveConcurrencyLimiter:
+    """单个后端的 AIMD 并发上限"""
+
+    # 延迟按每 token 折算时的最小 token 数，避免极短请求的噪声
+    LATENCY_TOKEN_FLOOR = 100
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+        ewma_alpha: float = 0.2,
+        window_size: int = 100,
+        min_samples: int = 10,
+    ):
+        self.name = name
+        self.min_limit = max(1.0, float(min_limit))
+        self.max_limit = max(self.min_limit, float(max_limit))
+        self.limit = min(self.max_limit, max(self.min_limit, float(initial_limit)))
+        self.backoff_ratio = float(backoff_ratio)
+        self.latency_tolerance = float(latency_tolerance)
+        self.ewma_alpha = float(ewma_alpha)
+        self.min_samples = int(min_samples)
+
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # 已由 _wake 转交名额、但等待者尚未取走的 future（结果经 call_soon_threadsafe 异步设置）
+        self._granted: Set[asyncio.Future] = set()
+        # 每次收缩后代数加一；收缩前发出的请求不再触发收缩，一次过载只收缩一次
+        self._generation = 0
+        self._samples: Deque[float] = deque(maxlen=int(window_size))
+        self._ewma: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "queued": 0, "increases": 0, "decreases": 0, "overloads": 0}
+        self._peak_limit = self.limit
+
+    @property
+    def current_limit(self) -> int:
+        return max(1, int(self.limit))
+
+    def _grant(self) -> bool:
+        if self._in_flight < self.current_limit:
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+            return True
+        return False
+
+    async def acquire(self):
+        """占用一个名额，已满时排队；返回 (占用时的在途数, 当前代数)"""
+        with self._lock:
+            if not self._waiters and self._grant():
+                return self._in_flight, self._generation
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            self._stats["queued"] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._granted:
+                    # 名额已转交（结果可能尚未设置）但调用方放弃，归还给下一个等待者
+                    self._granted.discard(future)
+                    self._in_flight = max(0, self._in_flight - 1)
+                    self._wake()
+                elif future in self._waiters:
+                    self._waiters.remove(future)
+            raise
+        with self._lock:
+            self._granted.discard(future)
+        return self._in_flight, self._generation
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.current_limit:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            try:
+                future.get_loop().call_soon_threadsafe(self._resolve, future)
+            except RuntimeError:
+                # 等待者所在的事件循环已关闭
+                continue
+            self._granted.add(future)
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+
+    @staticmethod
+    def _resolve(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    def _baseline(self) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        return min(self._samples)
+
+    def release(self, outcome: str, latency: float, tokens: int = 0, in_flight: int = 0, generation: int = 0) -> None:
+        """归还名额，并按调用结果调整上限"""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if outcome == OVERLOAD:
+                self._stats["overloads"] += 1
+                self._decrease(generation, "overload")
+            elif outcome == SUCCESS:
+                self._on_success(latency, tokens, in_flight, generation)
+            self._wake()
+
+    def _on_success(self, latency: float, tokens: int, in_flight: int, generation: int) -> None:
+        sample = latency / max(tokens, self.LATENCY_TOKEN_FLOOR) if tokens else latency
+        self._samples.append(sample)
+        self._ewma = sample if self._ewma is None else self._ewma + self.ewma_alpha * (sample - self._ewma)
+        baseline = self._baseline()
+        if baseline is not None and self._ewma > baseline * self.latency_tolerance:
+            self._decrease(generation, "latency")
+            return
+        # 只有上限被用满时才增大，避免空闲时上限无限增长
+        if in_flight >= self.current_limit and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._peak_limit = max(self._peak_limit, self.limit)
+            self._stats["increases"] += 1
+
+    def _decrease(self, generation: int, reason: str) -> None:
+        if generation != self._generation:
+            return
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        self._generation += 1
+        self._stats["decreases"] += 1
+        if self._ewma is not None and self._samples:
+            # 收缩后以基线重新估计，避免同一次尖峰连续触发
+            self._ewma = min(self._samples)
+        logger.info(f"Concurrency[{self.name}]: {reason}, limit {previous:.1f} -> {self.limit:.1f}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            baseline = self._baseline()
+            return {
+                "limit": self.current_limit,
+                "limit_exact": round(self.limit, 3),
+                "peak_limit": round(self._peak_limit, 3),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "in_flight": self._in_flight,
+                "waiting": sum(1 for f in self._waiters if not f.done()),
+                **self._stats,
+                "latency_ewma": round(self._ewma, 6) if self._ewma is not None else None,
+                "latency_baseline": round(baseline, 6) if baseline is not None else None,
+            }
+
+
+class ConcurrencyLimiterRegistry:
+    """按后端（模型名）登记的并发限制器"""
+
+    def __init__(self):
+        self._limiters: Dict[str, Optional[AdaptiveConcurrencyLimiter]] = {}
+        self._lock = threading.Lock()
+
+    def for_config(self, config: Dict[str, Any]) -> Optional[AdaptiveConcurrencyLimiter]:
+        """取模型配置对应的限制器；模型配置中的 concurrency 字段可覆盖全局参数，enabled 为 false 时返回 None"""
+        name = config.get("name") or config.get("model") or "default"
+        with self._lock:
+            if name not in self._limiters:
+                options = get_concurrency_config(config.get("concurrency"))
+                limiter = None
+                if options.pop("enabled"):
+                    limiter = AdaptiveConcurrencyLimiter(name, **{k: options[k] for k in _DEFAULTS if k in options})
+                self._limiters[name] = limiter
+            return self._limiters[name]
+
+    def permit(self, config: Dict[str, Any], tokens: int = 0) -> Permit:
+        """为一次调用创建并发名额"""
+        return Permit(self.for_config(config), tokens)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.get_stats() for name, limiter in list(self._limiters.items()) if limiter is not None}
+
+
+# 全局并发限制器登记表（AIModelManager 与 LangChain 共用）
+concurrency_limiters = ConcurrencyLimiterRegistry()
@@ -8,6 +8,13 @@ import logging
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
 from ..core.config import settings
+from .rate_limiter import rate_limiter_registry, estimate_request_tokens, extract_usage
+from .circuit_breaker import circuit_breakers, call_with_failover
+from .model_router import model_router
+from .hedging import hedging
+from .chunking import estimate_tokens
+from .key_pool import key_pools, normalize_model_config, retry_after_seconds
+from .adaptive_concurrency import concurrency_limiters, classify_status
 from ..utils.exceptions import (
     AuthenticationError,
     ModelAPIError,
@@ -21,11 +28,121 @@ logger = logging.getLogger(__name__)
 
 
 class AIModelBase(ABC):
-    """AI模型服务基类"""
-    
+    """AI模型服务基类
+
+    每个服务实例持有一个长连接复用的 httpx.AsyncClient，连接池上限可通过
+    模型配置中的 pool 字段覆盖（max_connections / max_keepalive_connections / keepalive_expiry）。
+    """
+
+    # 各厂商默认连接池参数，子类按需覆盖
+    DEFAULT_POOL_LIMITS: Dict[str, Any] = {
+        "max_connections": 20,
+        "max_keepalive_connections": 10,
+        "keepalive_expiry": 30.0,
+    }
+
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-    
+        self.name = config.get("name") or config.get("model") or type(self).__name__
+        self.timeout = config.get("timeout", 30)
+        self._client: Optional[httpx.AsyncClient] = None
+        # 连接池使用情况统计
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_requests = 0
+        self._saturated_requests = 0
+
+    def _pool_limits(self) -> httpx.Limits:
+        """合并默认值与配置，生成连接池限制"""
+        pool_cfg = {**self.DEFAULT_POOL_LIMITS, **(self.config.get("pool") or {})}
+        return httpx.Limits(
+            max_connections=pool_cfg["max_connections"],
+            max_keepalive_connections=pool_cfg["max_keepalive_connections"],
+            keepalive_expiry=pool_cfg["keepalive_expiry"],
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取共享客户端；未经 startup 打开时按需懒加载"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self._pool_limits())
+        return self._client
+
+    async def startup(self) -> None:
+        """打开连接池（由应用 lifespan 调用）"""
+        _ = self.client
+        logger.info(f"{self.name}: HTTP connection pool opened ({self._pool_limits()})")
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info(f"{self.name}: HTTP connection pool closed")
+        self._client = None
+
+    def _estimate_payload_tokens(self, payload: Dict[str, Any]) -> int:
+        """估算请求体的 token 数（提示词 + 预计输出）"""
+        messages = payload.get("messages") or (payload.get("input") or {}).get("messages") or []
+        prompt = payload.get("prompt") or "\n".join(str(m.get("content", "")) for m in messages)
+        max_tokens = payload.get("max_tokens") or (payload.get("parameters") or {}).get("max_tokens")
+        return estimate_request_tokens(prompt, max_tokens)
+
+    def _auth_headers(self, api_key: Optional[str]) -> Dict[str, str]:
+        """认证请求头（默认 Bearer Token，子类按厂商覆盖）"""
+        return {"Authorization": f"Bearer {api_key}"}
+
+    def _slot_request(self, slot, url: str, kwargs: Dict[str, Any]) -> str:
+        """按 Key 池选中的组合重建认证请求头并替换接入地址"""
+        api_key = getattr(self, "api_key", None)
+        if slot.api_key and api_key and slot.api_key != api_key:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **self._auth_headers(slot.api_key)}
+        base_url = getattr(self, "base_url", None) or getattr(self, "endpoint", None)
+        if slot.base_url and base_url and slot.base_url != base_url and url.startswith(base_url):
+            url = slot.base_url.rstrip("/") + url[len(base_url.rstrip("/")):]
+        return url
+
+    async def _post(self, url: str, **kwargs) -> httpx.Response:
+        """通过共享连接池发送 POST 请求（受所选 Key 的 RPM/TPM 限流与该后端的自适应并发上限约束），并记录池占用情况"""
+        pool = key_pools.for_config(self.config)
+        estimated_tokens = self._estimate_payload_tokens(kwargs.get("json") or {})
+        with pool.use() as slot:
+            url = self._slot_request(slot, url, kwargs)
+            lease = rate_limiter_registry.lease(slot.limiter_config, estimated_tokens)
+            async with lease, concurrency_limiters.permit(self.config, estimated_tokens) as permit:
+                max_connections = self._pool_limits().max_connections
+                if max_connections is not None and self._in_flight >= max_connections:
+                    self._saturated_requests += 1
+                self._in_flight += 1
+                self._total_requests += 1
+                self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+                try:
+                    response = await self.client.post(url, **kwargs)
+                finally:
+                    self._in_flight -= 1
+                permit.record(classify_status(response.status_code))
+                if response.status_code == 429:
+                    pool.cool_down(slot, retry_after_seconds(response))
+                elif response.is_success:
+                    try:
+                        lease.record_usage(extract_usage(response.json()))
+                    except ValueError:
+                        pass
+                return response
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """连接池饱和度指标"""
+        max_connections = self._pool_limits().max_connections
+        return {
+            "provider": type(self).__name__,
+            "max_connections": max_connections,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "saturation": round(self._in_flight / max_connections, 4) if max_connections else 0.0,
+            "total_requests": self._total_requests,
+            "saturated_requests": self._saturated_requests,
+            "pool_open": self._client is not None and not self._client.is_closed,
+        }
+
     @abstractmethod
     async def chat_completion(
         self, 
@@ -44,6 +161,12 @@ class AIModelBase(ABC):
 class OpenAIService(AIModelBase):
     """OpenAI模型服务"""
     
+    DEFAULT_POOL_LIMITS = {
+        "max_connections": 50,
+        "max_keepalive_connections": 20,
+        "keepalive_expiry": 30.0,
+    }
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.base_url = config.get("base_url", "https://api.openai.com/v1")
@@ -63,7 +186,7 @@ class OpenAIService(AIModelBase):
             raise AuthenticationError("OpenAI API key not configured", model_name=self.model)
         
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
+            **self._auth_headers(self.api_key),
             "Content-Type": "application/json"
         }
         
@@ -75,16 +198,15 @@ class OpenAIService(AIModelBase):
         }
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"OpenAI chat_completion请求成功: status={response.status_code}")
-                return result["choices"][0]["message"]["content"]
+            response = await self._post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=data
+            )
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"OpenAI chat_completion请求成功: status={response.status_code}")
+            return result["choices"][0]["message"]["content"]
         except httpx.TimeoutException as e:
             logger.error(f"OpenAI API timeout: {e}")
             raise CustomTimeoutError(f"Request to OpenAI timed out after {self.timeout}s", self.timeout)
@@ -92,7 +214,9 @@ class OpenAIService(AIModelBase):
             if e.response.status_code == 401:
                 raise AuthenticationError("Invalid OpenAI API key", model_name=self.model)
             elif e.response.status_code == 429:
-                raise RateLimitError("OpenAI rate limit exceeded", model_name=self.model)
+                raise RateLimitError(
+                    "OpenAI rate limit exceeded", model_name=self.model, retry_after=retry_after_seconds(e.response)
+                )
             else:
                 logger.error(f"OpenAI API error: {e.response.status_code} - {e.response.text}")
                 raise ModelAPIError(f"OpenAI API error: {e.response.status_code}", self.model, e)
@@ -125,7 +249,7 @@ class ZhipuAIService(AIModelBase):
     ) -> str:
         """智谱AI聊天补全"""
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
+            **self._auth_headers(self.api_key),
             "Content-Type": "application/json"
         }
         
@@ -136,15 +260,14 @@ class ZhipuAIService(AIModelBase):
             "max_tokens": kwargs.get("max_tokens", self.config.get("max_tokens", 2000))
         }
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                "https://open.bigmodel.cn/api/paas/v4/chat/completions",
-                headers=headers,
-                json=data
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+        response = await self._post(
+            "https://open.bigmodel.cn/api/paas/v4/chat/completions",
+            headers=headers,
+            json=data
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
     
     async def text_completion(self, prompt: str, **kwargs) -> str:
         """文本补全（通过聊天接口实现）"""
@@ -155,6 +278,13 @@ class ZhipuAIService(AIModelBase):
 class OllamaService(AIModelBase):
     """Ollama本地模型服务"""
     
+    # 本地推理并发能力有限，连接数保持较小
+    DEFAULT_POOL_LIMITS = {
+        "max_connections": 4,
+        "max_keepalive_connections": 4,
+        "keepalive_expiry": 60.0,
+    }
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.base_url = config.get("base_url", "http://localhost:11434")
@@ -182,14 +312,13 @@ class OllamaService(AIModelBase):
             }
         }
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/api/generate",
-                json=data
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["response"]
+        response = await self._post(
+            f"{self.base_url}/api/generate",
+            json=data
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["response"]
     
     def _messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """将消息列表转换为单个prompt"""
@@ -210,6 +339,12 @@ class OllamaService(AIModelBase):
 class AzureOpenAIService(AIModelBase):
     """Azure OpenAI模型服务"""
     
+    DEFAULT_POOL_LIMITS = {
+        "max_connections": 50,
+        "max_keepalive_connections": 20,
+        "keepalive_expiry": 30.0,
+    }
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.endpoint = config.get("endpoint")
@@ -217,6 +352,9 @@ class AzureOpenAIService(AIModelBase):
         self.api_version = config.get("api_version", "2024-02-01")
         self.deployment_name = config.get("deployment_name")
         self.timeout = config.get("timeout", 30)
+
+    def _auth_headers(self, api_key: Optional[str]) -> Dict[str, str]:
+        return {"api-key": api_key}
     
     async def chat_completion(
         self, 
@@ -225,7 +363,7 @@ class AzureOpenAIService(AIModelBase):
     ) -> str:
         """Azure OpenAI聊天补全"""
         headers = {
-            "api-key": self.api_key,
+            **self._auth_headers(self.api_key),
             "Content-Type": "application/json"
         }
         
@@ -238,16 +376,15 @@ class AzureOpenAIService(AIModelBase):
         url = f"{self.endpoint}/openai/deployments/{self.deployment_name}/chat/completions"
         params = {"api-version": self.api_version}
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=data,
-                params=params
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+        response = await self._post(
+            url,
+            headers=headers,
+            json=data,
+            params=params
+        )
+        response.raise_for_status()
+        result = response.json()
+        return result["choices"][0]["message"]["content"]
     
     async def text_completion(self, prompt: str, **kwargs) -> str:
         """文本补全（通过聊天接口实现）"""
@@ -258,6 +395,12 @@ class AzureOpenAIService(AIModelBase):
 class DashScopeService(AIModelBase):
     """阿里云DashScope模型服务（通义千问）"""
     
+    DEFAULT_POOL_LIMITS = {
+        "max_connections": 50,
+        "max_keepalive_connections": 20,
+        "keepalive_expiry": 30.0,
+    }
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.api_key = config.get("api_key")
@@ -276,54 +419,53 @@ class DashScopeService(AIModelBase):
         - 原生 DashScope 接口：/services/aigc/text-generation/generation
         """
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
+            **self._auth_headers(self.api_key),
             "Content-Type": "application/json"
         }
 
         # 判断是否为兼容模式
         is_compatible_mode = "compatible-mode" in (self.base_url or "")
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            if is_compatible_mode:
-                # OpenAI 兼容模式
-                data = {
-                    "model": self.model,
-                    "messages": messages,
+        if is_compatible_mode:
+            # OpenAI 兼容模式
+            data = {
+                "model": self.model,
+                "messages": messages,
+                "temperature": kwargs.get("temperature", self.config.get("temperature", 0.3)),
+                "max_tokens": kwargs.get("max_tokens", self.config.get("max_tokens", 2000))
+            }
+            response = await self._post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=data
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+        else:
+            # 原生 DashScope 接口
+            data = {
+                "model": self.model,
+                "input": {
+                    "messages": messages
+                },
+                "parameters": {
                     "temperature": kwargs.get("temperature", self.config.get("temperature", 0.3)),
                     "max_tokens": kwargs.get("max_tokens", self.config.get("max_tokens", 2000))
                 }
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
+            }
+            response = await self._post(
+                f"{self.base_url}/services/aigc/text-generation/generation",
+                headers=headers,
+                json=data
+            )
+            response.raise_for_status()
+            result = response.json()
+            # DashScope 原生响应格式
+            if "output" in result and "text" in result["output"]:
+                return result["output"]["text"]
             else:
-                # 原生 DashScope 接口
-                data = {
-                    "model": self.model,
-                    "input": {
-                        "messages": messages
-                    },
-                    "parameters": {
-                        "temperature": kwargs.get("temperature", self.config.get("temperature", 0.3)),
-                        "max_tokens": kwargs.get("max_tokens", self.config.get("max_tokens", 2000))
-                    }
-                }
-                response = await client.post(
-                    f"{self.base_url}/services/aigc/text-generation/generation",
-                    headers=headers,
-                    json=data
-                )
-                response.raise_for_status()
-                result = response.json()
-                # DashScope 原生响应格式
-                if "output" in result and "text" in result["output"]:
-                    return result["output"]["text"]
-                else:
-                    raise ValueError(f"Unexpected response format: {result}")
+                raise ValueError(f"Unexpected response format: {result}")
     
     async def text_completion(self, prompt: str, **kwargs) -> str:
         """文本补全（通过聊天接口实现）"""
@@ -349,7 +491,8 @@ class AIModelFactory:
             raise ValueError(f"Unsupported model type: {model_type}")
         
         service_class = cls._services[model_type]
-        return service_class(config)
+        # api_keys / base_urls 声明的 Key 池以首个值作为默认 Key 与地址
+        return service_class(normalize_model_config(config))
     
     @classmethod
     def get_available_services(cls) -> List[str]:
@@ -417,20 +560,61 @@ class AIModelManager:
 
         logger.info("最终可用模型：%s", list(self._services.keys()))
     
-    def get_service(self, service_name: Optional[str] = None) -> AIModelBase:
-        """获取AI服务实例"""
+    def resolve_service_name(self, service_name: Optional[str] = None) -> Optional[str]:
+        """解析实际使用的服务名（未指定或不可用时回退到默认/首个服务；路由组返回逻辑模型名）"""
         # 优先使用传入的 service_name
         name = service_name or self._default_service
+        if name not in self._services and model_router.is_group(name):
+            return name
         # 若默认未配置或不可用，回退到首个可用服务
         if not name or name not in self._services:
             name = next(iter(self._services.keys()), None)
-        if not name:
+        return name
+
+    def failover_candidates(self, service_name: Optional[str] = None) -> List[str]:
+        """调用候选服务：解析出的服务（路由组则为按负载排序的后端）在前，其余按配置顺序作为故障转移备选"""
+        return model_router.candidates(
+            self.resolve_service_name(service_name), list(self._services.keys()), circuit_breakers.is_available
+        )
+
+    def get_service(self, service_name: Optional[str] = None) -> AIModelBase:
+        """获取AI服务实例（跳过已熔断的服务；全部熔断时仍返回首选服务）"""
+        candidates = self.failover_candidates(service_name)
+        if not candidates:
             raise ValueError("No AI services initialized")
+        name = next((n for n in candidates if circuit_breakers.is_available(n)), candidates[0])
+        return self._service_for(name)
+
+    def _service_for(self, name: str) -> AIModelBase:
+        """按服务名取实例（不做健康检查）"""
         return self._services[name]
     
     def get_available_services(self) -> List[str]:
-        """获取可用的服务列表"""
-        return list(self._services.keys())
+        """获取可用的服务列表（含路由组逻辑模型名）"""
+        return list(self._services.keys()) + [g for g in model_router.groups if g not in self._services]
+
+    async def startup(self) -> None:
+        """为所有服务打开连接池"""
+        for service in self._services.values():
+            if isinstance(service, AIModelBase):
+                await service.startup()
+
+    async def shutdown(self) -> None:
+        """关闭所有服务的连接池"""
+        for name, service in self._services.items():
+            if isinstance(service, AIModelBase):
+                try:
+                    await service.aclose()
+                except Exception as e:
+                    logger.error("Failed to close connection pool for %s: %s", name, e)
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各服务的连接池饱和度指标"""
+        return {
+            name: service.get_pool_stats()
+            for name, service in self._services.items()
+            if isinstance(service, AIModelBase)
+        }
     
     async def chat_completion(
         self, 
@@ -438,9 +622,14 @@ class AIModelManager:
         service_name: Optional[str] = None,
         **kwargs
     ) -> str:
-        """聊天补全（使用指定服务或默认服务）"""
-        service = self.get_service(service_name)
-        return await service.chat_completion(messages, **kwargs)
+        """聊天补全（使用指定服务或默认服务，熔断或失败时转移到下一个服务）"""
+        candidates = self.failover_candidates(service_name)
+        if not candidates:
+            raise ValueError("No AI services initialized")
+        return await call_with_failover(
+            candidates,
+            lambda name: model_router.measure(name, lambda: self._service_for(name).chat_completion(messages, **kwargs)),
+        )
     
     async def text_completion(
         self, 
@@ -448,9 +637,19 @@ class AIModelManager:
         service_name: Optional[str] = None,
         **kwargs
     ) -> str:
-        """文本补全（使用指定服务或默认服务）"""
-        service = self.get_service(service_name)
-        return await service.text_completion(prompt, **kwargs)
+        """文本补全（使用指定服务或默认服务，熔断或失败时转移到下一个服务，慢请求按策略对冲）"""
+        candidates = self.failover_candidates(service_name)
+        if not candidates:
+            raise ValueError("No AI services initialized")
+
+        def invoke(name: str):
+            return model_router.measure(name, lambda: self._service_for(name).text_completion(prompt, **kwargs))
+
+        return await hedging.run(
+            candidates,
+            lambda names: call_with_failover(names, invoke),
+            prompt_tokens=estimate_tokens(prompt),
+        )
 
 
 # 全局AI模型管理器实例
@@ -5,16 +5,23 @@
 用于处理长时间运行的翻译和总结任务
 """
 import asyncio
+import heapq
+import math
+import random
+import sys
 import uuid
 import time
 import logging
-from typing import Dict, Any, Optional, Union, List, Callable, Awaitable
+import zlib
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Union, List, Callable, Awaitable, Tuple
 from enum import Enum
-from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import json
 import traceback
 
+from .task_events import TaskEventHub, TaskSubscription
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,44 +43,293 @@ class TaskType(str, Enum):
     STRUCTURED_SUMMARY = "structured_summary"
 
 
-@dataclass
+# 任务列表可投影的字段；默认不含输入与结果正文
+TASK_FIELDS = (
+    "task_id", "task_type", "status", "created_at", "updated_at", "input_data", "result",
+    "error_message", "progress", "model_name", "use_chains", "retry_count", "max_retries", "priority",
+)
+DEFAULT_LIST_FIELDS = tuple(f for f in TASK_FIELDS if f not in ("input_data", "result"))
+
+
+def _pack_body(value: Any, threshold: int) -> Any:
+    """超过阈值（UTF-8 字节数）的正文以 zlib 压缩后的 bytes 保存；输入为字典时先序列化为 JSON"""
+    if value is None:
+        return None
+    raw = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    encoded = raw.encode("utf-8")
+    if len(encoded) <= threshold:
+        return value
+    packed = zlib.compress(encoded, 6)
+    return packed if len(packed) < len(encoded) else value
+
+
+def _unpack_body(value: Any, as_json: bool) -> Any:
+    if not isinstance(value, bytes):
+        return value
+    raw = zlib.decompress(value).decode("utf-8")
+    return json.loads(raw) if as_json else raw
+
+
 class TaskInfo:
-    """任务信息"""
-    task_id: str
-    task_type: TaskType
-    status: TaskStatus
-    created_at: datetime
-    updated_at: datetime
-    input_data: Dict[str, Any]
-    result: Optional[str] = None
-    error_message: Optional[str] = None
-    progress: int = 0  # 进度百分比 0-100
-    model_name: Optional[str] = None
-    use_chains: bool = True
-    retry_count: int = 0  # 重试次数，失败了还可以设置重试
-    max_retries: int = 3  # 最大重试次数
-    failure_callback: Optional[Callable] = None  # 失败回调函数
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式"""
-        data = asdict(self)
+    """任务信息（紧凑表示）
+
+    任务在内存中保留 task_ttl_hours，数量可达十万级，因此：
+    - 使用 __slots__，不为每个实例分配 __dict__
+    - 创建/更新时间以 epoch 秒（float）保存，created_at / updated_at 属性按需转换为 datetime
+    - 状态与类型保存枚举单例，模型名驻留（sys.intern）
+    - 输入与结果正文超过 compress_threshold 字节时以 zlib 压缩保存，读取时才解压
+    """
+
+    __slots__ = (
+        "task_id", "task_type", "status", "_created_ts", "_updated_ts", "_input_data", "_result",
+        "error_message", "progress", "_model_name", "use_chains", "retry_count", "max_retries",
+        "priority", "failure_callback", "webhooks", "checkpoint",
+    )
+
+    # 正文压缩阈值（字节），由 async_tasks.compress_threshold_bytes 配置
+    compress_threshold = 1024
+
+    def __init__(
+        self,
+        task_id: str,
+        task_type: TaskType,
+        status: TaskStatus,
+        created_at: Union[datetime, float],
+        updated_at: Union[datetime, float],
+        input_data: Dict[str, Any],
+        result: Optional[str] = None,
+        error_message: Optional[str] = None,
+        progress: int = 0,  # 进度百分比 0-100
+        model_name: Optional[str] = None,
+        use_chains: bool = True,
+        retry_count: int = 0,  # 重试次数，失败了还可以设置重试
+        max_retries: int = 3,  # 最大重试次数
+        priority: int = 0,  # 调度优先级，数值越大越先执行（priority 策略下生效）
+        failure_callback: Optional[Callable] = None,  # 失败回调函数（任务结束后释放）
+        webhooks: Optional[Dict[str, str]] = None,  # 结束时推送的 Webhook：{"success": url, "failure": url}（不持久化）
+        checkpoint: Optional[Dict[str, str]] = None,  # 已完成分块的结果（分块内容摘要 -> 结果），供重试时续跑
+    ):
+        self.task_id = task_id
+        self.task_type = TaskType(task_type)
+        self.status = TaskStatus(status)
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.input_data = input_data
+        self.result = result
+        self.error_message = error_message
+        self.progress = progress
+        self.model_name = model_name
+        self.use_chains = use_chains
+        self.retry_count = retry_count
+        self.max_retries = max_retries
+        self.priority = priority
+        self.failure_callback = failure_callback
+        self.webhooks = webhooks
+        self.checkpoint = checkpoint
+
+    @staticmethod
+    def _to_ts(value: Union[datetime, float]) -> float:
+        return value.timestamp() if isinstance(value, datetime) else float(value)
+
+    @property
+    def created_ts(self) -> float:
+        """创建时间（epoch 秒）"""
+        return self._created_ts
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self._created_ts)
+
+    @created_at.setter
+    def created_at(self, value: Union[datetime, float]) -> None:
+        self._created_ts = self._to_ts(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        return datetime.fromtimestamp(self._updated_ts)
+
+    @updated_at.setter
+    def updated_at(self, value: Union[datetime, float]) -> None:
+        self._updated_ts = self._to_ts(value)
+
+    @property
+    def input_data(self) -> Dict[str, Any]:
+        return _unpack_body(self._input_data, as_json=True)
+
+    @input_data.setter
+    def input_data(self, value: Dict[str, Any]) -> None:
+        self._input_data = _pack_body(value, self.compress_threshold)
+
+    @property
+    def result(self) -> Optional[str]:
+        return _unpack_body(self._result, as_json=False)
+
+    @result.setter
+    def result(self, value: Optional[str]) -> None:
+        self._result = _pack_body(value, self.compress_threshold)
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return self._model_name
+
+    @model_name.setter
+    def model_name(self, value: Optional[str]) -> None:
+        self._model_name = sys.intern(value) if isinstance(value, str) else value
+
+    def __repr__(self) -> str:
+        return f"TaskInfo(task_id={self.task_id!r}, task_type={self.task_type.value!r}, status={self.status.value!r})"
+
+    def to_dict(self, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """转换为字典格式；指定 fields 时只输出这些字段（未请求的正文不解压）"""
+        data = {name: getattr(self, name) for name in (fields or TASK_FIELDS)}
         # 转换datetime为字符串
-        data['created_at'] = self.created_at.isoformat()
-        data['updated_at'] = self.updated_at.isoformat()
+        for name in ("created_at", "updated_at"):
+            if name in data:
+                data[name] = data[name].isoformat()
         return data
 
 
+class BulkJob:
+    """批量提交的作业：记录各条目的任务ID，并随任务结束增量维护完成/失败计数"""
+
+    __slots__ = ("job_id", "task_type", "model_name", "task_ids", "created_ts", "completed", "failed", "retained")
+
+    def __init__(self, job_id: str, task_type: TaskType, model_name: Optional[str] = None):
+        self.job_id = job_id
+        self.task_type = task_type
+        self.model_name = model_name
+        self.task_ids: List[str] = []
+        self.created_ts = time.time()
+        self.completed = 0
+        self.failed = 0
+        # 仍保留（未过期/未被淘汰）的任务数，降为 0 时作业记录随之删除
+        self.retained = 0
+
+    def summary(self) -> Dict[str, Any]:
+        total = len(self.task_ids)
+        done = self.completed + self.failed
+        return {
+            "job_id": self.job_id,
+            "task_type": self.task_type.value,
+            "model_name": self.model_name,
+            "created_at": datetime.fromtimestamp(self.created_ts).isoformat(),
+            "total": total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "unfinished": total - done,
+            "progress": round(done * 100 / total, 2) if total else 100.0,
+            "done": done == total,
+        }
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """按异常类型判断任务失败是否可重试：限流、网络与超时错误、熔断、降级的模型响应，以及服务商 429/5xx"""
+    import httpx
+    from ..utils.exceptions import RateLimitError, NetworkError, CircuitOpenError, DegradedResponseError
+    if isinstance(error, (RateLimitError, NetworkError, CircuitOpenError, DegradedResponseError)):
+        return True
+    # 部分服务直接抛出 httpx 异常
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in (429, 500, 502, 503, 504)
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def error_retry_after(error: BaseException) -> Optional[float]:
+    """异常携带的服务端建议等待秒数（RateLimitError / CircuitOpenError 的 retry_after 或 429 响应的 Retry-After）"""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        retry_after = (getattr(error, "details", None) or {}).get("retry_after")
+    if retry_after is None and getattr(error, "response", None) is not None:
+        from .key_pool import retry_after_seconds
+        retry_after = retry_after_seconds(error.response)
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
 class AsyncTaskManager:
     """异步任务管理器"""
     
-    def __init__(self, max_concurrent_tasks: int = 5, task_ttl_hours: int = 24):
-        self.tasks: Dict[str, TaskInfo] = {}
+    # 长轮询期间重新读取存储的间隔（秒）
+    WAIT_RECHECK_SECONDS = 5.0
+    
+    def __init__(
+        self,
+        max_concurrent_tasks: int = 5,
+        task_ttl_hours: int = 24,
+        store=None,
+        max_queue_size: int = 1000,
+        scheduling: str = "fifo",
+        scheduling_options: Optional[Dict[str, Any]] = None,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 60.0,
+        failed_task_ttl_hours: Optional[float] = None,
+        max_retained_tasks: Optional[int] = None,
+        event_heartbeat_seconds: float = 15.0,
+        webhook_dispatcher: Optional[Any] = None,
+        max_backlog_tasks: int = 100000,
+        max_bulk_items: int = 10000,
+        running_lease_seconds: float = 300.0,
+    ):
+        from .task_store import InMemoryTaskStore
+        # 任务存储（默认进程内字典，可配置为 SQLite 持久化）
+        self.store = store or InMemoryTaskStore()
+        # 本进程内待执行/执行中的任务对象（含不可持久化的失败回调）
+        self._active: Dict[str, TaskInfo] = {}
         self.max_concurrent_tasks = max_concurrent_tasks
         self.task_ttl = timedelta(hours=task_ttl_hours)
         self._running_tasks: Dict[str, asyncio.Task] = {}
-        self._semaphore = asyncio.Semaphore(max_concurrent_tasks)
         self._cleanup_started = False
         
+        # 有界任务队列 + 固定数量的常驻 worker（在首次调度时于当前事件循环中创建）
+        self.max_queue_size = max_queue_size
+        # 调度策略：fifo / priority / sjf（短作业优先，带老化）
+        self.scheduling = scheduling
+        self.scheduling_options = scheduling_options or {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._enqueued_at: Dict[str, float] = {}
+        self._busy_workers = 0
+        self._queue_waits: deque = deque(maxlen=200)   # 最近的排队等待时间（秒）
+        self._service_times: deque = deque(maxlen=200)  # 最近的执行耗时（秒）
+        # 批量作业：超出队列容量的条目先进入待入队列表，worker 每取走一个任务补入一个
+        self.max_backlog_tasks = max_backlog_tasks
+        self.max_bulk_items = max_bulk_items
+        self._backlog: deque = deque()
+        self._jobs: Dict[str, BulkJob] = {}
+        self._job_of: Dict[str, str] = {}
+        
+        # 延迟重试：失败任务释放 worker，退避到期后重新入队
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._retry_timers: Dict[str, asyncio.TimerHandle] = {}
+        
+        # 运行租约：执行中的任务定期刷新修改时间；超过租约未刷新的 running 任务视为执行它的进程已退出
+        self.running_lease = timedelta(seconds=running_lease_seconds)
+        self._lease_task: Optional[asyncio.Task] = None
+        
+        # 过期与保留上限：到期时间（epoch 秒）小顶堆由定时器在最近的到期时刻弹出；
+        # 失败任务使用更短的保留期；超过保留上限时按 LRU 淘汰已结束的任务
+        self.failed_task_ttl = timedelta(hours=failed_task_ttl_hours) if failed_task_ttl_hours else self.task_ttl
+        self.max_retained_tasks = max_retained_tasks
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._expiry_timer: Optional[asyncio.TimerHandle] = None
+        self._expiry_timer_at = 0.0
+        self._expiry_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self._expired_count = 0
+        self._evicted_count = 0
+        
+        # 长轮询：仅为有等待者的任务创建完成事件，任务结束或被删除时置位并移除
+        self._completion_events: Dict[str, asyncio.Event] = {}
+        # 多任务事件订阅（SSE）：状态与进度变化按任务投递给订阅者
+        self.events = TaskEventHub(event_heartbeat_seconds)
+        # 任务结束时的 Webhook 推送；未指定时使用全局投递器
+        self._webhook_dispatcher = webhook_dispatcher
+        
         # 全局失败回调函数
         self._global_failure_callbacks: List[Callable] = []
         
@@ -93,9 +349,12 @@ class AsyncTaskManager:
         model_name: Optional[str] = None,
         use_chains: bool = True,
         max_retries: int = 3,
-        failure_callback: Optional[Callable] = None
+        failure_callback: Optional[Callable] = None,
+        priority: int = 0,
+        webhooks: Optional[Dict[str, str]] = None,
     ) -> str:
-        """创建新任务"""
+        """创建新任务（队列已满时抛出 TaskQueueFullError）"""
+        self._check_capacity()
         task_id = str(uuid.uuid4())
         now = datetime.now()
         
@@ -109,42 +368,379 @@ class AsyncTaskManager:
             model_name=model_name,
             use_chains=use_chains,
             max_retries=max_retries,
-            failure_callback=failure_callback
+            failure_callback=failure_callback,
+            priority=priority,
+            webhooks=webhooks or None,
         )
         
-        self.tasks[task_id] = task_info
+        self.store.save(task_info)
+        self._active[task_id] = task_info
+        self._track_expiry(task_info)
         logger.info(f"Created task {task_id} of type {task_type}")
         
-        # 异步执行任务
         try:
-            task = asyncio.create_task(self._execute_task(task_id))
-            self._running_tasks[task_id] = task
+            self._schedule(task_info)
+        except Exception:
+            self._active.pop(task_id, None)
+            self._deadlines.pop(task_id, None)
+            self.store.delete(task_id)
+            raise
+        return task_id
+    
+    def _check_capacity(self) -> None:
+        """队列已满时拒绝提交，并按当前吞吐估算重试等待时间"""
+        depth = self.queue_depth()
+        if depth < self.max_queue_size:
+            return
+        from ..utils.exceptions import TaskQueueFullError
+        raise TaskQueueFullError(depth, self.estimate_retry_after())
+    
+    def queue_depth(self) -> int:
+        """当前排队中的任务数"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    def estimate_retry_after(self) -> int:
+        """估算队列腾出空位所需秒数：排队数 / worker 数 × 平均执行耗时"""
+        avg_service = sum(self._service_times) / len(self._service_times) if self._service_times else 1.0
+        waves = self.queue_depth() / max(1, self.max_concurrent_tasks)
+        return max(1, math.ceil(waves * avg_service))
+    
+    def _ensure_workers(self) -> asyncio.Queue:
+        """确保当前事件循环中有队列与 worker；事件循环变化时迁移未处理的任务"""
+        try:
+            loop = asyncio.get_running_loop()
         except RuntimeError:
             # 无运行循环时，延迟到调用方事件循环中执行
             loop = asyncio.get_event_loop()
-            task = loop.create_task(self._execute_task(task_id))
-            self._running_tasks[task_id] = task
+        if self._queue is not None and self._loop is loop and not loop.is_closed():
+            return self._queue
         
-        return task_id
+        leftover: List[str] = []
+        if self._queue is not None:
+            while not self._queue.empty():
+                leftover.append(self._queue.get_nowait())
+        
+        from .task_scheduler import create_task_queue
+        self._loop = loop
+        self._queue = create_task_queue(self.scheduling, self.max_queue_size, self.scheduling_options)
+        self._busy_workers = 0
+        self._workers = [
+            loop.create_task(self._worker(i)) for i in range(self.max_concurrent_tasks)
+        ]
+        self._lease_task = loop.create_task(self._renew_running_leases())
+        for task_id in leftover:
+            task = self._get_task(task_id)
+            if task is not None:
+                self._queue.put_nowait(self._queue_item(task))
+        return self._queue
+    
+    @staticmethod
+    def _queue_item(task: TaskInfo):
+        """入队条目：(任务ID, 优先级, 估算输入 token 数)"""
+        from .chunking import estimate_tokens
+        return (task.task_id, task.priority, estimate_tokens(task.input_data.get("text", "")))
+    
+    def _schedule(self, task: TaskInfo) -> None:
+        """将任务按调度策略放入有界队列，由 worker 依次执行"""
+        queue = self._ensure_workers()
+        task_id = task.task_id
+        self._enqueued_at[task_id] = time.monotonic()
+        try:
+            queue.put_nowait(self._queue_item(task))
+        except asyncio.QueueFull:
+            self._enqueued_at.pop(task_id, None)
+            from ..utils.exceptions import TaskQueueFullError
+            raise TaskQueueFullError(self.queue_depth(), self.estimate_retry_after())
+    
+    def create_bulk_job(
+        self,
+        task_type: TaskType,
+        items: List[Dict[str, Any]],
+        model_name: Optional[str] = None,
+        use_chains: bool = True,
+        max_retries: int = 3,
+        priority: int = 0,
+    ) -> BulkJob:
+        """批量创建任务（一次调用，O(n)）：队列有空位的直接入队，其余进入待入队列表
+        
+        待入队列表已满时整体拒绝（抛出 TaskQueueFullError），不会只提交部分条目。
+        """
+        # 提交后待入队列表的长度（已含现有待入队条目）
+        overflow = max(0, len(self._backlog) + len(items) - self._queue_room())
+        if overflow > self.max_backlog_tasks:
+            from ..utils.exceptions import TaskQueueFullError
+            raise TaskQueueFullError(self.queue_depth(), self.estimate_retry_after())
+        
+        job = BulkJob(str(uuid.uuid4()), TaskType(task_type), model_name)
+        now = time.time()
+        for input_data in items:
+            task_id = str(uuid.uuid4())
+            task_info = TaskInfo(
+                task_id=task_id,
+                task_type=job.task_type,
+                status=TaskStatus.PENDING,
+                created_at=now,
+                updated_at=now,
+                input_data=input_data,
+                model_name=model_name,
+                use_chains=use_chains,
+                max_retries=max_retries,
+                priority=priority,
+            )
+            self.store.save(task_info)
+            self._active[task_id] = task_info
+            self._track_expiry(task_info)
+            self._job_of[task_id] = job.job_id
+            job.task_ids.append(task_id)
+            self._backlog.append(task_id)
+        job.retained = len(job.task_ids)
+        self._jobs[job.job_id] = job
+        self._ensure_workers()
+        self._refill_from_backlog()
+        logger.info(f"Created bulk job {job.job_id} with {len(job.task_ids)} {job.task_type.value} tasks")
+        return job
+    
+    def _queue_room(self) -> int:
+        if self.max_queue_size <= 0:
+            return sys.maxsize
+        return max(0, self.max_queue_size - self.queue_depth())
+    
+    def _refill_from_backlog(self) -> None:
+        """把待入队列表中的任务按顺序补入队列，直到队列满"""
+        queue = self._ensure_workers()
+        while self._backlog and not queue.full():
+            task = self._active.get(self._backlog.popleft())
+            # 已取消或已被删除的任务跳过
+            if task is None or task.status != TaskStatus.PENDING:
+                continue
+            self._enqueued_at[task.task_id] = time.monotonic()
+            queue.put_nowait(self._queue_item(task))
+    
+    def get_job(self, job_id: str, offset: int = 0, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """作业汇总（计数增量维护）与分页的条目状态/结果"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        items = []
+        for index in range(offset, min(offset + limit, len(job.task_ids))):
+            task_id = job.task_ids[index]
+            task = self._get_task(task_id)
+            item: Dict[str, Any] = {"index": index, "task_id": task_id}
+            if task is None:
+                item["status"] = TaskStatus.EXPIRED.value
+            else:
+                item["status"] = task.status.value
+                item["progress"] = task.progress
+                if task.status == TaskStatus.COMPLETED:
+                    item["result"] = task.result
+                elif task.status == TaskStatus.FAILED:
+                    item["error"] = task.error_message
+            items.append(item)
+        next_offset = offset + limit if offset + limit < len(job.task_ids) else None
+        return {**job.summary(), "items": items, "offset": offset, "next_offset": next_offset}
+    
+    async def _worker(self, worker_id: int) -> None:
+        """常驻 worker：从队列取任务执行；单个任务以子任务运行，便于单独取消"""
+        queue = self._queue
+        while True:
+            task_id = await queue.get()
+            if self._backlog:
+                self._refill_from_backlog()
+            try:
+                enqueued_at = self._enqueued_at.pop(task_id, None)
+                if enqueued_at is not None:
+                    self._queue_waits.append(time.monotonic() - enqueued_at)
+                
+                self._busy_workers += 1
+                started = time.monotonic()
+                job = asyncio.create_task(self._execute_task(task_id))
+                self._running_tasks[task_id] = job
+                # 等待子任务结束；子任务被取消不会影响 worker 本身
+                await asyncio.wait({job})
+                self._service_times.append(time.monotonic() - started)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed while running task {task_id}: {e}")
+            finally:
+                self._busy_workers = max(0, self._busy_workers - 1)
+                self._running_tasks.pop(task_id, None)
+                queue.task_done()
+    
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """队列深度、worker 占用与排队等待时间统计"""
+        waits = sorted(self._queue_waits)
+        return {
+            "scheduling": self.scheduling,
+            "queue_depth": self.queue_depth(),
+            "queue_capacity": self.max_queue_size,
+            "backlog": len(self._backlog),
+            "bulk_jobs": len(self._jobs),
+            "workers": self.max_concurrent_tasks,
+            "busy_workers": self._busy_workers,
+            "queue_wait_ms_avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            "queue_wait_ms_p95": round(waits[int(len(waits) * 0.95) - 1 if len(waits) > 1 else 0] * 1000, 2) if waits else 0.0,
+            "queue_wait_ms_max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            "avg_service_seconds": round(sum(self._service_times) / len(self._service_times), 3) if self._service_times else 0.0,
+            "retry_after_estimate": self.estimate_retry_after(),
+            "delayed_retries": len(self._retry_timers),
+            "retained_tasks": len(self._deadlines),
+            "max_retained_tasks": self.max_retained_tasks,
+            "expired_tasks": self._expired_count,
+            "evicted_tasks": self._evicted_count,
+            "events": self.events.get_stats(),
+        }
+    
+    async def startup(self) -> int:
+        """启动时把存储中遗留的待处理任务（及租约过期的 running 任务）重新入队，返回入队数量"""
+        requeued = self._recover_stale_running()
+        from ..utils.exceptions import TaskQueueFullError
+        for task in self.store.list(status=TaskStatus.PENDING):
+            if task.task_id in self._active:
+                continue
+            try:
+                self._schedule(task)
+            except TaskQueueFullError:
+                logger.warning("Task queue full while re-queueing pending tasks; remaining tasks stay pending")
+                break
+            self._active[task.task_id] = task
+            self._track_expiry(task)
+            requeued += 1
+        if requeued:
+            logger.info(f"Re-queued {requeued} pending tasks from task store")
+        return requeued
+    
+    def _recover_stale_running(self) -> int:
+        """租约过期的 running 任务按一次重试重新置为待处理并入队（保留分块检查点）；重试次数用尽时标记失败"""
+        cutoff = datetime.now() - self.running_lease
+        recovered = 0
+        for task in self.store.list(status=TaskStatus.RUNNING):
+            if task.task_id in self._running_tasks or task.updated_at > cutoff:
+                continue
+            if task.retry_count >= task.max_retries:
+                task.status = TaskStatus.FAILED
+                task.error_message = "Task was interrupted: the worker running it stopped"
+                task.checkpoint = None
+                self._touch(task)
+                self._active.pop(task.task_id, None)
+                self._on_finished(task)
+                logger.warning(f"Task {task.task_id} was left running by a stopped worker; marked failed")
+                continue
+            task.retry_count += 1
+            task.status = TaskStatus.PENDING
+            self._touch(task)
+            self._active[task.task_id] = task
+            self._track_expiry(task)
+            # 经重试定时器入队，队列已满时自动延后
+            self._schedule_retry(task, 0)
+            recovered += 1
+            logger.warning(f"Task {task.task_id} was left running by a stopped worker; re-queued")
+        return recovered
+    
+    async def _renew_running_leases(self) -> None:
+        """定期刷新本进程执行中任务的修改时间，并回收其他进程遗留的 running 任务"""
+        interval = max(1.0, self.running_lease.total_seconds() / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                now = datetime.now()
+                for task_id in list(self._running_tasks):
+                    task = self._active.get(task_id)
+                    if task is not None and task.status == TaskStatus.RUNNING:
+                        task.updated_at = now
+                        self.store.save(task)
+                self._recover_stale_running()
+            except Exception as e:
+                logger.error(f"Error renewing running task leases: {e}")
+    
+    async def shutdown(self) -> None:
+        """关闭时停止 worker，落盘缓冲写入并关闭存储"""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+            self._lease_task = None
+        # 等待重试的任务保持 pending，重启后由 startup 重新入队
+        for timer in self._retry_timers.values():
+            timer.cancel()
+        self._retry_timers.clear()
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+            self._expiry_timer = None
+        self._queue = None
+        self.store.flush()
+        self.store.close()
+    
+    def _get_task(self, task_id: str) -> Optional[TaskInfo]:
+        """优先返回本进程内的任务对象，否则从存储读取"""
+        return self._active.get(task_id) or self.store.get(task_id)
+    
+    def _touch(self, task: TaskInfo) -> None:
+        """更新修改时间并写入存储"""
+        task.updated_at = datetime.now()
+        self.store.save(task)
+        if self.events.has_subscribers(task.task_id):
+            self.events.publish(self._task_event(task))
+    
+    @staticmethod
+    def _task_event(task: TaskInfo) -> Dict[str, Any]:
+        """任务当前状态对应的订阅事件：completed / failed 为结束事件，其余为 status"""
+        event = {
+            "event": "status",
+            "task_id": task.task_id,
+            "status": task.status.value,
+            "progress": task.progress,
+            "updated_at": task.updated_at.isoformat(),
+        }
+        if task.status == TaskStatus.COMPLETED:
+            event["event"] = "completed"
+            event["result"] = task.result
+        elif task.status == TaskStatus.FAILED:
+            event["event"] = "failed"
+            event["error"] = task.error_message
+        return event
+    
+    def subscribe(self, task_ids: List[str]) -> TaskSubscription:
+        """订阅一批任务的事件；订阅时先推送每个任务的当前状态，未知任务推送 not_found"""
+        subscription = self.events.subscribe(task_ids)
+        for task_id in subscription.task_ids:
+            task = self._get_task(task_id)
+            if task is None:
+                subscription.push({"event": "not_found", "task_id": task_id})
+            else:
+                subscription.push(self._task_event(task))
+        return subscription
+    
+    def refresh_subscription(self, subscription: TaskSubscription) -> None:
+        """补发不在本进程执行的任务（共享 SQLite 存储时由其他进程执行）的结束事件；在心跳时调用"""
+        for task_id in list(subscription.remaining):
+            if task_id in self._active:
+                continue
+            task = self.store.get(task_id)
+            if task is None:
+                subscription.push({"event": "removed", "task_id": task_id})
+            elif task.status not in (TaskStatus.PENDING, TaskStatus.RUNNING):
+                subscription.push(self._task_event(task))
     
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """获取任务状态"""
-        task = self.tasks.get(task_id)
+        task = self._get_task(task_id)
         if not task:
             return None
+        self._mark_used(task_id)
         
         # 检查任务是否过期
-        if self._is_task_expired(task):
+        if self._is_task_expired(task) and task.status != TaskStatus.EXPIRED:
             task.status = TaskStatus.EXPIRED
-            task.updated_at = datetime.now()
+            self._touch(task)
         
         return task.to_dict()
     
     def get_task_result(self, task_id: str) -> Optional[Dict[str, Any]]:
         """获取任务结果"""
-        task = self.tasks.get(task_id)
+        task = self._get_task(task_id)
         if not task:
             return None
+        self._mark_used(task_id)
         
         if task.status == TaskStatus.COMPLETED:
             return {
@@ -172,9 +768,32 @@ class AsyncTaskManager:
                 "updated_at": task.updated_at.isoformat()
             }
     
+    async def wait_for_result(self, task_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """长轮询获取任务结果：任务结束（完成、失败或取消）后立即返回，最多等待 timeout 秒
+        
+        等待挂在任务的完成事件上；每隔 WAIT_RECHECK_SECONDS 重新读取一次存储，
+        以便发现由其他进程（共享 SQLite 存储）执行完成的任务。
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            task = self._get_task(task_id)
+            if task is None or task.status not in (TaskStatus.PENDING, TaskStatus.RUNNING):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = self._completion_events.get(task_id)
+            if event is None:
+                event = self._completion_events[task_id] = asyncio.Event()
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, self.WAIT_RECHECK_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+        return self.get_task_result(task_id)
+    
     def cancel_task(self, task_id: str) -> bool:
         """取消任务"""
-        task = self.tasks.get(task_id)
+        task = self._get_task(task_id)
         if not task:
             return False
         
@@ -183,10 +802,17 @@ class AsyncTaskManager:
             if task_id in self._running_tasks:
                 self._running_tasks[task_id].cancel()
                 del self._running_tasks[task_id]
+            timer = self._retry_timers.pop(task_id, None)
+            if timer is not None:
+                timer.cancel()
             
             task.status = TaskStatus.FAILED
             task.error_message = "Task cancelled by user"
-            task.updated_at = datetime.now()
+            task.failure_callback = None
+            task.checkpoint = None
+            self._touch(task)
+            self._active.pop(task_id, None)
+            self._on_finished(task)
             logger.info(f"Cancelled task {task_id}")
             return True
         
@@ -194,14 +820,26 @@ class AsyncTaskManager:
     
     def list_tasks(self, status: Optional[TaskStatus] = None) -> List[Dict[str, Any]]:
         """列出所有任务"""
-        tasks = []
-        for task in self.tasks.values():
-            if status is None or task.status == status:
-                tasks.append(task.to_dict())
-        
-        # 按创建时间倒序排列
-        tasks.sort(key=lambda x: x['created_at'], reverse=True)
-        return tasks
+        # 存储按创建时间倒序返回
+        return [task.to_dict() for task in self.store.list(status=status)]
+    
+    def query_tasks(
+        self,
+        status: Optional[TaskStatus] = None,
+        task_type: Optional[TaskType] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """按创建时间倒序分页列出任务，只输出 fields 指定的字段（默认不含输入与结果正文）"""
+        tasks, next_cursor = self.store.query(status=status, task_type=task_type, limit=limit, cursor=cursor)
+        fields = list(fields or DEFAULT_LIST_FIELDS)
+        return {"tasks": [task.to_dict(fields) for task in tasks], "next_cursor": next_cursor}
+    
+    def get_task_counts(self) -> Dict[str, Any]:
+        """按状态与类型的任务计数（由存储的索引维护，不遍历任务）"""
+        counts = self.store.counts()
+        return {"total": sum(counts["by_status"].values()), **counts}
     
     def add_global_failure_callback(self, callback: Callable):
         """添加全局失败回调函数"""
@@ -251,21 +889,35 @@ class AsyncTaskManager:
                 logger.error(f"Error in global failure callback {callback.__name__}: {cb_error}")
     
     async def _should_retry_task(self, task: TaskInfo, error: Exception) -> bool:
-        """判断任务是否应该重试"""
+        """判断任务是否应该重试（按异常类型，参数错误等不重试）"""
         if task.retry_count >= task.max_retries:
             return False
-            
-        # 可以根据错误类型决定是否重试
-        # 例如：网络错误可以重试，但是参数错误不重试
-        retry_conditions = [
-            "timeout" in str(error).lower(),
-            "connection" in str(error).lower(),
-            "network" in str(error).lower(),
-            "rate limit" in str(error).lower(),
-            "service unavailable" in str(error).lower(),
-        ]
-        
-        return any(retry_conditions)
+        return is_retryable_error(error)
+    
+    def _retry_delay(self, task: TaskInfo, error: Exception) -> float:
+        """重试等待时间：优先使用服务端 Retry-After，否则指数退避；均加随机抖动避免集中重试"""
+        retry_after = error_retry_after(error)
+        if retry_after is not None and retry_after > 0:
+            return retry_after + random.uniform(0, min(1.0, retry_after * 0.1))
+        backoff = min(self.retry_max_delay, self.retry_base_delay * 2 ** max(0, task.retry_count - 1))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+    
+    def _schedule_retry(self, task: TaskInfo, delay: float) -> None:
+        """退避到期后把任务重新放入调度队列（期间不占用 worker）"""
+        loop = asyncio.get_running_loop()
+        self._retry_timers[task.task_id] = loop.call_later(delay, self._requeue_retry, task.task_id)
+    
+    def _requeue_retry(self, task_id: str) -> None:
+        self._retry_timers.pop(task_id, None)
+        task = self._active.get(task_id)
+        if task is None or task.status != TaskStatus.PENDING:
+            return
+        from ..utils.exceptions import TaskQueueFullError
+        try:
+            self._schedule(task)
+        except TaskQueueFullError as e:
+            # 队列已满：按估算的腾空时间再次延后
+            self._schedule_retry(task, float(e.details.get("retry_after", 1)))
     
     async def _execute_task(self, task_id: str):
         """执行任务"""
@@ -277,107 +929,265 @@ class AsyncTaskManager:
                 self._cleanup_started = True
             except RuntimeError:
                 pass
-        async with self._semaphore:  # 限制并发数
-            task = self.tasks.get(task_id)
-            if not task:
-                return
+        task = self._get_task(task_id)
+        if not task:
+            return
+        # 认领任务：已被取消或已被其他 worker 执行的任务直接跳过
+        if not self.store.claim(task_id):
+            self._running_tasks.pop(task_id, None)
+            return
+        
+        finished = False
+        try:
+            # 更新任务状态为运行中（进度按已完成分块数更新，重试时保留上次的进度）
+            task.status = TaskStatus.RUNNING
+            self._touch(task)
+            logger.info(f"Starting execution of task {task_id}")
             
-            try:
-                # 更新任务状态为运行中
-                task.status = TaskStatus.RUNNING
-                task.updated_at = datetime.now()
-                task.progress = 10
-                logger.info(f"Starting execution of task {task_id}")
-                
-                # 导入服务
-                from .langchain_translate import LangChainTranslationService
-                service = LangChainTranslationService(
-                    model_name=task.model_name,
-                    use_chains=task.use_chains
-                )
-                
-                # 更新进度
-                task.progress = 30
-                task.updated_at = datetime.now()
-                
-                # 根据任务类型执行相应的操作
-                if task.task_type == TaskType.ZH2EN:
-                    result = await service.zh2en(task.input_data['text'])
-                elif task.task_type == TaskType.EN2ZH:
-                    result = await service.en2zh(task.input_data['text'])
-                elif task.task_type == TaskType.SUMMARIZE:
-                    max_length = task.input_data.get('max_length', 200)
-                    result = await service.summarize(task.input_data['text'], max_length=max_length)
-                elif task.task_type == TaskType.KEYWORD_SUMMARY:
-                    summary_length = task.input_data.get('summary_length', 100)
-                    result = await service.keyword_summary(task.input_data['text'], summary_length=summary_length)
-                elif task.task_type == TaskType.STRUCTURED_SUMMARY:
-                    max_length = task.input_data.get('max_length', 300)
-                    result = await service.structured_summary(task.input_data['text'], max_length=max_length)
-                else:
-                    raise ValueError(f"Unsupported task type: {task.task_type}")
-                
-                # 任务完成
-                task.result = result
-                task.status = TaskStatus.COMPLETED
-                task.progress = 100
-                task.updated_at = datetime.now()
-                logger.info(f"Task {task_id} completed successfully")
-                
-            except asyncio.CancelledError:
+            # 相同类型、模型与输入的并发任务合并为一次上游调用
+            from .single_flight import model_call_flight, make_flight_key
+            flight_key = make_flight_key(
+                "async_task", task.task_type, task.model_name, task.use_chains, task.input_data
+            )
+            result = await model_call_flight.do(flight_key, lambda: self._run_task_service(task))
+            
+            # 任务完成，分块检查点不再需要
+            task.result = result
+            task.status = TaskStatus.COMPLETED
+            task.progress = 100
+            task.checkpoint = None
+            self._touch(task)
+            logger.info(f"Task {task_id} completed successfully")
+            
+        except asyncio.CancelledError:
+            if task.status == TaskStatus.FAILED:
+                # cancel_task 已记录取消原因并完成收尾（_on_finished 只调用一次）
+                finished = True
+            else:
                 task.status = TaskStatus.FAILED
                 task.error_message = "Task was cancelled"
-                task.updated_at = datetime.now()
+                self._touch(task)
                 logger.info(f"Task {task_id} was cancelled")
-            except Exception as e:
-                logger.error(f"Task {task_id} failed (attempt {task.retry_count + 1}): {e}")
+        except Exception as e:
+            logger.error(f"Task {task_id} failed (attempt {task.retry_count + 1}): {e}")
+            
+            # 检查是否应该重试
+            if await self._should_retry_task(task, e):
+                task.retry_count += 1
+                # 重新置为待处理，以便重试时再次认领
+                task.status = TaskStatus.PENDING
+                self._touch(task)
+                retry_delay = self._retry_delay(task, e)
+                logger.info(
+                    f"Retrying task {task_id} in {retry_delay:.1f}s "
+                    f"(attempt {task.retry_count + 1}/{task.max_retries + 1})"
+                )
+                self._schedule_retry(task, retry_delay)
+            else:
+                # 不能重试或已达到最大重试次数
+                task.status = TaskStatus.FAILED
+                task.error_message = str(e)
+                task.checkpoint = None
+                self._touch(task)
                 
-                # 检查是否应该重试
-                if await self._should_retry_task(task, e):
-                    task.retry_count += 1
-                    task.updated_at = datetime.now()
-                    logger.info(f"Retrying task {task_id} (attempt {task.retry_count + 1}/{task.max_retries + 1})")
-                    
-                    # 延迟后重试（指数退避）
-                    retry_delay = min(2 ** task.retry_count, 60)  # 最大延迟60秒
-                    await asyncio.sleep(retry_delay)
-                    
-                    # 递归重试
-                    await self._execute_task(task_id)
-                    return
-                else:
-                    # 不能重试或已达到最大重试次数
-                    task.status = TaskStatus.FAILED
-                    task.error_message = str(e)
-                    task.updated_at = datetime.now()
-                    
-                    # 执行失败回调
-                    await self._execute_failure_callbacks(task, e)
-                    
-                    logger.error(f"Task {task_id} failed permanently after {task.retry_count} retries: {e}")
-            finally:
-                # 清理运行中的任务记录
-                if task_id in self._running_tasks:
-                    del self._running_tasks[task_id]
+                # 执行失败回调
+                await self._execute_failure_callbacks(task, e)
+                
+                logger.error(f"Task {task_id} failed permanently after {task.retry_count} retries: {e}")
+        finally:
+            # 清理运行中的任务记录（重试中的任务仍保留在本进程）
+            if task_id in self._running_tasks:
+                del self._running_tasks[task_id]
+            if task.status != TaskStatus.PENDING and not finished:
+                self._active.pop(task_id, None)
+                # 已结束的任务仍会保留到过期，释放不再需要的回调闭包
+                task.failure_callback = None
+                self._on_finished(task)
+    
+    async def _run_task_service(self, task: TaskInfo) -> str:
+        """按任务类型调用翻译/总结服务；长文本分块处理时，已完成的分块结果随任务记录保存，重试时只重新处理失败的分块"""
+        from .chunking import ChunkCheckpoint, use_checkpoint
+        checkpoint = ChunkCheckpoint(task.checkpoint, on_update=lambda cp: self._on_chunk_progress(task, cp))
+        if checkpoint.results:
+            logger.info(f"Resuming task {task.task_id} from {len(checkpoint.results)} checkpointed chunks")
+        with use_checkpoint(checkpoint):
+            return await self._call_task_service(task)
+    
+    def _on_chunk_progress(self, task: TaskInfo, checkpoint) -> None:
+        """分块完成后保存检查点并按 已完成/总分块数 更新进度（完成前最多 99）"""
+        if task.status != TaskStatus.RUNNING:
+            return
+        if checkpoint.results:
+            task.checkpoint = checkpoint.results
+        if checkpoint.total:
+            task.progress = min(99, checkpoint.done * 100 // checkpoint.total)
+        self._touch(task)
+    
+    async def _call_task_service(self, task: TaskInfo) -> str:
+        """按任务类型调用翻译/总结服务"""
+        # 导入服务
+        from .langchain_translate import LangChainTranslationService
+        service = LangChainTranslationService(
+            model_name=task.model_name,
+            use_chains=task.use_chains
+        )
+        
+        # 根据任务类型执行相应的操作
+        if task.task_type == TaskType.ZH2EN:
+            return await service.zh2en(task.input_data['text'], chunked=task.input_data.get('chunked'))
+        elif task.task_type == TaskType.EN2ZH:
+            return await service.en2zh(task.input_data['text'], chunked=task.input_data.get('chunked'))
+        elif task.task_type == TaskType.SUMMARIZE:
+            max_length = task.input_data.get('max_length', 200)
+            return await service.summarize(task.input_data['text'], max_length=max_length, mode=task.input_data.get('mode'))
+        elif task.task_type == TaskType.KEYWORD_SUMMARY:
+            summary_length = task.input_data.get('summary_length', 100)
+            return await service.keyword_summary(task.input_data['text'], summary_length=summary_length, mode=task.input_data.get('mode'))
+        elif task.task_type == TaskType.STRUCTURED_SUMMARY:
+            max_length = task.input_data.get('max_length', 300)
+            return await service.structured_summary(task.input_data['text'], max_length=max_length, mode=task.input_data.get('mode'))
+        else:
+            raise ValueError(f"Unsupported task type: {task.task_type}")
     
     def _is_task_expired(self, task: TaskInfo) -> bool:
         """检查任务是否过期"""
         return datetime.now() - task.created_at > self.task_ttl
     
+    def _deadline(self, task: TaskInfo) -> float:
+        """任务的删除时刻（epoch 秒）：创建后 task_ttl；失败任务在失败后 failed_task_ttl，取较早者"""
+        deadline = task.created_ts + self.task_ttl.total_seconds()
+        if task.status == TaskStatus.FAILED:
+            deadline = min(deadline, task.updated_at.timestamp() + self.failed_task_ttl.total_seconds())
+        return deadline
+    
+    def _track_expiry(self, task: TaskInfo) -> None:
+        """登记（或提前）任务的到期时间；堆中旧条目在弹出时按 _deadlines 识别为过时并跳过"""
+        deadline = self._deadline(task)
+        if self._deadlines.get(task.task_id) == deadline:
+            return
+        self._deadlines[task.task_id] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, task.task_id))
+        if len(self._expiry_heap) > 2 * len(self._deadlines) + 64:
+            # 过时条目过多时重建堆
+            self._expiry_heap = [(d, t) for t, d in self._deadlines.items()]
+            heapq.heapify(self._expiry_heap)
+        self._arm_expiry_timer()
+    
+    def _arm_expiry_timer(self) -> None:
+        """把定时器设在堆顶（最早）的到期时刻；无运行中的事件循环时等下次登记再设置"""
+        if not self._expiry_heap:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        next_deadline = self._expiry_heap[0][0]
+        if (
+            self._expiry_timer is not None and self._expiry_loop is loop
+            and self._expiry_timer_at <= next_deadline
+        ):
+            return
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+        self._expiry_loop = loop
+        self._expiry_timer_at = next_deadline
+        self._expiry_timer = loop.call_later(max(0.0, next_deadline - time.time()), self._expire_due)
+    
+    def _expire_due(self) -> None:
+        """弹出所有已到期的任务并删除，再为下一个到期时刻设置定时器"""
+        self._expiry_timer = None
+        now = time.time()
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            deadline, task_id = heapq.heappop(self._expiry_heap)
+            if self._deadlines.get(task_id) != deadline:
+                continue
+            self._remove_task(task_id)
+            self._expired_count += 1
+            logger.info(f"Expired task {task_id}")
+        self._arm_expiry_timer()
+    
+    def _remove_task(self, task_id: str) -> None:
+        self._notify_done(task_id)
+        job_id = self._job_of.pop(task_id, None)
+        if job_id is not None and job_id in self._jobs:
+            job = self._jobs[job_id]
+            job.retained -= 1
+            if job.retained <= 0:
+                del self._jobs[job_id]
+        if self.events.has_subscribers(task_id):
+            self.events.publish({"event": "removed", "task_id": task_id})
+        self._deadlines.pop(task_id, None)
+        self._finished.pop(task_id, None)
+        self._active.pop(task_id, None)
+        timer = self._retry_timers.pop(task_id, None)
+        if timer is not None:
+            timer.cancel()
+        self.store.delete(task_id)
+    
+    def _on_finished(self, task: TaskInfo) -> None:
+        """任务结束：唤醒长轮询等待者；失败任务改用更短的保留期，并按保留上限淘汰最久未访问的已结束任务"""
+        self._notify_done(task.task_id)
+        self._send_webhook(task)
+        job = self._jobs.get(self._job_of.get(task.task_id, ""))
+        if job is not None:
+            if task.status == TaskStatus.COMPLETED:
+                job.completed += 1
+            else:
+                job.failed += 1
+        self._finished[task.task_id] = None
+        self._finished.move_to_end(task.task_id)
+        if task.status == TaskStatus.FAILED:
+            self._track_expiry(task)
+        if not self.max_retained_tasks:
+            return
+        while len(self._deadlines) > self.max_retained_tasks and self._finished:
+            task_id, _ = self._finished.popitem(last=False)
+            self._remove_task(task_id)
+            self._evicted_count += 1
+            logger.debug(f"Evicted finished task {task_id} (retention cap {self.max_retained_tasks})")
+    
+    def _send_webhook(self, task: TaskInfo) -> None:
+        """按任务结果把完成/失败事件交给后台投递器（只推送一次）"""
+        webhooks, task.webhooks = task.webhooks, None
+        if not webhooks:
+            return
+        if task.status == TaskStatus.COMPLETED:
+            url, event = webhooks.get("success"), "task.completed"
+        else:
+            url, event = webhooks.get("failure"), "task.failed"
+        if not url:
+            return
+        dispatcher = self._webhook_dispatcher
+        if dispatcher is None:
+            from .webhook_dispatcher import webhook_dispatcher as dispatcher
+        payload = task.to_dict(["task_id", "task_type", "status", "model_name", "retry_count", "created_at", "updated_at"])
+        if task.status == TaskStatus.COMPLETED:
+            payload["result"] = task.result
+        else:
+            payload["error_message"] = task.error_message
+        dispatcher.submit(url, event, payload)
+    
+    def _notify_done(self, task_id: str) -> None:
+        event = self._completion_events.pop(task_id, None)
+        if event is not None:
+            event.set()
+    
+    def _mark_used(self, task_id: str) -> None:
+        if task_id in self._finished:
+            self._finished.move_to_end(task_id)
+    
     async def _cleanup_expired_tasks(self):
-        """定期清理过期任务"""
+        """兜底清理：按创建时间删除未在本进程登记到期时间的过期任务（如重启前或其他进程写入存储的任务）"""
         while True:
             try:
-                expired_tasks = []
-                for task_id, task in self.tasks.items():
-                    if self._is_task_expired(task):
-                        expired_tasks.append(task_id)
-                
+                expired_tasks = self.store.delete_created_before(datetime.now() - self.task_ttl)
                 for task_id in expired_tasks:
-                    del self.tasks[task_id]
+                    self._deadlines.pop(task_id, None)
+                    self._finished.pop(task_id, None)
+                    self._active.pop(task_id, None)
                     logger.info(f"Cleaned up expired task {task_id}")
                 
-                # 每小时清理一次
+                # 本进程的任务由到期堆及时删除，这里每小时兜底一次
                 await asyncio.sleep(3600)
                 
             except Exception as e:
@@ -385,8 +1195,33 @@ class AsyncTaskManager:
                 await asyncio.sleep(300)  # 出错后5分钟后重试
 
 
+def _create_task_manager() -> AsyncTaskManager:
+    """根据配置中的 async_tasks 段创建任务管理器"""
+    from ..core.config import settings
+    from .task_store import create_task_store
+
+    config = getattr(settings, "async_tasks", None) or {}
+    TaskInfo.compress_threshold = int(config.get("compress_threshold_bytes", TaskInfo.compress_threshold))
+    return AsyncTaskManager(
+        max_concurrent_tasks=int(config.get("max_concurrent_tasks", 5)),
+        task_ttl_hours=int(config.get("task_ttl_hours", 24)),
+        store=create_task_store(config),
+        max_queue_size=int(config.get("max_queue_size", 1000)),
+        scheduling=config.get("scheduling", "fifo"),
+        scheduling_options=config,
+        retry_base_delay=float(config.get("retry_base_delay_seconds", 1.0)),
+        retry_max_delay=float(config.get("retry_max_delay_seconds", 60.0)),
+        failed_task_ttl_hours=config.get("failed_task_ttl_hours"),
+        max_retained_tasks=config.get("max_retained_tasks"),
+        event_heartbeat_seconds=float(config.get("event_heartbeat_seconds", 15.0)),
+        max_backlog_tasks=int(config.get("max_backlog_tasks", 100000)),
+        max_bulk_items=int(config.get("max_bulk_items", 10000)),
+        running_lease_seconds=float(config.get("running_lease_seconds", 300)),
+    )
+
+
 # 全局任务管理器实例
-task_manager = AsyncTaskManager()
+task_manager = _create_task_manager()
 
 # 自动注册默认的失败回调函数
 try:
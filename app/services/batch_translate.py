@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量短文本翻译
+把大量短文本按 token 预算打包成带编号的 JSON 数组，一次模型调用翻译一整包，
+再按编号拆回各条；拆分失败的条目单独重译。
+"""
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+from .chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# 操作 -> 批量提示词中的翻译指令
+BATCH_INSTRUCTIONS = {
+    "zh2en": "将每条中文文本翻译成英文",
+    "en2zh": "将每条英文文本翻译成中文",
+    "auto_translate": "识别每条文本的语言：中文翻译成英文，其他语言翻译成中文",
+}
+
+_CODE_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def get_batch_config() -> Dict[str, Any]:
+    """读取配置中的 batch 段"""
+    return getattr(settings, "batch", None) or {}
+
+
+def pack_segments(
+    segments: List[str],
+    indices: List[int],
+    max_tokens: Optional[int] = None,
+    max_items: Optional[int] = None,
+) -> List[List[int]]:
+    """按 token 预算与条数上限把待翻译条目（下标）贪心打包"""
+    config = get_batch_config()
+    max_tokens = max_tokens or int(config.get("max_pack_tokens", 1000))
+    max_items = max_items or int(config.get("max_segments_per_pack", 40))
+
+    packs: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for index in indices:
+        # 每条额外计入编号与 JSON 结构的开销
+        size = estimate_tokens(segments[index]) + 8
+        if current and (used + size > max_tokens or len(current) >= max_items):
+            packs.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += size
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_batch_prompt(operation: str, segments: List[str], pack: List[int]) -> str:
+    """生成一包条目的批量翻译提示词（id 为包内从 1 开始的序号）"""
+    from .prompt.templates import prompt_manager
+
+    items = [{"id": n, "text": segments[index]} for n, index in enumerate(pack, start=1)]
+    return prompt_manager.translation.BATCH_TRANSLATE.format(
+        instruction=BATCH_INSTRUCTIONS[operation],
+        items=json.dumps(items, ensure_ascii=False, indent=0),
+    )
+
+
+def parse_batch_response(response: str, size: int) -> Dict[int, str]:
+    """解析模型返回的 JSON 数组，返回 包内序号 -> 译文；无法识别的条目缺省"""
+    text = _CODE_FENCE_RE.sub("", (response or "").strip())
+    start, end = text.find("["), text.rfind("]")
+    if start < 0 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except (ValueError, TypeError):
+        return {}
+    if not isinstance(data, list):
+        return {}
+
+    parsed: Dict[int, str] = {}
+    if len(data) == size and all(isinstance(item, str) for item in data):
+        # 兼容直接返回字符串数组的情况
+        return {n: item for n, item in enumerate(data, start=1) if item.strip()}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            n = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        value = item.get("text")
+        if 1 <= n <= size and isinstance(value, str) and value.strip():
+            parsed[n] = value.strip()
+    return parsed
@@ -123,29 +123,19 @@ def create_email_notification_callback(email: str) -> Callable:
 
 
 def create_webhook_callback(webhook_url: str) -> Callable:
-    """创建 Webhook 回调函数"""
+    """创建 Webhook 回调函数（经后台投递器发送，共用连接池并失败重试）"""
     async def webhook_callback(failure_data: Dict[str, Any]):
-        try:
-            import httpx
-            
-            payload = {
-                "event": "task_failed",
-                "task_id": failure_data['task_id'],
-                "task_type": failure_data['task_type'],
-                "error_message": failure_data['error_message'],
-                "retry_count": failure_data['retry_count'],
-                "max_retries": failure_data['max_retries'],
-                "failed_at": failure_data['failed_at'].isoformat() if hasattr(failure_data['failed_at'], 'isoformat') else str(failure_data['failed_at'])
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(webhook_url, json=payload, timeout=10)
-                response.raise_for_status()
-                
-            logger.info(f"Sent webhook notification to {webhook_url}")
-            
-        except Exception as e:
-            logger.error(f"Failed to send webhook notification: {e}")
+        from .webhook_dispatcher import webhook_dispatcher
+
+        payload = {
+            "task_id": failure_data['task_id'],
+            "task_type": failure_data['task_type'],
+            "error_message": failure_data['error_message'],
+            "retry_count": failure_data['retry_count'],
+            "max_retries": failure_data['max_retries'],
+            "failed_at": failure_data['failed_at'].isoformat() if hasattr(failure_data['failed_at'], 'isoformat') else str(failure_data['failed_at'])
+        }
+        webhook_dispatcher.submit(webhook_url, "task_failed", payload)
     
     return webhook_callback
 
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长文档分块处理
+基于 langchain-text-splitters 按段落/句子切分中英混排文本，分块并发处理后按原顺序拼接。
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 中日韩字符（含全角标点），按每字约 1 token 估算
+_CJK_RE = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+
+# 分隔符优先级：段落 > 换行 > 中文句末标点 > 英文句末标点 > 分句标点 > 空格 > 字符
+# 使用零宽断言/句末空白作为分隔，切分后各块首尾相接即为原文
+_SEPARATORS = [
+    r"\n\n+",
+    r"\n",
+    r"(?<=[。！？…])",
+    r"(?<=[.!?])\s+",
+    r"(?<=[；;])",
+    r"(?<=[，、,])",
+    r"\s+",
+    "",
+]
+
+_SENTENCE_RE = re.compile(r"[^。！？…!?.\n]*(?:[。！？…]+[”’」』）)]*|[.!?]+(?=\s|$)|\n|$)")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符约 1 字 1 token，其余字符约 4 字 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def contains_cjk(text: str) -> bool:
+    """文本是否包含中日韩字符"""
+    return bool(_CJK_RE.search(text or ""))
+
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点切分句子（去除空白句）"""
+    return [s.strip() for s in _SENTENCE_RE.findall(text or "") if s.strip()]
+
+
+def get_chunking_config() -> Dict[str, Any]:
+    """读取配置中的 chunking 段"""
+    return getattr(settings, "chunking", None) or {}
+
+
+@dataclass
+class TextChunk:
+    """文本分块：text 为去除首尾空白后的正文，leading/trailing 为原文中的首尾空白"""
+    index: int
+    text: str
+    leading: str = ""
+    trailing: str = ""
+
+    @property
+    def is_blank(self) -> bool:
+        return not self.text
+
+
+def split_into_chunks(text: str, max_tokens: Optional[int] = None) -> List[TextChunk]:
+    """将文本切分为不超过 max_tokens（估算）的分块，保留块间空白以便还原格式"""
+    max_tokens = max_tokens or int(get_chunking_config().get("max_chunk_tokens", 800))
+    splitter = RecursiveCharacterTextSplitter(
+        separators=_SEPARATORS,
+        is_separator_regex=True,
+        keep_separator="end",
+        strip_whitespace=False,
+        chunk_size=max_tokens,
+        chunk_overlap=0,
+        length_function=estimate_tokens,
+    )
+
+    chunks: List[TextChunk] = []
+    for piece in splitter.split_text(text or ""):
+        body = piece.strip()
+        if not body and chunks:
+            # 纯空白片段并入上一块的尾部
+            chunks[-1].trailing += piece
+            continue
+        leading = piece[: len(piece) - len(piece.lstrip())]
+        trailing = piece[len(piece.rstrip()):] if body else ""
+        chunks.append(TextChunk(index=len(chunks), text=body, leading=leading, trailing=trailing))
+    return chunks
+
+
+def neighbour_context(chunks: List[TextChunk], index: int, sentences: int) -> Optional[Dict[str, str]]:
+    """取相邻分块中紧挨当前块的若干句子作为上下文"""
+    if sentences <= 0:
+        return None
+    before = split_sentences(chunks[index - 1].text)[-sentences:] if index > 0 else []
+    after = split_sentences(chunks[index + 1].text)[:sentences] if index + 1 < len(chunks) else []
+    if not before and not after:
+        return None
+    return {"before": " ".join(before), "after": " ".join(after)}
+
+
+def format_chunk_with_context(text: str, context: Optional[Dict[str, str]]) -> str:
+    """将相邻句子上下文与分块正文组合为待翻译文本"""
+    if not context:
+        return text
+    from .prompt.templates import prompt_manager
+    return prompt_manager.translation.CHUNK_WITH_CONTEXT.format(
+        text=text,
+        before=context.get("before") or "（无）",
+        after=context.get("after") or "（无）",
+    )
+
+
+def reassemble(chunks: List[TextChunk], outputs: List[str], joiner: str = "") -> str:
+    """按原顺序拼接分块结果；原文块间无空白时以 joiner 连接（如译为英文时补空格）"""
+    parts: List[str] = []
+    for i, (chunk, output) in enumerate(zip(chunks, outputs)):
+        parts.append(chunk.leading)
+        parts.append(output.strip() if not chunk.is_blank else "")
+        parts.append(chunk.trailing)
+        if joiner and not chunk.trailing and i + 1 < len(chunks) and not chunks[i + 1].leading:
+            parts.append(joiner)
+    return "".join(parts)
+
+
+# 每个事件循环、每个模型一把信号量，限制同一模型的分块并发
+_model_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_model_semaphore(model_key: Optional[str], limit: Optional[int] = None) -> asyncio.Semaphore:
+    """获取当前事件循环中指定模型的分块并发信号量"""
+    loop = asyncio.get_running_loop()
+    per_loop = _model_semaphores.setdefault(loop, {})
+    key = model_key or "default"
+    semaphore = per_loop.get(key)
+    if semaphore is None:
+        limit = limit or int(get_chunking_config().get("concurrency_per_model", 4))
+        semaphore = asyncio.Semaphore(max(1, limit))
+        per_loop[key] = semaphore
+    return semaphore
+
+
+class ChunkCheckpoint:
+    """分块结果检查点
+
+    已成功的分块结果按分块内容摘要保存在 results 中（由调用方随任务记录持久化），
+    重试时命中的分块直接复用，只重新请求失败的分块；同时统计已完成/总分块数作为进度。
+    数量事先未知的后续分块（如 map_reduce 的归并层）用 reserve 预留上限，expect 优先消耗预留，
+    结束时 release 归还未用部分，使进度只增不减。
+    on_update(checkpoint) 在总数或完成数变化后调用。
+    """
+
+    def __init__(
+        self,
+        results: Optional[Dict[str, str]] = None,
+        on_update: Optional[Callable[["ChunkCheckpoint"], None]] = None,
+    ):
+        self.results: Dict[str, str] = results if results is not None else {}
+        self.on_update = on_update
+        self.total = 0
+        self.done = 0
+        self.resumed = 0
+        self.reserved = 0
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+    def expect(self, count: int) -> None:
+        used = min(count, self.reserved)
+        self.reserved -= used
+        self.total += count - used
+        self._updated()
+
+    def reserve(self, count: int) -> None:
+        self.reserved += count
+        self.total += count
+        self._updated()
+
+    def release(self) -> None:
+        if self.reserved:
+            self.total -= self.reserved
+            self.reserved = 0
+            self._updated()
+
+    def lookup(self, text: str) -> Optional[str]:
+        result = self.results.get(self.key(text))
+        if result is not None:
+            self.resumed += 1
+            self.done += 1
+            self._updated()
+        return result
+
+    def record(self, text: str, result: str) -> None:
+        self.results[self.key(text)] = result
+        self.done += 1
+        self._updated()
+
+    def _updated(self) -> None:
+        if self.on_update is not None:
+            self.on_update(self)
+
+
+_current_checkpoint: ContextVar[Optional[ChunkCheckpoint]] = ContextVar("chunk_checkpoint", default=None)
+
+
+@contextmanager
+def use_checkpoint(checkpoint: Optional[ChunkCheckpoint]) -> Iterator[Optional[ChunkCheckpoint]]:
+    """在当前上下文（含其中创建的子任务）中启用分块检查点"""
+    token = _current_checkpoint.set(checkpoint)
+    try:
+        yield checkpoint
+    finally:
+        _current_checkpoint.reset(token)
+
+
+async def _compute_chunk(compute: Callable[[], Awaitable[str]]) -> str:
+    """计算一个分块；降级的错误提示文本抛出 DegradedResponseError，不混入拼接结果"""
+    from .langchain_service import is_successful_response
+    from ..utils.exceptions import DegradedResponseError
+    result = await compute()
+    if isinstance(result, str) and not is_successful_response(result):
+        raise DegradedResponseError(result)
+    return result
+
+
+async def run_checkpointed(text: str, compute: Callable[[], Awaitable[str]]) -> str:
+    """处理一个分块：检查点中已有结果时直接返回，否则计算并记录（失败的分块不记录，重试时重新请求）"""
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is None:
+        return await _compute_chunk(compute)
+    cached = checkpoint.lookup(text)
+    if cached is not None:
+        return cached
+    result = await _compute_chunk(compute)
+    checkpoint.record(text, result)
+    return result
+
+
+def should_chunk(text: str, chunked: Optional[bool] = None) -> bool:
+    """是否走分块流程：显式指定优先，否则超过自动阈值时分块"""
+    if chunked is not None:
+        return chunked
+    config = get_chunking_config()
+    if not config.get("enabled", True):
+        return False
+    return estimate_tokens(text) > int(config.get("auto_threshold_tokens", 1500))
+
+
+async def map_chunks(
+    chunks: List[TextChunk],
+    fn: Callable[[TextChunk], Awaitable[str]],
+    model_key: Optional[str] = None,
+    concurrency: Optional[int] = None,
+) -> List[str]:
+    """并发处理各分块（受单模型并发上限约束），结果按分块顺序返回；启用检查点时跳过已完成的分块"""
+    semaphore = get_model_semaphore(model_key, concurrency)
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is not None:
+        checkpoint.expect(sum(1 for chunk in chunks if not chunk.is_blank))
+
+    async def compute(chunk: TextChunk) -> str:
+        async with semaphore:
+            return await fn(chunk)
+
+    async def run(chunk: TextChunk) -> str:
+        if chunk.is_blank:
+            return ""
+        return await run_checkpointed(chunk.text, lambda: compute(chunk))
+
+    if not chunks:
+        return []
+    tasks = [asyncio.ensure_future(run(chunk)) for chunk in chunks]
+    done: set = set()
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # 任一分块失败（或外层被取消）时取消其余分块，不再为注定失败的请求继续占用模型并发
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    for task in tasks:
+        if task in done and not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+async def translate_chunked(
+    text: str,
+    translate_fn: Callable[[str, Optional[Dict[str, str]]], Awaitable[str]],
+    model_key: Optional[str] = None,
+    target_is_cjk: bool = False,
+    max_chunk_tokens: Optional[int] = None,
+    context_sentences: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> str:
+    """分块翻译长文档
+
+    translate_fn(chunk_text, context) 翻译单个分块，context 为相邻句子（未启用时为 None）。
+    """
+    config = get_chunking_config()
+    if context_sentences is None:
+        context_sentences = int(config.get("context_sentences", 0))
+    chunks = split_into_chunks(text, max_chunk_tokens)
+    logger.info(f"Chunked translation: {len(text)} chars -> {len(chunks)} chunks, model={model_key}")
+
+    async def translate_one(chunk: TextChunk) -> str:
+        context = neighbour_context(chunks, chunk.index, context_sentences)
+        return await translate_fn(chunk.text, context)
+
+    outputs = await map_chunks(chunks, translate_one, model_key, concurrency)
+    return reassemble(chunks, outputs, joiner="" if target_is_cjk else " ")
+
+
+# 总结模式：single 一次调用；map_reduce 分块并行总结后树形归并；refine 逐块滚动精炼
+SUMMARY_MODES = ("single", "map_reduce", "refine")
+
+
+def resolve_summary_mode(text: str, mode: Optional[str] = None) -> str:
+    """确定总结模式：显式指定优先，否则超过自动阈值时使用 map_reduce"""
+    if mode:
+        mode = getattr(mode, "value", mode)
+        if mode not in SUMMARY_MODES:
+            raise ValueError(f"Unsupported summary mode: {mode}")
+        return mode
+    return "map_reduce" if should_chunk(text) else "single"
+
+
+def _group_by_budget(parts: List[str], max_tokens: int) -> List[List[str]]:
+    """将中间总结按 token 预算贪心分组；每组至少两项以保证每轮归并都能收敛"""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for part in parts:
+        size = estimate_tokens(part)
+        if current and used + size > max_tokens and len(current) >= 2:
+            groups.append(current)
+            current, used = [], 0
+        current.append(part)
+        used += size
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+    return groups
+
+
+def _max_reduce_calls(count: int, max_levels: int) -> int:
+    """map_reduce 归并阶段的调用数上限：每层分组至少两项，分组数不超过上一层的一半"""
+    calls = 0
+    for _ in range(max_levels):
+        if count <= 1:
+            break
+        count //= 2
+        calls += count
+    return calls
+
+
+async def summarize_map_reduce(
+    text: str,
+    summarize_fn: Callable[[str], Awaitable[str]],
+    finalize_fn: Optional[Callable[[str], Awaitable[str]]] = None,
+    model_key: Optional[str] = None,
+    max_chunk_tokens: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    max_levels: int = 5,
+) -> str:
+    """map-reduce 总结：分块并行总结，再按预算分组树形归并，直至合并内容可一次生成最终结果
+
+    summarize_fn 生成中间总结；finalize_fn 基于归并后的内容生成最终结果（默认同 summarize_fn）。
+    """
+    finalize_fn = finalize_fn or summarize_fn
+    budget = max_chunk_tokens or int(get_chunking_config().get("max_chunk_tokens", 800))
+    chunks = [c for c in split_into_chunks(text, budget) if not c.is_blank]
+    if len(chunks) <= 1:
+        return await finalize_fn(text)
+
+    async def summarize_chunk(chunk: TextChunk) -> str:
+        return await summarize_fn(chunk.text)
+
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is not None:
+        # 预先预留分块总结数与归并调用数上限（每层分组至少两项），进度不会因新增归并层而回退
+        checkpoint.reserve(len(chunks) + _max_reduce_calls(len(chunks), max_levels))
+    partials = await map_chunks(chunks, summarize_chunk, model_key, concurrency)
+    level = 0
+    while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > budget and level < max_levels:
+        groups = _group_by_budget(partials, budget)
+        merged = [TextChunk(index=i, text="\n\n".join(g)) for i, g in enumerate(groups)]
+        partials = await map_chunks(merged, summarize_chunk, model_key, concurrency)
+        level += 1
+    if checkpoint is not None:
+        checkpoint.release()
+    logger.info(f"Map-reduce summary: {len(chunks)} chunks, {level} reduce levels, model={model_key}")
+    return await finalize_fn("\n\n".join(p.strip() for p in partials if p.strip()))
+
+
+def format_refine_input(summary: str, text: str) -> str:
+    """将已有总结与新增原文组合为 refine 模式的待总结文本"""
+    from .prompt.templates import prompt_manager
+    return prompt_manager.summarization.REFINE_INPUT.format(summary=summary, text=text)
+
+
+async def summarize_refine(
+    text: str,
+    summarize_fn: Callable[[str], Awaitable[str]],
+    finalize_fn: Optional[Callable[[str], Awaitable[str]]] = None,
+    max_chunk_tokens: Optional[int] = None,
+) -> str:
+    """refine 总结：按顺序逐块把新内容并入已有总结，适合前后文依赖强的长文本（串行执行）"""
+    chunks = [c for c in split_into_chunks(text, max_chunk_tokens) if not c.is_blank]
+    checkpoint = _current_checkpoint.get()
+    if checkpoint is not None:
+        checkpoint.expect(len(chunks))
+    summary: Optional[str] = None
+    for chunk in chunks:
+        source = chunk.text if summary is None else format_refine_input(summary, chunk.text)
+        # 每一步的输入包含上一步的总结，复用检查点时逐步得到相同的输入
+        summary = (await run_checkpointed(source, lambda: summarize_fn(source))).strip()
+    if finalize_fn is not None:
+        return await finalize_fn(summary or text)
+    return summary or ""
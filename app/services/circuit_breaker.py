@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型熔断与故障转移
+每个模型服务实例一个熔断器（closed / open / half_open），基于最近若干次调用的
+错误率与慢调用比例决定是否熔断；路由时直接跳过已熔断的模型并转移到下一个配置的模型，
+避免在故障服务商上反复等待超时。
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from ..core.config import settings
+from ..utils.exceptions import CircuitOpenError, InvalidRequestError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DEFAULTS: Dict[str, Any] = {
+    "enabled": True,
+    "failover": True,
+    "window_size": 20,
+    "min_calls": 5,
+    "failure_rate_threshold": 0.5,
+    "slow_call_seconds": 30.0,
+    "slow_call_rate_threshold": 0.8,
+    "open_seconds": 30.0,
+    "half_open_max_calls": 2,
+}
+
+# 这些 4xx 状态码说明服务商本身不可用或拒绝服务，计入熔断；其余 4xx 视为请求自身问题
+_PROVIDER_CLIENT_STATUSES = {401, 403, 408, 429}
+
+
+def get_circuit_breaker_config() -> Dict[str, Any]:
+    """读取配置中的 circuit_breaker 段（缺省项使用默认值）"""
+    return {**_DEFAULTS, **(getattr(settings, "circuit_breaker", None) or {})}
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """异常是否应计为服务商故障（请求参数错误等不计入，也不触发转移）"""
+    if isinstance(error, InvalidRequestError):
+        return False
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(error, "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in _PROVIDER_CLIENT_STATUSES:
+        return False
+    return True
+
+
+class CircuitState(str, Enum):
+    """熔断器状态"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个模型服务的熔断器
+
+    - closed：正常放行，滚动窗口内错误率或慢调用比例超过阈值时转为 open
+    - open：直接拒绝，open_seconds 后转为 half_open
+    - half_open：最多放行 half_open_max_calls 个探测请求，全部成功则恢复 closed，任一失败重新 open
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 30.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 2,
+    ):
+        self.name = name
+        self.min_calls = max(1, int(min_calls))
+        self.failure_rate_threshold = float(failure_rate_threshold)
+        self.slow_call_seconds = float(slow_call_seconds)
+        self.slow_call_rate_threshold = float(slow_call_rate_threshold)
+        self.open_seconds = float(open_seconds)
+        self.half_open_max_calls = max(1, int(half_open_max_calls))
+
+        # 滚动窗口：(是否成功, 耗时秒数)
+        self._window: Deque[Tuple[bool, float]] = deque(maxlen=max(1, int(window_size)))
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._opened_count = 0
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == CircuitState.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            logger.info(f"CircuitBreaker[{self.name}]: half-open, probing")
+
+    def _open(self, now: float, reason: str) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self._opened_count += 1
+        logger.warning(f"CircuitBreaker[{self.name}]: opened ({reason})")
+
+    def is_available(self) -> bool:
+        """是否可能放行请求（不占用探测名额，用于路由选择）"""
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == CircuitState.OPEN:
+                return False
+            if self._state == CircuitState.HALF_OPEN:
+                return self._probes_in_flight < self.half_open_max_calls
+            return True
+
+    def allow_request(self) -> bool:
+        """申请放行一次调用；half_open 状态下占用一个探测名额"""
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+                self._probes_in_flight += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def retry_after(self) -> float:
+        """距离进入 half_open 的剩余秒数"""
+        with self._lock:
+            if self._state != CircuitState.OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self, latency: float) -> None:
+        self._record(True, latency)
+
+    def record_failure(self, latency: float) -> None:
+        self._record(False, latency)
+
+    def release(self) -> None:
+        """放弃一次已放行的调用（如被取消），不计入统计"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def _record(self, success: bool, latency: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if not success:
+                    self._open(now, "probe failed")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_max_calls:
+                    self._state = CircuitState.CLOSED
+                    self._window.clear()
+                    logger.info(f"CircuitBreaker[{self.name}]: closed after successful probes")
+                return
+            if self._state == CircuitState.OPEN:
+                # 熔断前已放行的调用迟到的结果，不影响状态
+                return
+
+            self._window.append((success, latency))
+            calls = len(self._window)
+            if calls < self.min_calls:
+                return
+            failure_rate = sum(1 for ok, _ in self._window if not ok) / calls
+            slow_rate = sum(1 for _, t in self._window if t >= self.slow_call_seconds) / calls
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(now, f"failure rate {failure_rate:.0%}")
+            elif slow_rate >= self.slow_call_rate_threshold:
+                self._open(now, f"slow call rate {slow_rate:.0%}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._window.clear()
+            self._state = CircuitState.CLOSED
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            window = list(self._window)
+        latencies = sorted(t for _, t in window)
+        calls = len(window)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, math.ceil(p * len(latencies)) - 1)] * 1000, 1)
+
+        return {
+            "state": state.value,
+            "window_calls": calls,
+            "failure_rate": round(sum(1 for ok, _ in window if not ok) / calls, 4) if calls else 0.0,
+            "slow_call_rate": round(sum(1 for _, t in window if t >= self.slow_call_seconds) / calls, 4) if calls else 0.0,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p99_ms": percentile(0.99),
+            "rejected": self._rejected,
+            "opened_count": self._opened_count,
+            "retry_after_seconds": round(self.retry_after(), 1),
+        }
+
+
+class CircuitBreakerRegistry:
+    """按模型名登记的熔断器（AIModelManager 与 LangChainManager 共用）"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                config = get_circuit_breaker_config()
+                breaker = CircuitBreaker(
+                    name,
+                    window_size=config["window_size"],
+                    min_calls=config["min_calls"],
+                    failure_rate_threshold=config["failure_rate_threshold"],
+                    slow_call_seconds=config["slow_call_seconds"],
+                    slow_call_rate_threshold=config["slow_call_rate_threshold"],
+                    open_seconds=config["open_seconds"],
+                    half_open_max_calls=config["half_open_max_calls"],
+                )
+                self._breakers[name] = breaker
+            return breaker
+
+    def is_available(self, name: str) -> bool:
+        if not get_circuit_breaker_config()["enabled"]:
+            return True
+        return self.get(name).is_available()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.get_stats() for name, breaker in list(self._breakers.items())}
+
+
+def failover_order(primary: Optional[str], configured: List[str]) -> List[str]:
+    """候选模型顺序：首选模型在前，启用故障转移时其余模型按配置顺序跟随"""
+    if primary is None:
+        return []
+    if not get_circuit_breaker_config()["failover"]:
+        return [primary]
+    return [primary] + [name for name in configured if name != primary]
+
+
+async def call_with_failover(
+    candidates: List[str],
+    invoke: Callable[[str], Awaitable[T]],
+    is_failure: Optional[Callable[[T], bool]] = None,
+    registry: Optional["CircuitBreakerRegistry"] = None,
+) -> T:
+    """依次尝试候选模型：跳过已熔断的模型，服务商故障时转移到下一个
+
+    is_failure 用于识别以返回值表示的失败（如降级的错误提示文本）；全部失败时
+    返回最后一个失败结果或抛出最后一个异常，全部熔断时抛出 CircuitOpenError。
+    """
+    registry = registry or circuit_breakers
+    if not get_circuit_breaker_config()["enabled"]:
+        return await invoke(candidates[0])
+
+    last_error: Optional[BaseException] = None
+    last_result: Any = None
+    has_result = False
+    skipped: List[str] = []
+    for name in candidates:
+        breaker = registry.get(name)
+        if not breaker.allow_request():
+            skipped.append(name)
+            continue
+        started = time.monotonic()
+        try:
+            result = await invoke(name)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if not is_provider_failure(e):
+                breaker.release()
+                raise
+            breaker.record_failure(time.monotonic() - started)
+            logger.warning(f"Model {name} failed ({type(e).__name__}: {e}), trying next candidate")
+            last_error = e
+            continue
+        if is_failure is not None and is_failure(result):
+            breaker.record_failure(time.monotonic() - started)
+            logger.warning(f"Model {name} returned a failure response, trying next candidate")
+            last_result, has_result = result, True
+            continue
+        breaker.record_success(time.monotonic() - started)
+        return result
+
+    if has_result:
+        return last_result
+    if last_error is not None:
+        raise last_error
+    retry_after = min((registry.get(name).retry_after() for name in skipped), default=0.0)
+    raise CircuitOpenError(skipped, max(1, math.ceil(retry_after)))
+
+
+# 全局熔断器登记表
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对冲请求（hedged requests）
+同步接口中的短文本模型调用若在该模型观测到的 p95 延迟内仍未返回，就向下一个候选后端
+再发一份相同请求，采用先返回的结果并取消另一份。额外请求数受预算比例限制。
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 当前请求所在的同步接口路径；异步任务等后台调用不在该作用域内，不做对冲
+_hedge_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("hedge_route", default=None)
+
+
+def enter_route(path: str) -> None:
+    """标记当前请求为可对冲的同步接口调用（由路由依赖调用）"""
+    _hedge_route.set(path)
+
+
+class HedgingController:
+    """对冲策略：按模型统计延迟分位数，按预算决定是否发出对冲请求"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        budget_ratio: float = 0.05,
+        max_burst: int = 10,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        min_delay_ms: float = 20,
+        max_prompt_tokens: int = 1000,
+        models: Optional[List[str]] = None,
+        routes: Optional[List[str]] = None,
+        window_size: int = 200,
+    ):
+        self.enabled = enabled
+        self.budget_ratio = float(budget_ratio)
+        self.max_burst = float(max_burst)
+        self.percentile = float(percentile)
+        self.min_samples = int(min_samples)
+        self.min_delay = float(min_delay_ms) / 1000
+        self.max_prompt_tokens = int(max_prompt_tokens)
+        self.models = set(models or [])
+        self.routes = set(routes or [])
+        self.window_size = int(window_size)
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._credits = 0.0
+        self._lock = threading.Lock()
+        self._stats = {
+            "eligible_requests": 0,
+            "hedges_sent": 0,
+            "hedge_wins": 0,
+            "primary_wins": 0,
+            "budget_exhausted": 0,
+        }
+
+    def observe(self, model: str, latency: float) -> None:
+        """记录一次调用的耗时"""
+        with self._lock:
+            samples = self._latencies.get(model)
+            if samples is None:
+                samples = self._latencies[model] = deque(maxlen=self.window_size)
+            samples.append(latency)
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """对冲触发延迟：该模型观测到的分位数延迟；样本不足时返回 None（不对冲）"""
+        with self._lock:
+            samples = sorted(self._latencies.get(model) or ())
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, math.ceil(self.percentile * len(samples)) - 1)
+        return max(self.min_delay, samples[index])
+
+    def _eligible(self, candidates: List[str], prompt_tokens: int) -> bool:
+        if not self.enabled or len(candidates) < 2:
+            return False
+        route = _hedge_route.get()
+        if route is None or (self.routes and route not in self.routes):
+            return False
+        if self.models and candidates[0] not in self.models:
+            return False
+        return prompt_tokens <= self.max_prompt_tokens
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self._credits >= 1:
+                self._credits -= 1
+                return True
+            self._stats["budget_exhausted"] += 1
+            return False
+
+    async def _timed(self, model: str, awaitable: Awaitable[T]) -> T:
+        started = time.monotonic()
+        try:
+            result = await awaitable
+        except asyncio.CancelledError:
+            # 被对冲取消的首发请求至少耗时这么久，按截尾样本计入，避免分位数被低估
+            self.observe(model, time.monotonic() - started)
+            raise
+        self.observe(model, time.monotonic() - started)
+        return result
+
+    async def run(
+        self,
+        candidates: List[str],
+        attempt: Callable[[List[str]], Awaitable[T]],
+        prompt_tokens: int = 0,
+    ) -> T:
+        """执行一次调用：attempt(候选列表) 负责实际调用（含熔断与故障转移）
+
+        首发请求使用完整候选列表；对冲请求使用去掉首选后端后的候选列表。
+        """
+        if not candidates:
+            return await attempt(candidates)
+        primary = candidates[0]
+        if not self._eligible(candidates, prompt_tokens):
+            return await self._timed(primary, attempt(candidates))
+
+        with self._lock:
+            self._stats["eligible_requests"] += 1
+            self._credits = min(self.max_burst, self._credits + self.budget_ratio)
+        delay = self.hedge_delay(primary)
+        if delay is None:
+            return await self._timed(primary, attempt(candidates))
+
+        first = asyncio.ensure_future(self._timed(primary, attempt(candidates)))
+        hedge: Optional[asyncio.Future] = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done or not self._take_budget():
+                return await first
+
+            logger.info(f"Hedging request to {candidates[1]} after {delay * 1000:.0f}ms on {primary}")
+            hedge = asyncio.ensure_future(attempt(candidates[1:]))
+            with self._lock:
+                self._stats["hedges_sent"] += 1
+            pending = {first, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        with self._lock:
+                            self._stats["hedge_wins" if task is hedge else "primary_wins"] += 1
+                        return task.result()
+                    if error is None or task is first:
+                        error = task.exception()
+            raise error
+        finally:
+            for task in (first, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            credits = self._credits
+            models = {name: len(samples) for name, samples in self._latencies.items()}
+        hedges = stats["hedges_sent"]
+        decided = stats["hedge_wins"] + stats["primary_wins"]
+        return {
+            "enabled": self.enabled,
+            "budget_ratio": self.budget_ratio,
+            "budget_credits": round(credits, 3),
+            **stats,
+            "hedge_rate": round(hedges / stats["eligible_requests"], 4) if stats["eligible_requests"] else 0.0,
+            "hedge_win_rate": round(stats["hedge_wins"] / decided, 4) if decided else 0.0,
+            "models": {name: self._model_stats(name, count) for name, count in models.items()},
+        }
+
+    def _model_stats(self, name: str, samples: int) -> Dict[str, Any]:
+        delay = self.hedge_delay(name)
+        return {"samples": samples, "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None}
+
+
+def _create_hedging_controller() -> HedgingController:
+    config = getattr(settings, "hedging", None) or {}
+    return HedgingController(
+        enabled=bool(config.get("enabled", False)),
+        budget_ratio=float(config.get("budget_ratio", 0.05)),
+        max_burst=int(config.get("max_burst", 10)),
+        percentile=float(config.get("percentile", 0.95)),
+        min_samples=int(config.get("min_samples", 20)),
+        min_delay_ms=float(config.get("min_delay_ms", 20)),
+        max_prompt_tokens=int(config.get("max_prompt_tokens", 1000)),
+        models=config.get("models") or [],
+        routes=config.get("routes") or [],
+    )
+
+
+# 全局对冲控制器
+hedging = _create_hedging_controller()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同一服务商的 API Key 池
+模型配置可通过 api_keys / base_urls 声明多个 Key 或接入地址，调用时按轮询或最少在途请求选择，
+每个 Key 单独计算 RPM/TPM 额度；返回 429 的 Key 进入冷却期，冷却期内优先使用其他 Key。
+AIModelManager 与 LangChain 按模型名共用同一个 Key 池。
+"""
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_STRATEGIES = ("least_loaded", "round_robin")
+
+
+def _as_list(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if v]
+    return [str(value)]
+
+
+def normalize_model_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """api_key / base_url 允许直接写成列表：拆到 api_keys / base_urls，并以首个值作为默认值"""
+    config = dict(config)
+    keys = _as_list(config.get("api_keys")) or _as_list(config.get("api_key"))
+    urls = _as_list(config.get("base_urls")) or _as_list(config.get("base_url"))
+    if len(keys) > 1 or isinstance(config.get("api_key"), (list, tuple)):
+        config["api_keys"] = keys
+        config["api_key"] = keys[0] if keys else None
+    elif keys and not config.get("api_key"):
+        config["api_key"] = keys[0]
+    if len(urls) > 1 or isinstance(config.get("base_url"), (list, tuple)):
+        config["base_urls"] = urls
+        config["base_url"] = urls[0] if urls else None
+    elif urls and not config.get("base_url"):
+        config["base_url"] = urls[0]
+    return config
+
+
+class KeySlot:
+    """池中的一个 (api_key, base_url) 组合"""
+
+    def __init__(self, pool_name: str, index: int, api_key: Optional[str], base_url: Optional[str], config: Dict[str, Any]):
+        self.index = index
+        self.api_key = api_key
+        self.base_url = base_url
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.cooldown_until = 0.0
+        # 单 Key 时沿用模型级限流器；多 Key 时每个 Key 单独计算 rpm/tpm
+        self.limiter_config = config if index < 0 else {
+            "name": f"{pool_name}#key{index}",
+            "rpm": config.get("rpm") or config.get("requests_per_minute"),
+            "tpm": config.get("tpm") or config.get("tokens_per_minute"),
+        }
+
+    def cooling_down(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def get_stats(self, now: float) -> Dict[str, Any]:
+        key = self.api_key or ""
+        return {
+            "index": max(self.index, 0),
+            "key": f"...{key[-4:]}" if len(key) > 4 else ("set" if key else None),
+            "base_url": self.base_url,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "cooldown_remaining_seconds": round(max(0.0, self.cooldown_until - now), 1),
+        }
+
+
+class KeyPool:
+    """模型的 Key 池：选择、在途计数与 429 冷却"""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        config = normalize_model_config(config)
+        self.name = name
+        self.strategy = config.get("key_strategy", "least_loaded")
+        if self.strategy not in KEY_STRATEGIES:
+            logger.warning(f"Unknown key strategy '{self.strategy}' for {name}, using least_loaded")
+            self.strategy = "least_loaded"
+        self.cooldown_seconds = float(config.get("key_cooldown_seconds", 30))
+
+        keys = _as_list(config.get("api_keys")) or [config.get("api_key")]
+        urls = _as_list(config.get("base_urls")) or [config.get("base_url")]
+        size = max(len(keys), len(urls))
+        if size == 1:
+            self.slots = [KeySlot(name, -1, keys[0], urls[0], config)]
+        else:
+            # Key 与地址按下标配对，数量不同时循环复用较短的一方
+            self.slots = [
+                KeySlot(name, i, keys[i % len(keys)], urls[i % len(urls)], config) for i in range(size)
+            ]
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def pooled(self) -> bool:
+        return len(self.slots) > 1
+
+    def _choose(self) -> KeySlot:
+        now = time.monotonic()
+        ready = [s for s in self.slots if not s.cooling_down(now)]
+        if not ready:
+            # 全部在冷却：选最早结束冷却的 Key
+            return min(self.slots, key=lambda s: s.cooldown_until)
+        if self.strategy == "round_robin":
+            start = next(self._rr)
+            ordered = [self.slots[(start + i) % len(self.slots)] for i in range(len(self.slots))]
+            return next(s for s in ordered if s in ready)
+        return min(ready, key=lambda s: (s.in_flight, s.requests))
+
+    @contextmanager
+    def use(self) -> Iterator[KeySlot]:
+        """选择一个 Key 并在调用期间计入其在途请求数"""
+        with self._lock:
+            slot = self._choose()
+            slot.in_flight += 1
+            slot.requests += 1
+        try:
+            yield slot
+        finally:
+            with self._lock:
+                slot.in_flight -= 1
+
+    def cool_down(self, slot: KeySlot, retry_after: Optional[float] = None) -> None:
+        """Key 返回 429 后进入冷却（优先使用服务商给出的 Retry-After）"""
+        seconds = retry_after if retry_after and retry_after > 0 else self.cooldown_seconds
+        with self._lock:
+            slot.rate_limited += 1
+            slot.cooldown_until = max(slot.cooldown_until, time.monotonic() + seconds)
+        if self.pooled:
+            logger.warning(f"KeyPool[{self.name}]: key #{slot.index} rate limited, cooling down {seconds:.0f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "keys": [slot.get_stats(now) for slot in self.slots],
+            }
+
+
+def retry_after_seconds(error_or_response: Any) -> Optional[float]:
+    """从 429 响应（或携带响应的异常）中读取 Retry-After 秒数"""
+    response = getattr(error_or_response, "response", error_or_response)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """异常是否为服务商 429 限流"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+class KeyPoolRegistry:
+    """按模型名登记的 Key 池"""
+
+    def __init__(self):
+        self._pools: Dict[str, KeyPool] = {}
+        self._lock = threading.Lock()
+
+    def for_config(self, config: Dict[str, Any]) -> KeyPool:
+        name = config.get("name") or config.get("model") or "default"
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                pool = self._pools[name] = KeyPool(name, config)
+                if pool.pooled:
+                    logger.info(f"KeyPool[{name}]: {len(pool.slots)} keys, strategy={pool.strategy}")
+            return pool
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pools.clear()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.get_stats() for name, pool in list(self._pools.items()) if pool.pooled}
+
+
+# 全局 Key 池登记表
+key_pools = KeyPoolRegistry()
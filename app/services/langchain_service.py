@@ -5,13 +5,16 @@
 """
 import logging
 import os
+import threading
+from contextlib import asynccontextmanager
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, Tuple
 from enum import Enum
 
 try:
     from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
     from langchain_core.language_models.base import BaseLanguageModel
+    from langchain_core.runnables import RunnableSequence
     from langchain_openai import ChatOpenAI
     from langchain.prompts import ChatPromptTemplate, PromptTemplate
     from langchain.chains import LLMChain
@@ -21,6 +24,14 @@ except ImportError:
     LANGCHAIN_AVAILABLE = False
 
 from ..core.config import settings
+from .single_flight import model_call_flight, make_flight_key
+from .chunking import estimate_tokens
+from .rate_limiter import rate_limiter_registry, estimate_request_tokens, extract_usage
+from .circuit_breaker import circuit_breakers, call_with_failover
+from .model_router import model_router
+from .hedging import hedging
+from .key_pool import key_pools, normalize_model_config, retry_after_seconds, is_rate_limited
+from .adaptive_concurrency import concurrency_limiters
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +40,66 @@ if not LANGCHAIN_AVAILABLE:
     logger.warning("LangChain not available. Using mock services.")
 
 
+# generate_text / run_chain 出错时以文本形式返回的提示前缀，此类结果不应被缓存或复用
+FAILURE_RESPONSE_PREFIXES = (
+    "Chain execution failed",
+    "Text generation failed",
+    "LLM initialization",
+    "Mock ",
+)
+
+
+def is_successful_response(text: str) -> bool:
+    """判断模型返回是否为正常结果（而非降级的错误提示文本）"""
+    return not text.startswith(FAILURE_RESPONSE_PREFIXES)
+
+
+# 调用服务商出错时的提示前缀，计入熔断统计并触发故障转移（Mock 等本地降级不计入）
+PROVIDER_FAILURE_PREFIXES = (
+    "Chain execution failed",
+    "Text generation failed",
+)
+
+
+def is_provider_failure_response(text: str) -> bool:
+    """判断返回文本是否表示服务商调用失败"""
+    return isinstance(text, str) and text.startswith(PROVIDER_FAILURE_PREFIXES)
+
+
+def provider_error(error: Exception, model_name: Optional[str] = None) -> Exception:
+    """把调用服务商时的原始异常转换为类型化异常，供任务重试分类、熔断统计与接口错误码使用"""
+    import asyncio
+    import httpx
+    from ..utils.exceptions import (
+        TranslateAPIException,
+        RateLimitError,
+        NetworkError,
+        TimeoutError,
+        AuthenticationError,
+        ModelAPIError,
+        InvalidRequestError,
+    )
+    if isinstance(error, TranslateAPIException):
+        return error
+    message = str(error)
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    name = type(error).__name__
+    if is_rate_limited(error):
+        return RateLimitError(f"Rate limit exceeded: {message}", model_name, retry_after_seconds(error))
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)) or "Timeout" in name:
+        return TimeoutError(f"Request timeout: {message}")
+    if status == 401 or name == "AuthenticationError":
+        return AuthenticationError(model_name=model_name)
+    if isinstance(error, httpx.TransportError) or "Connection" in name or status in (500, 502, 503, 504):
+        return NetworkError(message, original_error=error)
+    if status in (400, 413, 422):
+        # 请求本身的问题，不重试也不触发故障转移
+        return InvalidRequestError(f"Model rejected the request: {message}")
+    return ModelAPIError(message, model_name, error)
+
+
 class LangChainModelType(Enum):
     """LangChain支持的模型类型"""
     OPENAI = "openai"
@@ -42,10 +113,11 @@ class BaseLangChainService:
     """LangChain服务基类"""
     
     def __init__(self, model_config: Dict[str, Any]):
-        self.config = model_config
+        self.config = normalize_model_config(model_config)
         self.model_name = model_config.get("model", "default")
         self.service_type = model_config.get("service_type", "openai")
         self.llm = None  # 添加llm属性
+        self.llms = []  # Key 池中每个 Key 对应一个客户端，llm 为其中第一个
         
         if LANGCHAIN_AVAILABLE:
             try:
@@ -83,14 +155,7 @@ class BaseLangChainService:
                 if api_key:
                     logger.info(f"Creating OpenAI LLM with model: {self.config.get('model', 'gpt-3.5-turbo')}")
                     try:
-                        self.llm = ChatOpenAI(
-                            model=self.config.get("model", "gpt-3.5-turbo"),
-                            api_key=api_key,
-                            base_url=base_url,
-                            temperature=self.config.get("temperature", 0.7),
-                            max_tokens=self.config.get("max_tokens", 2000),
-                            timeout=self.config.get("timeout", 60)
-                        )
+                        self._create_pooled_llms(api_key, base_url, "gpt-3.5-turbo", 60)
                         logger.info("OpenAI LLM created successfully")
                     except Exception as e:
                         logger.error(f"Failed to create OpenAI LLM: {e}")
@@ -106,14 +171,8 @@ class BaseLangChainService:
                     logger.info("DashScope API key found, creating LLM instance")
                     try:
                         # 使用正确的 DashScope 配置
-                        self.llm = ChatOpenAI(
-                            model=self.config.get("model", "qwen-turbo"),
-                            api_key=api_key,
-                            base_url=self.config.get("base_url", "https://dashscope.aliyuncs.com/compatible-mode/v1"),
-                            temperature=self.config.get("temperature", 0.7),
-                            max_tokens=self.config.get("max_tokens", 2000),
-                            timeout=self.config.get("timeout", 60)  # 增加超时时间
-                        )
+                        base_url = self.config.get("base_url") or "https://dashscope.aliyuncs.com/compatible-mode/v1"
+                        self._create_pooled_llms(api_key, base_url, "qwen-turbo", 60)
                         logger.info("DashScope LLM created successfully")
                     except Exception as e:
                         logger.error(f"Failed to create DashScope LLM: {e}")
@@ -133,6 +192,7 @@ class BaseLangChainService:
                         base_url=self.config.get("base_url", "http://localhost:11434"),
                         temperature=self.config.get("temperature", 0.7)
                     )
+                    self.llms = [self.llm]
                     logger.info("Ollama LLM created successfully")
                 except ImportError:
                     logger.error("Ollama integration requires langchain_community")
@@ -150,6 +210,44 @@ class BaseLangChainService:
             import traceback
             logger.debug(f"Traceback: {traceback.format_exc()}")
     
+    def _create_pooled_llms(self, api_key: str, base_url: Optional[str], default_model: str, default_timeout: int):
+        """为 Key 池中的每个 (Key, 地址) 创建一个 OpenAI 兼容客户端"""
+        pool = key_pools.for_config(self.config)
+        self.llms = [
+            ChatOpenAI(
+                model=self.config.get("model", default_model),
+                api_key=slot.api_key or api_key,
+                base_url=slot.base_url or base_url,
+                temperature=self.config.get("temperature", 0.7),
+                max_tokens=self.config.get("max_tokens", 2000),
+                timeout=self.config.get("timeout", default_timeout)
+            )
+            for slot in pool.slots
+        ]
+        self.llm = self.llms[0]
+
+    def rate_limit(self, prompt: str, slot=None):
+        """为一次 LLM 调用创建限流租约（与 AIModelManager 共用按模型名/Key 登记的令牌桶）"""
+        return rate_limiter_registry.lease(
+            slot.limiter_config if slot is not None else self.config,
+            estimate_request_tokens(prompt, self.config.get("max_tokens")),
+        )
+
+    @asynccontextmanager
+    async def use_llm(self, prompt: str):
+        """从 Key 池选择一个客户端，在该 Key 的限流额度与该后端的自适应并发上限内调用；返回 429 时该 Key 进入冷却"""
+        pool = key_pools.for_config(self.config)
+        with pool.use() as slot:
+            llm = self.llms[slot.index] if 0 <= slot.index < len(self.llms) else self.llm
+            lease = self.rate_limit(prompt, slot)
+            async with lease, concurrency_limiters.permit(self.config, lease.estimated_tokens):
+                try:
+                    yield llm, lease
+                except Exception as e:
+                    if is_rate_limited(e):
+                        pool.cool_down(slot, retry_after_seconds(e))
+                    raise
+    
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """生成文本"""
         logger.debug(f"generate_text called with prompt length: {len(prompt)}")
@@ -176,24 +274,23 @@ class BaseLangChainService:
         
         try:
             logger.debug(f"Attempting to generate text with LLM: {type(self.llm).__name__}")
-            if hasattr(self.llm, 'ainvoke'):
-                logger.debug("Using ainvoke method")
-                result = await self.llm.ainvoke(prompt)
-                response = result.content if hasattr(result, 'content') else str(result)
-                logger.info(f"Text generation successful, response length: {len(response)}")
-                return response
-            else:
-                logger.debug("Using invoke method (sync fallback)")
-                # 同步调用的回退
-                result = self.llm.invoke(prompt)
-                response = result.content if hasattr(result, 'content') else str(result)
-                logger.info(f"Text generation successful, response length: {len(response)}")
-                return response
+            async with self.use_llm(prompt) as (llm, lease):
+                if hasattr(llm, 'ainvoke'):
+                    logger.debug("Using ainvoke method")
+                    result = await llm.ainvoke(prompt)
+                else:
+                    logger.debug("Using invoke method (sync fallback)")
+                    # 同步调用的回退
+                    result = llm.invoke(prompt)
+                lease.record_usage(extract_usage(result))
+            response = result.content if hasattr(result, 'content') else str(result)
+            logger.info(f"Text generation successful, response length: {len(response)}")
+            return response
         except Exception as e:
             logger.error(f"Text generation failed: {str(e)}")
             import traceback
             logger.debug(f"Traceback: {traceback.format_exc()}")
-            return f"Text generation failed: {str(e)}"
+            raise provider_error(e, self.model_name) from e
 
     async def generate_text_stream(self, prompt: str, **kwargs):
         """
@@ -202,17 +299,24 @@ class BaseLangChainService:
         """
         if LANGCHAIN_AVAILABLE and self.llm is not None and hasattr(self.llm, "astream"):
             try:
-                async for chunk in self.llm.astream(prompt):
-                    piece = None
-                    # 兼容不同返回结构
-                    if hasattr(chunk, "content") and chunk.content:
-                        piece = chunk.content
-                    elif hasattr(chunk, "delta") and getattr(chunk, "delta"):
-                        piece = getattr(chunk, "delta")
-                    elif isinstance(chunk, str):
-                        piece = chunk
-                    if piece:
-                        yield piece
+                async with self.use_llm(prompt) as (llm, lease):
+                    produced = []
+                    try:
+                        async for chunk in llm.astream(prompt):
+                            piece = None
+                            # 兼容不同返回结构
+                            if hasattr(chunk, "content") and chunk.content:
+                                piece = chunk.content
+                            elif hasattr(chunk, "delta") and getattr(chunk, "delta"):
+                                piece = getattr(chunk, "delta")
+                            elif isinstance(chunk, str):
+                                piece = chunk
+                            if piece:
+                                produced.append(piece)
+                                yield piece
+                    finally:
+                        # 流式响应通常不带用量，按实际输出估算
+                        lease.record_usage(estimate_tokens(prompt) + estimate_tokens("".join(produced)))
                 return
             except Exception as e:
                 logger.error(f"astream failed, fallback to non-stream: {e}")
@@ -245,10 +349,19 @@ class BaseLangChainService:
 
 
 class LangChainManager:
-    """LangChain服务管理器"""
+    """LangChain服务管理器
+
+    进程内共享：LLM 客户端按模型注册一次，编译好的链按 (链名, 模型) 缓存，
+    所有请求与异步任务复用同一份实例。
+    """
     
     def __init__(self):
         self.services: Dict[str, BaseLangChainService] = {}
+        # 已编译的链，键为 (chain_name, service_key)
+        self._chains: Dict[Tuple[str, str], Any] = {}
+        # 链模板，故障转移到其他模型时据此按需编译
+        self._chain_templates: Dict[str, str] = {}
+        self._chain_lock = threading.RLock()
         self._initialize_services()
     
     def _initialize_services(self):
@@ -296,6 +409,7 @@ class LangChainManager:
             
             service_config = {
                 **model_config,
+                "name": model_config.get("name", model_name),  # 限流器按模型名共享
                 "service_type": service_type  # 使用正确的服务类型
             }
             
@@ -328,12 +442,8 @@ class LangChainManager:
         }
         return BaseLangChainService(default_config)
     
-    def get_service(self, model_name: Optional[str] = None) -> Optional[BaseLangChainService]:
-        """获取指定的服务"""
-        logger.info(f"Settings object: {settings}")
-        logger.info(f"AI model config: {settings.ai_model}")
-        logger.info(f"Default model: {settings.ai_model.get('default_model') if settings.ai_model else 'None'}")
-
+    def _requested_model(self, model_name: Optional[str] = None) -> str:
+        """请求的模型名（空值回退到默认模型）"""
         # 兼容空字符串：统一回退到 None 以使用默认模型
         if model_name is not None and isinstance(model_name, str) and model_name.strip() == "":
             model_name = None
@@ -344,12 +454,43 @@ class LangChainManager:
             except Exception as e:
                 logger.warning(f"Failed to get default model: {e}")
                 model_name = "default"
-        
-        logger.info(f"Looking for service: {model_name}")
-        service = self.services.get(model_name) or self.services.get("default")
-        logger.info(f"Found service: {service is not None}")
-        
-        return service
+        return model_name
+
+    def resolve_service_key(self, model_name: Optional[str] = None) -> Optional[str]:
+        """将请求的模型名解析为已注册服务的键（空值回退到默认模型）"""
+        model_name = self._requested_model(model_name)
+
+        if model_name in self.services:
+            return model_name
+        if model_router.is_group(model_name):
+            # 路由组：取当前负载最优的后端
+            candidates = self.failover_candidates(model_name)
+            if candidates:
+                return candidates[0]
+        if "default" in self.services:
+            return "default"
+        return None
+
+    def get_service(self, model_name: Optional[str] = None) -> Optional[BaseLangChainService]:
+        """获取指定的服务"""
+        key = self.resolve_service_key(model_name)
+        logger.debug(f"Looking for service: {model_name}, resolved: {key}")
+        return self.services.get(key) if key else None
+
+    def failover_candidates(self, model_name: Optional[str] = None) -> List[str]:
+        """调用候选服务键：解析出的服务（路由组则为按负载排序的后端）在前，其余按配置顺序作为故障转移备选"""
+        requested = self._requested_model(model_name)
+        if requested not in self.services and model_router.is_group(requested):
+            return model_router.candidates(requested, list(self.services.keys()), circuit_breakers.is_available)
+        return model_router.candidates(self.resolve_service_key(model_name), list(self.services.keys()))
+
+    def get_healthy_service(self, model_name: Optional[str] = None) -> Optional[BaseLangChainService]:
+        """获取首个未熔断的候选服务（全部熔断时返回首选服务）"""
+        candidates = self.failover_candidates(model_name)
+        if not candidates:
+            return None
+        key = next((k for k in candidates if circuit_breakers.is_available(k)), candidates[0])
+        return self.services.get(key)
     
     def get_default_service(self) -> Optional[BaseLangChainService]:
         """获取默认服务"""
@@ -364,39 +505,37 @@ class LangChainManager:
         self.services[name] = service
     
     async def generate_with_fallback(self, prompt: str, preferred_models: Optional[List[str]] = None, **kwargs) -> str:
-        """使用回退机制生成文本"""
+        """使用回退机制生成文本（跳过已熔断的服务）"""
         if preferred_models is None:
             preferred_models = ["default"]
         
-        last_error = None
-        
+        candidates: List[str] = []
         for model_name in preferred_models:
-            service = self.get_service(model_name)
-            if service:
-                try:
-                    return await service.generate_text(prompt, **kwargs)
-                except Exception as e:
-                    last_error = e
-                    continue
+            key = self.resolve_service_key(model_name)
+            if key and key not in candidates:
+                candidates.append(key)
+        # 其余可用服务作为最后的备选
+        candidates += [name for name in self.services if name not in candidates]
+        if not candidates:
+            raise Exception("All LangChain services failed. Last error: no service available")
         
-        # 尝试所有可用服务
-        for service_name, service in self.services.items():
-            if service_name not in preferred_models:
-                try:
-                    return await service.generate_text(prompt, **kwargs)
-                except Exception as e:
-                    last_error = e
-                    continue
-        
-        raise Exception(f"All LangChain services failed. Last error: {last_error}")
+        try:
+            return await call_with_failover(
+                candidates,
+                lambda key: model_router.measure(key, lambda: self.services[key].generate_text(prompt, **kwargs)),
+                is_failure=is_provider_failure_response,
+            )
+        except Exception as e:
+            raise Exception(f"All LangChain services failed. Last error: {e}") from e
 
     def create_chain(self, chain_name: str, prompt_template: str, model_name: Optional[str] = None):
-        """创建LangChain链"""
+        """创建LangChain链（按模型分别编译并登记）"""
         if not LANGCHAIN_AVAILABLE:
             return None
         
         try:
-            service = self.get_service(model_name)
+            key = self.resolve_service_key(model_name)
+            service = self.services.get(key) if key else None
             if not service or not hasattr(service, 'llm'):
                 return None
                 
@@ -412,26 +551,76 @@ class LangChainManager:
                     chain = LLMChain(llm=service.llm, prompt=prompt)
             
             # 存储链
-            if not hasattr(self, '_chains'):
-                self._chains = {}
-            self._chains[chain_name] = chain
+            with self._chain_lock:
+                self._chains[(chain_name, key)] = chain
+                self._chain_templates[chain_name] = prompt_template
             
             return chain
         except Exception as e:
             logger.error(f"Failed to create chain {chain_name}: {e}")
             return None
+
+    @staticmethod
+    def _bind_llm(chain, default_llm, llm):
+        """链按模型的首个客户端编译；Key 池选中其他 Key 时替换链末端的客户端"""
+        if llm is default_llm or getattr(chain, "last", None) is not default_llm:
+            return chain
+        return RunnableSequence(*chain.steps[:-1], llm)
+
+    def get_or_create_chain(self, chain_name: str, prompt_template: str, model_name: Optional[str] = None):
+        """获取已编译的链，不存在时编译一次（并发安全）"""
+        chain = self.get_chain(chain_name, model_name)
+        if chain is not None:
+            return chain
+        with self._chain_lock:
+            chain = self.get_chain(chain_name, model_name)
+            if chain is None:
+                chain = self.create_chain(chain_name, prompt_template, model_name)
+            return chain
     
-    def get_chain(self, chain_name: str):
+    def get_chain(self, chain_name: str, model_name: Optional[str] = None):
         """获取已创建的链"""
-        if not hasattr(self, '_chains'):
+        key = self.resolve_service_key(model_name)
+        if key is None:
             return None
-        return self._chains.get(chain_name)
+        return self._chains.get((chain_name, key))
     
     async def run_chain(self, chain_name: str, inputs: Dict[str, Any], model_name: Optional[str] = None) -> str:
+        """运行链（相同链、模型与输入的并发调用合并为一次；模型熔断或失败时转移到下一个模型，慢请求按策略对冲）"""
+        candidates = self.failover_candidates(model_name)
+        if not candidates:
+            return await self._run_chain(chain_name, inputs, model_name)
+
+        async def invoke(service_key: str) -> str:
+            key = make_flight_key("run_chain", chain_name, service_key, inputs)
+            return await model_call_flight.do(
+                key, lambda: model_router.measure(service_key, lambda: self._run_chain(chain_name, inputs, service_key))
+            )
+
+        prompt_text = "\n".join(str(v) for v in inputs.values()) if isinstance(inputs, dict) else str(inputs)
+        result = await hedging.run(
+            candidates,
+            lambda names: call_with_failover(names, invoke, is_failure=is_provider_failure_response),
+            prompt_tokens=estimate_tokens(prompt_text),
+        )
+        return self._raise_for_failure_response(result, model_name)
+
+    @staticmethod
+    def _raise_for_failure_response(result: str, model_name: Optional[str]) -> str:
+        """所有候选均以错误提示文本失败时抛出可重试的 DegradedResponseError，而不是把提示文本当作结果返回"""
+        if is_provider_failure_response(result):
+            from ..utils.exceptions import DegradedResponseError
+            raise DegradedResponseError(result, model_name)
+        return result
+
+    async def _run_chain(self, chain_name: str, inputs: Dict[str, Any], model_name: Optional[str] = None) -> str:
         """运行链"""
         logger.debug(f"Running chain: {chain_name} with inputs: {list(inputs.keys())}")
         
-        chain = self.get_chain(chain_name)
+        chain = self.get_chain(chain_name, model_name)
+        if chain is None and chain_name in self._chain_templates:
+            # 故障转移到尚未编译该链的模型
+            chain = self.get_or_create_chain(chain_name, self._chain_templates[chain_name], model_name)
         if chain is None:
             logger.warning(f"Chain '{chain_name}' not found, falling back to direct generation")
             # 如果链不存在，尝试直接生成
@@ -448,20 +637,26 @@ class LangChainManager:
             if LANGCHAIN_AVAILABLE:
                 logger.debug("Using LangChain to run chain")
                 
-                # 使用新的 LangChain API 代替已弃用的 arun
-                if hasattr(chain, 'ainvoke'):
-                    logger.debug("Using ainvoke method")
-                    result = await chain.ainvoke(inputs)
-                elif hasattr(chain, 'arun'):
-                    logger.warning("Using deprecated arun method")
-                    result = await chain.arun(**inputs)
-                elif hasattr(chain, 'invoke'):
-                    logger.debug("Using sync invoke method")
-                    result = chain.invoke(inputs)
-                else:
+                if not any(hasattr(chain, m) for m in ("ainvoke", "arun", "invoke")):
                     logger.error("Chain has no invoke method available")
                     return f"Chain '{chain_name}' has no compatible invoke method"
                 
+                service = self.get_service(model_name)
+                prompt_text = "\n".join(str(v) for v in inputs.values()) if isinstance(inputs, dict) else str(inputs)
+                async with service.use_llm(prompt_text) as (llm, lease):
+                    chain = self._bind_llm(chain, service.llm, llm)
+                    # 使用新的 LangChain API 代替已弃用的 arun
+                    if hasattr(chain, 'ainvoke'):
+                        logger.debug("Using ainvoke method")
+                        result = await chain.ainvoke(inputs)
+                    elif hasattr(chain, 'arun'):
+                        logger.warning("Using deprecated arun method")
+                        result = await chain.arun(**inputs)
+                    else:
+                        logger.debug("Using sync invoke method")
+                        result = chain.invoke(inputs)
+                    lease.record_usage(extract_usage(result))
+                
                 # 处理不同类型的返回结果
                 if hasattr(result, 'content'):
                     response = result.content
@@ -482,17 +677,16 @@ class LangChainManager:
             # 更详细的错误处理
             if "404" in str(e) or "Not Found" in str(e):
                 logger.error("404 error detected - likely API endpoint or authentication issue")
-                return f"Chain execution failed: API endpoint not found (404). Please check your API configuration and keys."
             elif "401" in str(e) or "Unauthorized" in str(e):
                 logger.error("401 error detected - authentication issue")
-                return f"Chain execution failed: Authentication failed (401). Please check your API keys."
             elif "timeout" in str(e).lower():
                 logger.error("Timeout error detected")
-                return f"Chain execution failed: Request timeout. Please try again."
             else:
                 import traceback
                 logger.debug(f"Full traceback: {traceback.format_exc()}")
-                return f"Chain execution failed: {str(e)}"
+            # 以类型化异常抛出，由故障转移、熔断与任务重试按异常类型处理
+            service = self.get_service(model_name)
+            raise provider_error(e, getattr(service, "model_name", model_name)) from e
     
     def clear_memory(self):
         """清空所有服务的内存"""
@@ -501,10 +695,18 @@ class LangChainManager:
                 service.memory.clear()
     
     async def generate_text(self, prompt: str, service_name: Optional[str] = None, **kwargs) -> str:
-        """直接生成文本的便捷方法"""
-        service = self.get_service(service_name)
-        if service:
-            return await service.generate_text(prompt, **kwargs)
+        """直接生成文本的便捷方法（相同模型与提示词的并发调用合并为一次；熔断或失败时转移到下一个模型）"""
+        candidates = self.failover_candidates(service_name)
+        if candidates:
+            async def invoke(service_key: str) -> str:
+                service = self.services[service_key]
+                key = make_flight_key("generate_text", service_key, prompt, kwargs)
+                return await model_call_flight.do(
+                    key, lambda: model_router.measure(service_key, lambda: service.generate_text(prompt, **kwargs))
+                )
+
+            result = await call_with_failover(candidates, invoke, is_failure=is_provider_failure_response)
+            return self._raise_for_failure_response(result, service_name)
         
         from ..utils.exceptions import ModelNotAvailableError
         raise ModelNotAvailableError(f"No service available for text generation. Requested service: {service_name}")
@@ -520,13 +722,8 @@ class LangChainManager:
         直接流式生成文本的便捷方法（异步生成器）。
         优先使用 model_name，其次 service_name，最后默认服务。
         """
-        svc = None
-        if model_name is not None:
-            svc = self.get_service(model_name)
-        elif service_name is not None:
-            svc = self.get_service(service_name)
-        else:
-            svc = self.get_default_service()
+        # 流式输出开始后无法切换模型，因此只在开始前跳过已熔断的服务
+        svc = self.get_healthy_service(model_name if model_name is not None else service_name)
 
         if svc and hasattr(svc, "generate_text_stream"):
             async for piece in svc.generate_text_stream(prompt, **kwargs):
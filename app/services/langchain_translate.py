@@ -4,110 +4,170 @@
 基于LangChain的翻译和总结服务
 """
 import logging
-from typing import Optional, Dict, Any
+import threading
+from typing import Optional, Dict, Any, Callable, Awaitable
 from .prompt.templates import (
     TranslationPromptType, 
     SummarizationPromptType, 
     prompt_manager
 )
-from .langchain_service import LangChainManager
+from .langchain_service import (
+    LangChainManager,
+    is_successful_response,
+    langchain_manager as shared_langchain_manager,
+)
+from .result_cache import result_cache
+from ..utils.exceptions import TranslateAPIException
+from .chunking import (
+    should_chunk,
+    translate_chunked,
+    format_chunk_with_context,
+    resolve_summary_mode,
+    summarize_map_reduce,
+    summarize_refine,
+)
 
 # 创建日志记录器
 logger = logging.getLogger(__name__)
 
 
 class LangChainTranslationService:
-    """基于LangChain的翻译服务"""
+    """基于LangChain的翻译服务
+
+    默认复用进程级共享的 LangChainManager，LLM 客户端与编译好的链只构建一次；
+    每次调用可通过 model_name 参数覆盖模型，无需修改实例状态。
+    """
     
-    def __init__(self, model_name: Optional[str] = None, use_chains: bool = True) -> None:
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        use_chains: bool = True,
+        langchain_manager: Optional[LangChainManager] = None,
+    ) -> None:
         self.model_name = model_name
         self.use_chains = use_chains
-        self.langchain_manager = LangChainManager()
+        self.langchain_manager = langchain_manager or shared_langchain_manager
         self.prompt_manager = prompt_manager
         
-        logger.info(f"Initializing LangChainTranslationService with model: {model_name}, use_chains: {use_chains}")
+        logger.debug(f"Initializing LangChainTranslationService with model: {model_name}, use_chains: {use_chains}")
         
-        # 预创建常用的链
+        # 预创建常用的链（已存在时直接复用）
         if use_chains:
             self._initialize_chains()
+
+    def _chain_templates(self) -> Dict[str, str]:
+        """各预置链对应的提示词模板"""
+        return {
+            "zh_to_en_chain": self.prompt_manager.get_translation_prompt(
+                TranslationPromptType.ZH_TO_EN, text="{text}"
+            ),
+            "en_to_zh_chain": self.prompt_manager.get_translation_prompt(
+                TranslationPromptType.EN_TO_ZH, text="{text}"
+            ),
+            "auto_translate_chain": self.prompt_manager.get_translation_prompt(
+                TranslationPromptType.AUTO_TRANSLATE, text="{text}"
+            ),
+            "basic_summary_chain": self.prompt_manager.get_summarization_prompt(
+                SummarizationPromptType.BASIC_SUMMARY, text="{text}", max_length="{max_length}"
+            ),
+            "keyword_summary_chain": self.prompt_manager.get_summarization_prompt(
+                SummarizationPromptType.KEYWORD_SUMMARY, text="{text}", summary_length="{summary_length}"
+            ),
+            "structured_summary_chain": self.prompt_manager.get_summarization_prompt(
+                SummarizationPromptType.STRUCTURED_SUMMARY, text="{text}", max_length="{max_length}"
+            ),
+        }
     
-    def _initialize_chains(self):
-        """初始化常用的LangChain链"""
+    def _initialize_chains(self, model_name: Optional[str] = None):
+        """确保指定模型的常用链已编译（共享注册表中已有则跳过）"""
         try:
-            logger.info("Initializing LangChain chains...")
-            
-            # 创建翻译链
-            zh_en_template = self.prompt_manager.get_translation_prompt(
-                TranslationPromptType.ZH_TO_EN, 
-                text="{text}"
-            )
-            self.langchain_manager.create_chain(
-                "zh_to_en_chain", 
-                zh_en_template, 
-                self.model_name
-            )
-            logger.debug("Created zh_to_en_chain")
-            
-            en_zh_template = self.prompt_manager.get_translation_prompt(
-                TranslationPromptType.EN_TO_ZH, 
-                text="{text}"
-            )
-            self.langchain_manager.create_chain(
-                "en_to_zh_chain", 
-                en_zh_template, 
-                self.model_name
-            )
-            logger.debug("Created en_to_zh_chain")
-            
-            auto_translate_template = self.prompt_manager.get_translation_prompt(
-                TranslationPromptType.AUTO_TRANSLATE, 
-                text="{text}"
-            )
-            self.langchain_manager.create_chain(
-                "auto_translate_chain", 
-                auto_translate_template, 
-                self.model_name
-            )
-            
-            # 创建总结链
-            basic_summary_template = self.prompt_manager.get_summarization_prompt(
-                SummarizationPromptType.BASIC_SUMMARY,
-                text="{text}",
-                max_length="{max_length}"
-            )
-            self.langchain_manager.create_chain(
-                "basic_summary_chain", 
-                basic_summary_template, 
-                self.model_name
-            )
-            
-            keyword_summary_template = self.prompt_manager.get_summarization_prompt(
-                SummarizationPromptType.KEYWORD_SUMMARY,
-                text="{text}",
-                summary_length="{summary_length}"
-            )
-            self.langchain_manager.create_chain(
-                "keyword_summary_chain", 
-                keyword_summary_template, 
-                self.model_name
-            )
-            
-            structured_summary_template = self.prompt_manager.get_summarization_prompt(
-                SummarizationPromptType.STRUCTURED_SUMMARY,
-                text="{text}",
-                max_length="{max_length}"
-            )
-            self.langchain_manager.create_chain(
-                "structured_summary_chain", 
-                structured_summary_template, 
-                self.model_name
-            )
-            logger.info("All chains initialized successfully")
-            
+            model = model_name or self.model_name
+            for chain_name, template in self._chain_templates().items():
+                self.langchain_manager.get_or_create_chain(chain_name, template, model)
         except Exception as e:
             logger.warning(f"Failed to initialize some chains: {e}")
+
+    def _resolve_model(self, model_name: Optional[str]) -> Optional[str]:
+        """调用参数优先，其次实例默认模型"""
+        return model_name or self.model_name
+
+    async def _cached(
+        self,
+        operation: str,
+        text: str,
+        model_name: Optional[str],
+        params: Dict[str, Any],
+        use_cache: bool,
+        compute: Callable[[], Awaitable[str]],
+    ) -> str:
+        """经结果缓存执行；缓存键使用解析后的实际模型"""
+        model_key = self.langchain_manager.resolve_service_key(self._resolve_model(model_name))
+        return await result_cache.get_or_compute(
+            operation,
+            model_key,
+            text,
+            compute,
+            params=params,
+            use_cache=use_cache,
+            cacheable=is_successful_response,
+        )
+
+    async def _translate_chunked(
+        self,
+        translate: Callable[..., Awaitable[str]],
+        text: str,
+        context: Optional[str],
+        model_name: Optional[str],
+        use_cache: bool,
+        target_is_cjk: bool,
+        **kwargs
+    ) -> str:
+        """长文档分块并发翻译，各分块单独经结果缓存后按原顺序拼接"""
+        model = self._resolve_model(model_name)
+
+        async def translate_chunk(chunk_text: str, neighbours: Optional[Dict[str, str]]) -> str:
+            return await translate(
+                format_chunk_with_context(chunk_text, neighbours),
+                context=context,
+                model_name=model,
+                use_cache=use_cache,
+                chunked=False,
+                **kwargs
+            )
+
+        return await translate_chunked(
+            text,
+            translate_chunk,
+            model_key=self.langchain_manager.resolve_service_key(model),
+            target_is_cjk=target_is_cjk,
+        )
+
+    async def _summarize_long(
+        self,
+        mode: str,
+        text: str,
+        model_name: Optional[str],
+        summarize_fn: Callable[[str], Awaitable[str]],
+        finalize_fn: Optional[Callable[[str], Awaitable[str]]] = None,
+    ) -> str:
+        """长文本分层总结（map_reduce / refine），中间总结单独经结果缓存"""
+        if mode == "refine":
+            return await summarize_refine(text, summarize_fn, finalize_fn)
+        model_key = self.langchain_manager.resolve_service_key(self._resolve_model(model_name))
+        return await summarize_map_reduce(text, summarize_fn, finalize_fn, model_key=model_key)
+
+    def _get_chain(self, chain_name: str, model_name: Optional[str]):
+        """获取指定模型的链；首次使用某模型时按需编译"""
+        if not self.use_chains:
+            return None
+        chain = self.langchain_manager.get_chain(chain_name, model_name)
+        if chain is None:
+            template = self._chain_templates().get(chain_name)
+            if template is not None:
+                chain = self.langchain_manager.get_or_create_chain(chain_name, template, model_name)
+        return chain
     
-    async def translate(self, text: str, target_language: str, source_language: Optional[str] = None, context: Optional[str] = None, **kwargs) -> str:
+    async def translate(self, text: str, target_language: str, source_language: Optional[str] = None, context: Optional[str] = None, model_name: Optional[str] = None, **kwargs) -> str:
         """
         通用翻译方法，根据目标语言自动选择合适的翻译方法
         
@@ -116,6 +176,7 @@ class LangChainTranslationService:
             target_language: 目标语言
             source_language: 源语言（可选）
             context: 上下文信息（可选）
+            model_name: 本次调用使用的模型（可选，覆盖实例默认模型）
             
         Returns:
             翻译结果
@@ -124,9 +185,9 @@ class LangChainTranslationService:
         try:
             # 根据目标语言选择合适的翻译方法
             if target_language in ["中文", "中", "zh", "chinese"]:
-                return await self.en2zh(text, context=context, **kwargs)
+                return await self.en2zh(text, context=context, model_name=model_name, **kwargs)
             elif target_language in ["英文", "英", "en", "english"]:
-                return await self.zh2en(text, context=context, **kwargs)
+                return await self.zh2en(text, context=context, model_name=model_name, **kwargs)
             else:
                 # 使用自动翻译方法
                 return await self.auto_translate(
@@ -134,6 +195,7 @@ class LangChainTranslationService:
                     target_language=target_language, 
                     source_language=source_language,
                     context=context, 
+                    model_name=model_name,
                     **kwargs
                 )
         except Exception as e:
@@ -141,11 +203,23 @@ class LangChainTranslationService:
             # 重新抛出异常让上层处理
             raise
     
-    async def zh2en(self, text: str, context: Optional[str] = None, **kwargs) -> str:
-        """中文翻译成英文"""
+    async def zh2en(self, text: str, context: Optional[str] = None, model_name: Optional[str] = None, use_cache: bool = True, chunked: Optional[bool] = None, **kwargs) -> str:
+        """中文翻译成英文（chunked 为 None 时超过阈值的长文本自动分块）"""
+        if should_chunk(text, chunked):
+            return await self._translate_chunked(
+                self.zh2en, text, context, model_name, use_cache, target_is_cjk=False, **kwargs
+            )
+        return await self._cached(
+            "zh2en", text, model_name, {"context": context, **kwargs}, use_cache,
+            lambda: self._zh2en(text, context=context, model_name=model_name, **kwargs),
+        )
+
+    async def _zh2en(self, text: str, context: Optional[str] = None, model_name: Optional[str] = None, **kwargs) -> str:
+        """中文翻译成英文（不经缓存）"""
+        model = self._resolve_model(model_name)
         logger.info(f"Starting zh2en translation: {len(text)} characters")
         try:
-            if self.use_chains and self.langchain_manager.get_chain("zh_to_en_chain"):
+            if self._get_chain("zh_to_en_chain", model):
                 logger.debug("Using zh_to_en_chain for translation")
                 # 使用预创建的链
                 chain_inputs = {"text": text}
@@ -155,7 +229,7 @@ class LangChainTranslationService:
                 result = await self.langchain_manager.run_chain(
                     "zh_to_en_chain",
                     chain_inputs,
-                    self.model_name
+                    model
                 )
             else:
                 logger.debug("Using direct prompt translation")
@@ -166,7 +240,7 @@ class LangChainTranslationService:
                 )
                 result = await self.langchain_manager.generate_text(
                     prompt, 
-                    service_name=self.model_name,
+                    service_name=model,
                     **kwargs
                 )
             
@@ -177,11 +251,23 @@ class LangChainTranslationService:
             logger.error(f"zh2en translation failed: {e}")
             raise
     
-    async def en2zh(self, text: str, context: Optional[str] = None, **kwargs) -> str:
-        """英文翻译成中文"""
+    async def en2zh(self, text: str, context: Optional[str] = None, model_name: Optional[str] = None, use_cache: bool = True, chunked: Optional[bool] = None, **kwargs) -> str:
+        """英文翻译成中文（chunked 为 None 时超过阈值的长文本自动分块）"""
+        if should_chunk(text, chunked):
+            return await self._translate_chunked(
+                self.en2zh, text, context, model_name, use_cache, target_is_cjk=True, **kwargs
+            )
+        return await self._cached(
+            "en2zh", text, model_name, {"context": context, **kwargs}, use_cache,
+            lambda: self._en2zh(text, context=context, model_name=model_name, **kwargs),
+        )
+
+    async def _en2zh(self, text: str, context: Optional[str] = None, model_name: Optional[str] = None, **kwargs) -> str:
+        """英文翻译成中文（不经缓存）"""
+        model = self._resolve_model(model_name)
         logger.info(f"Starting en2zh translation: {len(text)} characters")
         try:
-            if self.use_chains and self.langchain_manager.get_chain("en_to_zh_chain"):
+            if self._get_chain("en_to_zh_chain", model):
                 logger.debug("Using en_to_zh_chain for translation")
                 chain_inputs = {"text": text}
                 if context:
@@ -190,7 +276,7 @@ class LangChainTranslationService:
                 result = await self.langchain_manager.run_chain(
                     "en_to_zh_chain",
                     chain_inputs,
-                    self.model_name
+                    model
                 )
             else:
                 logger.debug("Using direct prompt translation")
@@ -200,7 +286,7 @@ class LangChainTranslationService:
                 )
                 result = await self.langchain_manager.generate_text(
                     prompt, 
-                    service_name=self.model_name,
+                    service_name=model,
                     **kwargs
                 )
             
@@ -211,10 +297,18 @@ class LangChainTranslationService:
             logger.error(f"en2zh translation failed: {e}")
             raise
     
-    async def auto_translate(self, text: str, target_language: Optional[str] = None, source_language: Optional[str] = None, context: Optional[str] = None, **kwargs) -> str:
+    async def auto_translate(self, text: str, target_language: Optional[str] = None, source_language: Optional[str] = None, context: Optional[str] = None, model_name: Optional[str] = None, use_cache: bool = True, **kwargs) -> str:
         """自动检测语言并翻译"""
+        return await self._cached(
+            "auto_translate", text, model_name, {"target_language": target_language, "source_language": source_language, "context": context, **kwargs}, use_cache,
+            lambda: self._auto_translate(text, target_language=target_language, source_language=source_language, context=context, model_name=model_name, **kwargs),
+        )
+
+    async def _auto_translate(self, text: str, target_language: Optional[str] = None, source_language: Optional[str] = None, context: Optional[str] = None, model_name: Optional[str] = None, **kwargs) -> str:
+        """自动检测语言并翻译（不经缓存）"""
+        model = self._resolve_model(model_name)
         try:
-            if self.use_chains and self.langchain_manager.get_chain("auto_translate_chain"):
+            if self._get_chain("auto_translate_chain", model):
                 chain_inputs = {"text": text}
                 if target_language:
                     chain_inputs["target_language"] = target_language
@@ -226,7 +320,7 @@ class LangChainTranslationService:
                 result = await self.langchain_manager.run_chain(
                     "auto_translate_chain",
                     chain_inputs,
-                    self.model_name
+                    model
                 )
             else:
                 # 构建带有目标语言信息的提示词
@@ -242,7 +336,7 @@ class LangChainTranslationService:
                 
                 result = await self.langchain_manager.generate_text(
                     prompt, 
-                    service_name=self.model_name,
+                    service_name=model,
                     **kwargs
                 )
             
@@ -251,10 +345,24 @@ class LangChainTranslationService:
         except Exception as e:
                 raise
     
-    async def summarize(self, text: str, max_length: int = 200, context: Optional[str] = None, **kwargs) -> str:
-        """文本总结"""
+    async def summarize(self, text: str, max_length: int = 200, context: Optional[str] = None, model_name: Optional[str] = None, use_cache: bool = True, mode: Optional[str] = None, **kwargs) -> str:
+        """文本总结（mode: single / map_reduce / refine，为 None 时超过阈值的长文本自动 map_reduce）"""
+        mode = resolve_summary_mode(text, mode)
+        if mode != "single":
+            return await self._summarize_long(
+                mode, text, model_name,
+                lambda part: self.summarize(part, max_length=max_length, context=context, model_name=model_name, use_cache=use_cache, mode="single", **kwargs),
+            )
+        return await self._cached(
+            "summarize", text, model_name, {"max_length": max_length, "context": context, **kwargs}, use_cache,
+            lambda: self._summarize(text, max_length=max_length, context=context, model_name=model_name, **kwargs),
+        )
+
+    async def _summarize(self, text: str, max_length: int = 200, context: Optional[str] = None, model_name: Optional[str] = None, **kwargs) -> str:
+        """文本总结（不经缓存）"""
+        model = self._resolve_model(model_name)
         try:
-            if self.use_chains and self.langchain_manager.get_chain("basic_summary_chain"):
+            if self._get_chain("basic_summary_chain", model):
                 chain_inputs = {"text": text, "max_length": max_length}
                 if context:
                     chain_inputs["context"] = context
@@ -262,7 +370,7 @@ class LangChainTranslationService:
                 result = await self.langchain_manager.run_chain(
                     "basic_summary_chain",
                     chain_inputs,
-                    self.model_name
+                    model
                 )
             else:
                 if context:
@@ -276,7 +384,7 @@ class LangChainTranslationService:
                     
                 result = await self.langchain_manager.generate_text(
                     prompt, 
-                    service_name=self.model_name,
+                    service_name=model,
                     **kwargs
                 )
             
@@ -285,14 +393,29 @@ class LangChainTranslationService:
         except Exception as e:
               raise
     
-    async def keyword_summary(self, text: str, summary_length: int = 100, **kwargs) -> str:
-        """关键词提取总结"""
+    async def keyword_summary(self, text: str, summary_length: int = 100, model_name: Optional[str] = None, use_cache: bool = True, mode: Optional[str] = None, **kwargs) -> str:
+        """关键词提取总结（长文本先分层总结，再对合并结果提取关键词）"""
+        mode = resolve_summary_mode(text, mode)
+        if mode != "single":
+            return await self._summarize_long(
+                mode, text, model_name,
+                lambda part: self.summarize(part, max_length=summary_length, model_name=model_name, use_cache=use_cache, mode="single", **kwargs),
+                lambda merged: self.keyword_summary(merged, summary_length=summary_length, model_name=model_name, use_cache=use_cache, mode="single", **kwargs),
+            )
+        return await self._cached(
+            "keyword", text, model_name, {"summary_length": summary_length, **kwargs}, use_cache,
+            lambda: self._keyword_summary(text, summary_length=summary_length, model_name=model_name, **kwargs),
+        )
+
+    async def _keyword_summary(self, text: str, summary_length: int = 100, model_name: Optional[str] = None, **kwargs) -> str:
+        """关键词提取总结（不经缓存）"""
+        model = self._resolve_model(model_name)
         try:
-            if self.use_chains and self.langchain_manager.get_chain("keyword_summary_chain"):
+            if self._get_chain("keyword_summary_chain", model):
                 result = await self.langchain_manager.run_chain(
                     "keyword_summary_chain",
                     {"text": text, "summary_length": summary_length},
-                    self.model_name
+                    model
                 )
             else:
                 prompt = self.prompt_manager.get_summarization_prompt(
@@ -302,23 +425,41 @@ class LangChainTranslationService:
                 )
                 result = await self.langchain_manager.generate_text(
                     prompt, 
-                    service_name=self.model_name,
+                    service_name=model,
                     **kwargs
                 )
             
             return result.strip()
             
+        except TranslateAPIException:
+            # 类型化的模型调用错误原样抛出，保留重试分类
+            raise
         except Exception as e:
-                raise RuntimeError(f"Keyword summary failed: {str(e)}")
+            raise RuntimeError(f"Keyword summary failed: {str(e)}")
     
-    async def structured_summary(self, text: str, max_length: int = 300, **kwargs) -> str:
-        """结构化总结"""
+    async def structured_summary(self, text: str, max_length: int = 300, model_name: Optional[str] = None, use_cache: bool = True, mode: Optional[str] = None, **kwargs) -> str:
+        """结构化总结（长文本先分层总结，再对合并结果做结构化整理）"""
+        mode = resolve_summary_mode(text, mode)
+        if mode != "single":
+            return await self._summarize_long(
+                mode, text, model_name,
+                lambda part: self.summarize(part, max_length=max_length, model_name=model_name, use_cache=use_cache, mode="single", **kwargs),
+                lambda merged: self.structured_summary(merged, max_length=max_length, model_name=model_name, use_cache=use_cache, mode="single", **kwargs),
+            )
+        return await self._cached(
+            "structured", text, model_name, {"max_length": max_length, **kwargs}, use_cache,
+            lambda: self._structured_summary(text, max_length=max_length, model_name=model_name, **kwargs),
+        )
+
+    async def _structured_summary(self, text: str, max_length: int = 300, model_name: Optional[str] = None, **kwargs) -> str:
+        """结构化总结（不经缓存）"""
+        model = self._resolve_model(model_name)
         try:
-            if self.use_chains and self.langchain_manager.get_chain("structured_summary_chain"):
+            if self._get_chain("structured_summary_chain", model):
                 result = await self.langchain_manager.run_chain(
                     "structured_summary_chain",
                     {"text": text, "max_length": max_length},
-                    self.model_name
+                    model
                 )
             else:
                 prompt = self.prompt_manager.get_summarization_prompt(
@@ -328,12 +469,15 @@ class LangChainTranslationService:
                 )
                 result = await self.langchain_manager.generate_text(
                     prompt, 
-                    service_name=self.model_name,
+                    service_name=model,
                     **kwargs
                 )
             
             return result.strip()
             
+        except TranslateAPIException:
+            # 类型化的模型调用错误原样抛出，保留重试分类
+            raise
         except Exception as e:
             raise RuntimeError(f"Structured summary failed: {str(e)}")
     
@@ -341,6 +485,7 @@ class LangChainTranslationService:
         self, 
         messages: list, 
         context: Optional[str] = None,
+        model_name: Optional[str] = None,
         **kwargs
     ) -> str:
         """带上下文的对话功能（LangChain特有）"""
@@ -351,7 +496,7 @@ class LangChainTranslationService:
             
             result = await self.langchain_manager.chat_completion(
                 messages, 
-                service_name=self.model_name,
+                service_name=self._resolve_model(model_name),
                 **kwargs
             )
             
@@ -373,7 +518,7 @@ class LangChainTranslationService:
         
         available_chains = []
         for name in chain_names:
-            chain = self.langchain_manager.get_chain(name)
+            chain = self.langchain_manager.get_chain(name, self.model_name)
             if chain is not None:
                 available_chains.append({
                     "name": name,
@@ -397,7 +542,7 @@ class LangChainTranslationService:
     
     def inspect_chain(self, chain_name: str) -> Dict[str, Any]:
         """检查特定链的配置和状态"""
-        chain = self.langchain_manager.get_chain(chain_name)
+        chain = self.langchain_manager.get_chain(chain_name, self.model_name)
         if chain is None:
             raise ValueError(f"Chain '{chain_name}' not found")
         
@@ -433,7 +578,7 @@ class LangChainTranslationService:
         ]
         
         for name in chain_names:
-            chain = self.langchain_manager.get_chain(name)
+            chain = self.langchain_manager.get_chain(name, self.model_name)
             chains[name] = {
                 "exists": chain is not None,
                 "type": type(chain).__name__ if chain else None
@@ -444,4 +589,18 @@ class LangChainTranslationService:
             "model_name": self.model_name,
             "available_models": self.get_available_models(),
             "chains": chains
-        }
\ No newline at end of file
+        }
+
+
+_shared_service: Optional[LangChainTranslationService] = None
+_shared_service_lock = threading.Lock()
+
+
+def get_shared_translation_service() -> LangChainTranslationService:
+    """获取进程级共享的翻译服务实例（模型通过调用参数指定）"""
+    global _shared_service
+    if _shared_service is None:
+        with _shared_service_lock:
+            if _shared_service is None:
+                _shared_service = LangChainTranslationService(use_chains=True)
+    return _shared_service
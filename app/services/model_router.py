@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+等价模型部署间的负载路由
+config.yaml 的 routing.groups 把一个逻辑模型名映射到多个后端（已配置的模型服务名），
+请求逻辑模型时选择 EWMA 延迟 × (进行中请求数 + 1) 最小的后端，慢下来的后端自然分到更少流量。
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BackendStats:
+    """单个后端的实时负载与延迟（EWMA）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ewma_latency: Optional[float] = None
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def observe(self, latency: float, alpha: float) -> None:
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = alpha * latency + (1 - alpha) * self.ewma_latency
+
+
+class ModelRouter:
+    """按 EWMA 延迟与在途请求数在路由组内选择后端"""
+
+    def __init__(self, groups: Optional[Dict[str, List[str]]] = None, ewma_alpha: float = 0.3):
+        self.groups: Dict[str, List[str]] = {name: list(backends) for name, backends in (groups or {}).items()}
+        self.ewma_alpha = float(ewma_alpha)
+        self._stats: Dict[str, BackendStats] = {}
+        self._lock = threading.Lock()
+
+    def is_group(self, name: Optional[str]) -> bool:
+        return bool(name) and name in self.groups
+
+    def _backend(self, name: str) -> BackendStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats.setdefault(name, BackendStats(name))
+        return stats
+
+    def _score(self, name: str, default_latency: Optional[float] = None) -> float:
+        """路由得分（越小越优）：EWMA 延迟 × (在途请求数 + 1)
+
+        尚无延迟样本的后端按组内已知的最小延迟估计，使其能尽快获得首个样本。
+        """
+        stats = self._backend(name)
+        latency = stats.ewma_latency
+        if latency is None:
+            latency = default_latency if default_latency is not None else 1.0
+        return latency * (stats.in_flight + 1)
+
+    def _default_latency(self, backends: List[str]) -> Optional[float]:
+        known = [self._backend(b).ewma_latency for b in backends if self._backend(b).ewma_latency is not None]
+        return min(known) if known else None
+
+    def rank(self, group: str, available: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """组内后端按得分从优到劣排序；available 判定不可用的后端排在最后"""
+        backends = self.groups.get(group, [])
+        with self._lock:
+            default_latency = self._default_latency(backends)
+            scored = [
+                (self._score(b, default_latency), self._backend(b).requests, i, b)
+                for i, b in enumerate(backends)
+            ]
+        scored.sort()
+        ranked = [b for *_, b in scored]
+        if available is not None:
+            ranked = [b for b in ranked if available(b)] + [b for b in ranked if not available(b)]
+        return ranked
+
+    def candidates(
+        self,
+        name: Optional[str],
+        configured: List[str],
+        available: Optional[Callable[[str], bool]] = None,
+    ) -> List[str]:
+        """调用候选：路由组按得分排序的后端在前，其余模型按故障转移顺序跟随；非路由组直接按故障转移顺序"""
+        from .circuit_breaker import failover_order
+
+        if not self.is_group(name):
+            return failover_order(name, configured)
+        ranked = [b for b in self.rank(name, available) if b in configured]
+        if not ranked:
+            return []
+        return ranked + [n for n in failover_order(ranked[0], configured) if n not in ranked]
+
+    async def measure(self, name: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """执行一次对后端的调用，记录在途数与耗时"""
+        with self._lock:
+            stats = self._backend(name)
+            stats.in_flight += 1
+            stats.requests += 1
+        started = time.monotonic()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # 被取消的调用（如对冲落败方）没有完整耗时，不计入延迟
+            with self._lock:
+                stats.in_flight -= 1
+            raise
+        except Exception:
+            with self._lock:
+                stats.errors += 1
+                stats.in_flight -= 1
+                # 失败的调用同样计入延迟（超时会显著抬高该后端的得分）
+                stats.observe(time.monotonic() - started, self.ewma_alpha)
+            raise
+        with self._lock:
+            stats.in_flight -= 1
+            stats.observe(time.monotonic() - started, self.ewma_alpha)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各路由组的后端实时得分"""
+        groups: Dict[str, Any] = {}
+        for group, backends in self.groups.items():
+            ranked = self.rank(group)
+            with self._lock:
+                default_latency = self._default_latency(backends)
+                groups[group] = {
+                    "preferred": ranked[0] if ranked else None,
+                    "backends": [
+                        {
+                            "name": b,
+                            "score": round(self._score(b, default_latency), 4),
+                            "ewma_latency_ms": round(self._backend(b).ewma_latency * 1000, 1)
+                            if self._backend(b).ewma_latency is not None else None,
+                            "in_flight": self._backend(b).in_flight,
+                            "requests": self._backend(b).requests,
+                            "errors": self._backend(b).errors,
+                        }
+                        for b in ranked
+                    ],
+                }
+        return groups
+
+
+def _create_model_router() -> ModelRouter:
+    config = getattr(settings, "routing", None) or {}
+    groups = config.get("groups") or {}
+    if groups:
+        logger.info(f"Model routing groups: {groups}")
+    return ModelRouter(groups=groups, ewma_alpha=float(config.get("ewma_alpha", 0.3)))
+
+
+# 全局模型路由器（AIModelManager 与 LangChainManager 共用）
+model_router = _create_model_router()
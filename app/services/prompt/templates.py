@@ -93,6 +93,29 @@ class TranslationPrompts:
 
 请直接返回翻译结果，不要包含其他解释。"""
     )
+    
+    # 批量翻译：多条短文本打包为一个 JSON 数组
+    BATCH_TRANSLATE = PromptTemplate(
+        template="""你是一个专业的翻译助手，请{instruction}。
+输入是一个 JSON 数组，每个元素包含编号 id 和待翻译文本 text。
+要求：
+1. 逐条翻译，保持原意不变，语言自然流畅
+2. 不要合并、拆分或遗漏任何条目，id 保持不变
+3. 只返回 JSON 数组，格式为 [{{"id": 编号, "text": "译文"}}]，不要包含其他解释
+
+待翻译内容：
+{items}"""
+    )
+    
+    # 分块翻译时附带相邻句子作为上下文（作为待翻译文本传入上述模板）
+    CHUNK_WITH_CONTEXT = PromptTemplate(
+        template="""【上文，仅供理解，不要翻译】
+{before}
+【正文，只翻译这一部分】
+{text}
+【下文，仅供理解，不要翻译】
+{after}"""
+    )
 
 
 class SummarizationPrompts:
@@ -149,6 +172,15 @@ class SummarizationPrompts:
 
 请按指定结构返回总结。"""
     )
+    
+    # refine 模式：把新增原文并入已有总结（作为待总结文本传入上述模板）
+    REFINE_INPUT = PromptTemplate(
+        template="""【已有总结】
+{summary}
+
+【新增原文，请与已有总结整合为一份完整总结】
+{text}"""
+    )
 
 
 class SystemPrompts:
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按模型的 RPM/TPM 限流
+在模型配置中声明 rpm（每分钟请求数）与 tpm（每分钟 token 数）后，所有对该模型的调用
+（同步接口、流式接口、异步任务，无论经 AIModelManager 还是 LangChain）共用同一组令牌桶：
+调用前按估算 token 数预占额度，调用后按服务商返回的实际用量多退少补。
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """允许透支的令牌桶
+
+    预占时立即扣减额度（可扣成负数），调用方按欠额 / 补充速率计算需等待的时间。
+    先到的请求先扣减、先获得额度，因此等待顺序即到达顺序（公平排队），
+    且单次需求超过桶容量的请求也只是等待更久，不会被永久拒绝。
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.per_minute = float(per_minute)
+        self.rate = self.per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """预占额度，返回需要等待的秒数"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+            return max(0.0, -self._level / self.rate) if self.rate > 0 else 0.0
+
+    def refund(self, amount: float) -> None:
+        """归还额度（amount 为负数时追加扣减）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._level
+
+
+class ModelRateLimiter:
+    """单个模型的 RPM + TPM 限流器"""
+
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._admitted = 0
+        self._delayed = 0
+        self._waiting = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._estimated_tokens = 0
+        self._actual_tokens = 0
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """按估算 token 数预占额度，额度不足时排队等待"""
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(estimated_tokens))
+        self._admitted += 1
+        self._estimated_tokens += estimated_tokens
+        if delay <= 0:
+            return
+        self._delayed += 1
+        self._waiting += 1
+        self._total_wait += delay
+        self._max_wait = max(self._max_wait, delay)
+        logger.debug(f"RateLimiter[{self.name}]: waiting {delay:.2f}s for quota")
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # 放弃等待的请求归还预占的额度
+            self._release(estimated_tokens)
+            raise
+        finally:
+            self._waiting -= 1
+
+    def _release(self, estimated_tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.refund(1)
+        if self.tokens is not None:
+            self.tokens.refund(estimated_tokens)
+        self._estimated_tokens -= estimated_tokens
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """按实际用量修正预占的 token 额度"""
+        self._actual_tokens += actual_tokens
+        if self.tokens is not None and actual_tokens != estimated_tokens:
+            self.tokens.refund(estimated_tokens - actual_tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.requests.per_minute if self.requests else None,
+            "tpm": self.tokens.per_minute if self.tokens else None,
+            "available_requests": round(self.requests.available, 2) if self.requests else None,
+            "available_tokens": round(self.tokens.available, 2) if self.tokens else None,
+            "admitted": self._admitted,
+            "delayed": self._delayed,
+            "waiting": self._waiting,
+            "total_wait_seconds": round(self._total_wait, 3),
+            "max_wait_seconds": round(self._max_wait, 3),
+            "estimated_tokens": self._estimated_tokens,
+            "actual_tokens": self._actual_tokens,
+        }
+
+
+class RateLimitLease:
+    """一次模型调用的额度租约（异步上下文管理器）
+
+    进入时预占额度；调用方通过 record_usage 报告实际 token 用量，退出时据此修正。
+    未配置限流的模型使用空租约。
+    """
+
+    def __init__(self, limiter: Optional[ModelRateLimiter], estimated_tokens: int):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.actual_tokens: Optional[int] = None
+
+    def record_usage(self, total_tokens: Optional[int]) -> None:
+        if total_tokens is not None:
+            self.actual_tokens = int(total_tokens)
+
+    async def __aenter__(self) -> "RateLimitLease":
+        if self.limiter is not None:
+            await self.limiter.acquire(self.estimated_tokens)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self.limiter is not None and self.actual_tokens is not None:
+            self.limiter.settle(self.estimated_tokens, self.actual_tokens)
+
+
+def _limit_value(config: Dict[str, Any], *keys: str) -> Optional[float]:
+    for key in keys:
+        value = config.get(key)
+        if value:
+            return float(value)
+    return None
+
+
+class RateLimiterRegistry:
+    """按模型名登记的限流器（进程内共享）"""
+
+    def __init__(self):
+        self._limiters: Dict[str, Optional[ModelRateLimiter]] = {}
+        self._lock = threading.Lock()
+
+    def for_config(self, config: Dict[str, Any]) -> Optional[ModelRateLimiter]:
+        """取模型配置对应的限流器；配置中未声明 rpm/tpm 时返回 None"""
+        name = config.get("name") or config.get("model") or "default"
+        with self._lock:
+            if name not in self._limiters:
+                rpm = _limit_value(config, "rpm", "requests_per_minute")
+                tpm = _limit_value(config, "tpm", "tokens_per_minute")
+                limiter = ModelRateLimiter(name, rpm, tpm) if (rpm or tpm) else None
+                if limiter is not None:
+                    logger.info(f"Rate limiter for {name}: rpm={rpm}, tpm={tpm}")
+                self._limiters[name] = limiter
+            return self._limiters[name]
+
+    def lease(self, config: Dict[str, Any], estimated_tokens: int) -> RateLimitLease:
+        """为一次调用创建额度租约"""
+        return RateLimitLease(self.for_config(config), estimated_tokens)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.get_stats() for name, limiter in self._limiters.items() if limiter is not None}
+
+
+def estimate_request_tokens(prompt: str, max_tokens: Optional[int] = None) -> int:
+    """估算一次调用的总 token 数：提示词 + 预计输出（按与输入等长估计，不超过 max_tokens）"""
+    prompt_tokens = estimate_tokens(prompt)
+    completion = prompt_tokens if not max_tokens else min(int(max_tokens), prompt_tokens)
+    return max(1, prompt_tokens + completion)
+
+
+def extract_usage(result: Any) -> Optional[int]:
+    """从服务商响应（JSON 字典或 LangChain 消息）中提取实际 token 用量"""
+    if isinstance(result, dict):
+        usage = result.get("usage") or {}
+        if usage.get("total_tokens") is not None:
+            return int(usage["total_tokens"])
+        if usage.get("input_tokens") is not None or usage.get("output_tokens") is not None:
+            return int(usage.get("input_tokens") or 0) + int(usage.get("output_tokens") or 0)
+        if result.get("prompt_eval_count") is not None or result.get("eval_count") is not None:
+            # Ollama
+            return int(result.get("prompt_eval_count") or 0) + int(result.get("eval_count") or 0)
+        return None
+    usage_metadata = getattr(result, "usage_metadata", None)
+    if usage_metadata and usage_metadata.get("total_tokens") is not None:
+        return int(usage_metadata["total_tokens"])
+    response_metadata = getattr(result, "response_metadata", None) or {}
+    token_usage = response_metadata.get("token_usage") or response_metadata.get("usage") or {}
+    if isinstance(token_usage, dict) and token_usage.get("total_tokens") is not None:
+        return int(token_usage["total_tokens"])
+    return None
+
+
+# 全局限流器登记表（AIModelManager 与 LangChainManager 共用）
+rate_limiter_registry = RateLimiterRegistry()
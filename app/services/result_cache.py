@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+翻译/总结结果缓存
+按内容寻址：键由操作类型、实际模型、提示词模板版本、参数与规范化文本共同哈希得到，
+重复请求直接命中缓存，无需再调用大模型。
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 操作类型 -> (提示词类别, 模板名)，用于计算模板版本
+_OPERATION_TEMPLATES = {
+    "zh2en": ("translation", "ZH_TO_EN"),
+    "en2zh": ("translation", "EN_TO_ZH"),
+    "auto_translate": ("translation", "AUTO_TRANSLATE"),
+    "summarize": ("summarization", "BASIC_SUMMARY"),
+    "keyword": ("summarization", "KEYWORD_SUMMARY"),
+    "structured": ("summarization", "STRUCTURED_SUMMARY"),
+    "batch_zh2en": ("translation", "BATCH_TRANSLATE"),
+    "batch_en2zh": ("translation", "BATCH_TRANSLATE"),
+    "batch_auto_translate": ("translation", "BATCH_TRANSLATE"),
+}
+
+_template_versions: Dict[str, str] = {}
+
+
+def template_version(operation: str) -> str:
+    """返回操作对应提示词模板的版本号（模板内容哈希），模板修改后旧缓存自动失效"""
+    version = _template_versions.get(operation)
+    if version is not None:
+        return version
+
+    from .prompt.templates import prompt_manager
+
+    source = ""
+    category, name = _OPERATION_TEMPLATES.get(operation, (None, None))
+    if category is not None:
+        group = prompt_manager.translation if category == "translation" else prompt_manager.summarization
+        template = getattr(group, name, None)
+        source = getattr(template, "template", "") or ""
+    version = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    _template_versions[operation] = version
+    return version
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：统一 Unicode 组合形式与换行，去除首尾空白"""
+    text = unicodedata.normalize("NFC", text or "")
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def cache_bypass_requested(headers: Mapping[str, str]) -> bool:
+    """请求头 X-Cache-Bypass: 1/true 或 Cache-Control: no-cache 时跳过缓存"""
+    bypass = (headers.get("x-cache-bypass") or "").strip().lower()
+    if bypass in {"1", "true", "yes"}:
+        return True
+    cache_control = (headers.get("cache-control") or "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+class _CacheEntry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value: str, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """带 LRU + TTL 淘汰的结果缓存，按条目数与字节数双重限制内存"""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        enabled: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._bypasses = 0
+
+    @staticmethod
+    def make_key(
+        operation: str,
+        model: Optional[str],
+        text: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """生成内容寻址的缓存键"""
+        payload = {
+            "op": operation,
+            "model": model or "",
+            "template": template_version(operation),
+            "params": {k: v for k, v in (params or {}).items() if v is not None},
+            "text": normalize_text(text),
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，过期条目视为未命中"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """写入缓存，超出条目数或字节上限时按 LRU 淘汰"""
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(value, size, expires_at)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self) -> None:
+        """清空缓存（统计计数保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    async def get_or_compute(
+        self,
+        operation: str,
+        model: Optional[str],
+        text: str,
+        compute: Callable[[], Awaitable[str]],
+        params: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        cacheable: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """命中则直接返回，否则执行 compute 并缓存结果（异常与不可缓存结果不写入）"""
+        if not self.enabled or not use_cache:
+            if self.enabled:
+                self._bypasses += 1
+            return await compute()
+
+        key = self.make_key(operation, model, text, params)
+        cached = self.get(key)
+        if cached is not None:
+            logger.debug(f"Result cache hit: op={operation}, model={model}")
+            return cached
+
+        result = await compute()
+        if isinstance(result, str) and (cacheable is None or cacheable(result)):
+            self.set(key, result)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中/未命中/淘汰等统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "bypasses": self._bypasses,
+            }
+
+
+def _create_result_cache() -> ResultCache:
+    """根据配置中的 cache 段创建全局缓存"""
+    cache_cfg = getattr(settings, "cache", None) or {}
+    return ResultCache(
+        max_entries=int(cache_cfg.get("max_entries", 10000)),
+        max_bytes=int(cache_cfg.get("max_bytes", 64 * 1024 * 1024)),
+        ttl_seconds=float(cache_cfg.get("ttl_seconds", 3600)),
+        enabled=bool(cache_cfg.get("enabled", True)),
+    )
+
+
+# 全局结果缓存实例
+result_cache = _create_result_cache()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相同请求的并发合并（single-flight）
+同一键的调用在执行期间只会真正发起一次，后到的调用方等待首个调用的结果。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def make_flight_key(*parts: Any) -> str:
+    """由任意可序列化的片段生成合并键"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """进行中调用表：相同键共享同一个 asyncio.Task
+
+    等待方通过 asyncio.shield 等待共享任务，单个等待方被取消不会取消共享调用；
+    最后一个等待方也被取消时（如对冲请求的落败方），共享调用随之取消并立即移出调用表，
+    此后相同键的调用方发起新的调用，不会加入正在取消的调用而收到 CancelledError。
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self._leaders = 0
+        self._coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """执行 fn，若相同键的调用正在进行则复用其结果"""
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+        if task is not None and not task.done() and not task.cancelling() and task.get_loop() is loop:
+            self._coalesced += 1
+            logger.debug(f"SingleFlight[{self.name}]: joined in-flight call {key[:12]}")
+        else:
+            task = loop.create_task(fn())
+            self._calls[key] = task
+            self._leaders += 1
+            task.add_done_callback(partial(self._forget, key))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                task.cancel()
+                if self._calls.get(key) is task:
+                    del self._calls[key]
+            raise
+        finally:
+            remaining = self._waiters.get(task, 1) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 标记异常已读取，避免所有等待方都被取消时出现未处理异常警告
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """当前进行中的共享调用数"""
+        return len(self._calls)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """合并统计"""
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "leaders": self._leaders,
+            "coalesced": self._coalesced,
+        }
+
+
+# 模型调用的全局合并表（同步接口、LangChain 与异步任务共用）
+model_call_flight = SingleFlight("model_calls")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步任务事件的发布/订阅中心
+一个订阅关注一批任务 ID，任务状态、进度变化与结束时由任务管理器发布事件，
+按任务索引直接投递到关注该任务的订阅，不需要为每个订阅者轮询。
+订阅内对同一任务只保留最新事件（进度合并），内存占用与关注的任务数成正比。
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Set
+
+logger = logging.getLogger(__name__)
+
+# 结束事件：任务完成、失败、已被删除（过期/淘汰）或不存在
+TERMINAL_EVENTS = frozenset({"completed", "failed", "removed", "not_found"})
+
+
+class TaskSubscription:
+    """一个订阅（对应一条 SSE 连接）"""
+
+    def __init__(self, task_ids: Iterable[str]):
+        self.task_ids: List[str] = list(dict.fromkeys(task_ids))
+        # 尚未收到结束事件的任务
+        self.remaining: Set[str] = set(self.task_ids)
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def push(self, event: Dict[str, Any]) -> None:
+        task_id = event["task_id"]
+        if task_id not in self.remaining:
+            return
+        if event["event"] in TERMINAL_EVENTS:
+            self.remaining.discard(task_id)
+        # 同一任务未发送的旧事件被新事件覆盖
+        self._pending[task_id] = event
+        self._ready.set()
+
+    @property
+    def done(self) -> bool:
+        """所有任务都已结束且事件已全部取走"""
+        return not self.remaining and not self._pending
+
+    async def next_events(self, timeout: float) -> List[Dict[str, Any]]:
+        """取出待发送的事件；timeout 秒内没有新事件时返回空列表（由调用方发送心跳）"""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class TaskEventHub:
+    """按任务 ID 索引订阅的事件中心"""
+
+    def __init__(self, heartbeat_seconds: float = 15.0):
+        self.heartbeat_seconds = heartbeat_seconds
+        self._by_task: Dict[str, Set[TaskSubscription]] = {}
+        self._subscriptions: Set[TaskSubscription] = set()
+        self._published = 0
+
+    def subscribe(self, task_ids: Iterable[str]) -> TaskSubscription:
+        subscription = TaskSubscription(task_ids)
+        self._subscriptions.add(subscription)
+        for task_id in subscription.task_ids:
+            self._by_task.setdefault(task_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: TaskSubscription) -> None:
+        self._subscriptions.discard(subscription)
+        for task_id in subscription.task_ids:
+            subscribers = self._by_task.get(task_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._by_task[task_id]
+
+    def has_subscribers(self, task_id: str) -> bool:
+        return task_id in self._by_task
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """投递事件到关注该任务的订阅；结束事件之后不再有该任务的事件，直接移除索引"""
+        task_id = event["task_id"]
+        if event["event"] in TERMINAL_EVENTS:
+            subscribers = self._by_task.pop(task_id, None)
+        else:
+            subscribers = self._by_task.get(task_id)
+        if not subscribers:
+            return
+        self._published += 1
+        for subscription in list(subscribers):
+            subscription.push(event)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "subscriptions": len(self._subscriptions),
+            "watched_tasks": len(self._by_task),
+            "published_events": self._published,
+        }
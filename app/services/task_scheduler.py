@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步任务调度策略
+以 asyncio.Queue 子类实现不同的出队顺序（与 asyncio.PriorityQueue 的做法一致），
+worker 只需 get() 即可按当前策略取到下一个任务 ID。
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# 入队条目：(task_id, priority, cost)，cost 为估算的输入 token 数
+QueueItem = Tuple[str, int, int]
+
+
+class FifoTaskQueue(asyncio.Queue):
+    """先进先出"""
+    policy = "fifo"
+
+    def _init(self, maxsize):
+        self._queue = deque()
+
+    def _put(self, item: QueueItem):
+        self._queue.append(item[0])
+
+    def _get(self) -> str:
+        return self._queue.popleft()
+
+
+class _HeapTaskQueue(asyncio.Queue, ABC):
+    """按排序键出队的堆队列，键相同时按入队顺序；子类实现 _sort_key"""
+
+    def _init(self, maxsize):
+        self._queue = []
+        self._counter = itertools.count()
+
+    @abstractmethod
+    def _sort_key(self, item: QueueItem) -> float:
+        """条目的排序键，越小越先出队"""
+
+    def _put(self, item: QueueItem):
+        heapq.heappush(self._queue, (self._sort_key(item), next(self._counter), item[0]))
+
+    def _get(self) -> str:
+        return heapq.heappop(self._queue)[2]
+
+
+class PriorityTaskQueue(_HeapTaskQueue):
+    """按请求指定的优先级出队（数值越大越先执行）"""
+    policy = "priority"
+
+    def _sort_key(self, item: QueueItem) -> float:
+        return -item[1]
+
+
+class ShortestJobFirstTaskQueue(_HeapTaskQueue):
+    """短作业优先：估算 token 数少的任务先执行，并随等待时间老化避免大任务饿死
+
+    有效代价 = cost - aging_rate × 已等待秒数。由于所有条目的 aging_rate × now 相同，
+    按 cost + aging_rate × 入队时刻 排序即等价，堆键在入队时即可确定。
+    """
+    policy = "sjf"
+
+    def __init__(self, maxsize: int = 0, aging_tokens_per_second: float = 50.0):
+        self.aging_tokens_per_second = aging_tokens_per_second
+        super().__init__(maxsize)
+
+    def _sort_key(self, item: QueueItem) -> float:
+        return item[2] + self.aging_tokens_per_second * time.monotonic()
+
+
+SCHEDULING_POLICIES = {
+    FifoTaskQueue.policy: FifoTaskQueue,
+    PriorityTaskQueue.policy: PriorityTaskQueue,
+    ShortestJobFirstTaskQueue.policy: ShortestJobFirstTaskQueue,
+}
+
+
+def create_task_queue(policy: str = "fifo", maxsize: int = 0, config: Optional[Dict[str, Any]] = None) -> asyncio.Queue:
+    """按调度策略创建任务队列（须在目标事件循环中调用）"""
+    config = config or {}
+    policy = (policy or "fifo").lower()
+    if policy == ShortestJobFirstTaskQueue.policy:
+        return ShortestJobFirstTaskQueue(
+            maxsize, aging_tokens_per_second=float(config.get("sjf_aging_tokens_per_second", 50))
+        )
+    queue_cls = SCHEDULING_POLICIES.get(policy)
+    if queue_cls is None:
+        logger.warning(f"Unknown scheduling policy '{policy}', falling back to fifo")
+        queue_cls = FifoTaskQueue
+    return queue_cls(maxsize)
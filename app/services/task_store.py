@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步任务存储
+TaskStore 定义任务的持久化接口：默认使用进程内字典，也可切换为 SQLite
+（WAL 模式、批量写入），使任务在重启后保留并可被多个 worker 共享。
+列表接口按 (created_at, task_id) 游标分页，状态 / 类型计数无需遍历全部任务。
+"""
+import base64
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .async_task_manager import TaskInfo, TaskStatus, TaskType
+
+logger = logging.getLogger(__name__)
+
+
+def _sort_key(task: TaskInfo) -> Tuple[float, str]:
+    return (task.created_ts, task.task_id)
+
+
+def encode_cursor(task: TaskInfo) -> str:
+    """由一页中最后一个任务生成下一页游标"""
+    created, task_id = _sort_key(task)
+    return base64.urlsafe_b64encode(f"{created!r}|{task_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        created, task_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return float(created), task_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _enum_value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+class TaskStore(ABC):
+    """任务存储接口"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[TaskInfo]:
+        """按 ID 读取任务"""
+
+    @abstractmethod
+    def save(self, task: TaskInfo) -> None:
+        """新增或更新任务"""
+
+    @abstractmethod
+    def delete(self, task_id: str) -> None:
+        """删除任务"""
+
+    @abstractmethod
+    def list(self, status: Optional[TaskStatus] = None) -> List[TaskInfo]:
+        """列出任务（可按状态过滤），按创建时间倒序"""
+
+    @abstractmethod
+    def delete_created_before(self, cutoff: datetime) -> List[str]:
+        """删除创建时间早于 cutoff 的任务，返回被删除的任务 ID"""
+
+    def query(
+        self,
+        status: Optional[TaskStatus] = None,
+        task_type: Optional[TaskType] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[TaskInfo], Optional[str]]:
+        """按创建时间倒序分页列出任务，返回 (本页任务, 下一页游标)；子类应使用索引覆盖此默认实现"""
+        after = decode_cursor(cursor) if cursor else None
+        tasks = [
+            t for t in self.list(status)
+            if (task_type is None or t.task_type == task_type) and (after is None or _sort_key(t) < after)
+        ]
+        tasks.sort(key=_sort_key, reverse=True)
+        page = tasks[:limit]
+        return page, encode_cursor(page[-1]) if len(tasks) > limit else None
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """按状态与类型统计任务数"""
+        tasks = self.list()
+        return {
+            "by_status": dict(Counter(_enum_value(t.status) for t in tasks)),
+            "by_type": dict(Counter(_enum_value(t.task_type) for t in tasks)),
+        }
+
+    def claim(self, task_id: str) -> bool:
+        """认领待处理任务（pending -> running），多个 worker 共享存储时保证只执行一次"""
+        task = self.get(task_id)
+        if task is None or task.status != TaskStatus.PENDING:
+            return False
+        task.status = TaskStatus.RUNNING
+        self.save(task)
+        return True
+
+    def flush(self) -> None:
+        """将缓冲的写入落盘"""
+
+    def close(self) -> None:
+        """关闭存储"""
+
+
+class _SortedIndex:
+    """按 (created_at, task_id) 有序的任务键列表，支持倒序游标分页"""
+
+    def __init__(self):
+        self.keys: List[Tuple[float, str]] = []
+
+    def add(self, key: Tuple[float, str]) -> None:
+        # 任务大多按创建时间递增写入，通常直接追加到末尾
+        if not self.keys or key > self.keys[-1]:
+            self.keys.append(key)
+        else:
+            bisect.insort(self.keys, key)
+
+    def remove(self, key: Tuple[float, str]) -> None:
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def before(self, after: Optional[Tuple[float, str]]):
+        """从 after 之前（更早）开始倒序遍历"""
+        end = bisect.bisect_left(self.keys, after) if after is not None else len(self.keys)
+        for index in range(end - 1, -1, -1):
+            yield self.keys[index]
+
+
+class InMemoryTaskStore(TaskStore):
+    """进程内字典存储（默认），重启后任务丢失
+
+    维护全量、按状态、按类型三组有序索引与计数，任务状态变化时（save / claim）增量更新。
+    """
+
+    def __init__(self):
+        self.tasks: Dict[str, TaskInfo] = {}
+        self._all = _SortedIndex()
+        self._by_status: Dict[Any, _SortedIndex] = {}
+        self._by_type: Dict[Any, _SortedIndex] = {}
+        # 任务当前所在的索引位置：task_id -> (排序键, 状态, 类型)
+        self._indexed: Dict[str, Tuple[Tuple[float, str], Any, Any]] = {}
+
+    def _index(self, task: TaskInfo) -> None:
+        key, status, task_type = _sort_key(task), _enum_value(task.status), _enum_value(task.task_type)
+        previous = self._indexed.get(task.task_id)
+        if previous == (key, status, task_type):
+            return
+        if previous is not None:
+            self._unindex(task.task_id)
+        self._all.add(key)
+        self._by_status.setdefault(status, _SortedIndex()).add(key)
+        self._by_type.setdefault(task_type, _SortedIndex()).add(key)
+        self._indexed[task.task_id] = (key, status, task_type)
+
+    def _unindex(self, task_id: str) -> None:
+        previous = self._indexed.pop(task_id, None)
+        if previous is None:
+            return
+        key, status, task_type = previous
+        self._all.remove(key)
+        self._by_status[status].remove(key)
+        self._by_type[task_type].remove(key)
+
+    def get(self, task_id: str) -> Optional[TaskInfo]:
+        return self.tasks.get(task_id)
+
+    def save(self, task: TaskInfo) -> None:
+        self.tasks[task.task_id] = task
+        self._index(task)
+
+    def delete(self, task_id: str) -> None:
+        self.tasks.pop(task_id, None)
+        self._unindex(task_id)
+
+    def list(self, status: Optional[TaskStatus] = None) -> List[TaskInfo]:
+        index = self._all if status is None else self._by_status.get(_enum_value(status), _SortedIndex())
+        return [self.tasks[task_id] for _, task_id in index.before(None)]
+
+    def query(
+        self,
+        status: Optional[TaskStatus] = None,
+        task_type: Optional[TaskType] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[TaskInfo], Optional[str]]:
+        # 同时按状态与类型过滤时遍历较小的索引，另一个条件逐条判断
+        candidates = [self._all]
+        if status is not None:
+            candidates.append(self._by_status.get(_enum_value(status), _SortedIndex()))
+        if task_type is not None:
+            candidates.append(self._by_type.get(_enum_value(task_type), _SortedIndex()))
+        index = min(candidates, key=len)
+        after = decode_cursor(cursor) if cursor else None
+        page: List[TaskInfo] = []
+        has_more = False
+        for _, task_id in index.before(after):
+            _, indexed_status, indexed_type = self._indexed[task_id]
+            if status is not None and indexed_status != _enum_value(status):
+                continue
+            if task_type is not None and indexed_type != _enum_value(task_type):
+                continue
+            if len(page) == limit:
+                has_more = True
+                break
+            page.append(self.tasks[task_id])
+        return page, encode_cursor(page[-1]) if has_more else None
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "by_status": {status: len(index) for status, index in self._by_status.items() if len(index)},
+            "by_type": {task_type: len(index) for task_type, index in self._by_type.items() if len(index)},
+        }
+
+    def delete_created_before(self, cutoff: datetime) -> List[str]:
+        # 索引按创建时间有序，过期任务位于开头
+        end = bisect.bisect_left(self._all.keys, (cutoff.timestamp(), ""))
+        expired = [task_id for _, task_id in self._all.keys[:end]]
+        for task_id in expired:
+            self.delete(task_id)
+        return expired
+
+    def claim(self, task_id: str) -> bool:
+        task = self.tasks.get(task_id)
+        if task is None or task.status != TaskStatus.PENDING:
+            return False
+        task.status = TaskStatus.RUNNING
+        self._index(task)
+        return True
+
+
+_COLUMNS = (
+    "task_id", "task_type", "status", "created_at", "updated_at", "input_data",
+    "result", "error_message", "progress", "model_name", "use_chains",
+    "retry_count", "max_retries", "priority", "checkpoint",
+)
+
+# 写入规则（excluded 为待写入的行，tasks 为库中已有的行）：
+# - 库中仍为 pending 的任务可被任意更新
+# - 写回 pending 只在重试时允许（retry_count 增加），否则是其他进程认领前的过时缓冲
+# - 写入 running 不覆盖已结束（completed / failed / expired）的任务
+# - 写入结束状态（完成、失败、取消）总是生效
+_TERMINAL_STATUSES = "('completed', 'failed', 'expired')"
+_UPSERT_SQL = (
+    f"INSERT INTO tasks ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)}) "
+    f"ON CONFLICT(task_id) DO UPDATE SET "
+    f"{', '.join(f'{c} = excluded.{c}' for c in _COLUMNS if c != 'task_id')} "
+    f"WHERE tasks.status = 'pending' "
+    f"OR (excluded.status = 'pending' AND excluded.retry_count > tasks.retry_count) "
+    f"OR (excluded.status = 'running' AND tasks.status NOT IN {_TERMINAL_STATUSES}) "
+    f"OR excluded.status IN {_TERMINAL_STATUSES}"
+)
+
+
+def task_to_row(task: TaskInfo) -> tuple:
+    """TaskInfo -> 数据库行（失败回调为进程内对象，不持久化）"""
+    return (
+        task.task_id,
+        getattr(task.task_type, "value", task.task_type),
+        getattr(task.status, "value", task.status),
+        task.created_ts,
+        task.updated_at.timestamp(),
+        json.dumps(task.input_data, ensure_ascii=False, default=str),
+        task.result,
+        task.error_message,
+        task.progress,
+        task.model_name,
+        1 if task.use_chains else 0,
+        task.retry_count,
+        task.max_retries,
+        task.priority,
+        json.dumps(task.checkpoint, ensure_ascii=False) if task.checkpoint else None,
+    )
+
+
+def task_from_row(row: sqlite3.Row) -> TaskInfo:
+    """数据库行 -> TaskInfo"""
+    return TaskInfo(
+        task_id=row["task_id"],
+        task_type=TaskType(row["task_type"]),
+        status=TaskStatus(row["status"]),
+        created_at=row["created_at"],
+        updated_at=row["updated_at"],
+        input_data=json.loads(row["input_data"]),
+        result=row["result"],
+        error_message=row["error_message"],
+        progress=row["progress"],
+        model_name=row["model_name"],
+        use_chains=bool(row["use_chains"]),
+        retry_count=row["retry_count"],
+        max_retries=row["max_retries"],
+        priority=row["priority"],
+        checkpoint=json.loads(row["checkpoint"]) if row["checkpoint"] else None,
+    )
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite 任务存储
+
+    - WAL 模式：读写互不阻塞，多个 worker 进程可共享同一数据库文件
+    - 批量写入：save 先进入写缓冲，由后台线程按间隔或缓冲条数批量提交；
+      本进程读取时优先读缓冲，保证读到自己的最新写入
+    - status、task_type 与 created_at 建有索引，供分页列表、计数与过期清理使用
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.2, batch_size: int = 100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._pending: Dict[str, tuple] = {}
+        self._init_schema()
+
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="task-store-flusher", daemon=True)
+        self._flusher.start()
+
+    def _init_schema(self) -> None:
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    task_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    input_data TEXT NOT NULL,
+                    result TEXT,
+                    error_message TEXT,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    model_name TEXT,
+                    use_chains INTEGER NOT NULL DEFAULT 1,
+                    retry_count INTEGER NOT NULL DEFAULT 0,
+                    max_retries INTEGER NOT NULL DEFAULT 3,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    checkpoint TEXT
+                )
+                """
+            )
+            # 兼容旧库：补齐后加的列
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+            if "priority" not in columns:
+                self._conn.execute("ALTER TABLE tasks ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+            if "checkpoint" not in columns:
+                self._conn.execute("ALTER TABLE tasks ADD COLUMN checkpoint TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)")
+            # 分页列表：按状态 / 类型过滤后按 (created_at, task_id) 倒序走索引
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at, task_id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tasks_type_created ON tasks(task_type, created_at, task_id)"
+            )
+
+    def _write_rows(self, rows: List[tuple]) -> None:
+        """批量写入；多个进程共享数据库，已被其他进程推进的任务不会被本进程过时的缓冲行覆盖"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(_UPSERT_SQL, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"SQLiteTaskStore flush failed: {e}")
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            rows = list(self._pending.values())
+            self._pending.clear()
+            self._write_rows(rows)
+
+    def save(self, task: TaskInfo) -> None:
+        with self._lock:
+            self._pending[task.task_id] = task_to_row(task)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def get(self, task_id: str) -> Optional[TaskInfo]:
+        with self._lock:
+            pending = self._pending.get(task_id)
+            if pending is not None:
+                return task_from_row(dict(zip(_COLUMNS, pending)))
+            row = self._conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return task_from_row(row) if row else None
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            self._pending.pop(task_id, None)
+            self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+
+    def list(self, status: Optional[TaskStatus] = None) -> List[TaskInfo]:
+        self.flush()
+        with self._lock:
+            if status is None:
+                rows = self._conn.execute("SELECT * FROM tasks ORDER BY created_at DESC").fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC",
+                    (getattr(status, "value", status),),
+                ).fetchall()
+        return [task_from_row(row) for row in rows]
+
+    def query(
+        self,
+        status: Optional[TaskStatus] = None,
+        task_type: Optional[TaskType] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[TaskInfo], Optional[str]]:
+        self.flush()
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(_enum_value(status))
+        if task_type is not None:
+            clauses.append("task_type = ?")
+            params.append(_enum_value(task_type))
+        if cursor:
+            created, task_id = decode_cursor(cursor)
+            clauses.append("(created_at < ? OR (created_at = ? AND task_id < ?))")
+            params.extend([created, created, task_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM tasks {where} ORDER BY created_at DESC, task_id DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        page = [task_from_row(row) for row in rows[:limit]]
+        return page, encode_cursor(page[-1]) if len(rows) > limit else None
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        # 多个进程共享同一数据库，计数以库为准；两列均有索引，GROUP BY 只扫描索引
+        self.flush()
+        with self._lock:
+            by_status = self._conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status").fetchall()
+            by_type = self._conn.execute("SELECT task_type, COUNT(*) AS n FROM tasks GROUP BY task_type").fetchall()
+        return {
+            "by_status": {row["status"]: row["n"] for row in by_status},
+            "by_type": {row["task_type"]: row["n"] for row in by_type},
+        }
+
+    def delete_created_before(self, cutoff: datetime) -> List[str]:
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id FROM tasks WHERE created_at < ?", (cutoff.timestamp(),)
+            ).fetchall()
+            expired = [row["task_id"] for row in rows]
+            if expired:
+                self._conn.execute("DELETE FROM tasks WHERE created_at < ?", (cutoff.timestamp(),))
+        return expired
+
+    def claim(self, task_id: str) -> bool:
+        with self._lock:
+            # 先把该任务的缓冲写入落盘（已被其他 worker 推进的任务不会被覆盖回 pending），
+            # 再做条件更新，保证多个 worker 中只有一个认领成功
+            pending = self._pending.pop(task_id, None)
+            if pending is not None:
+                self._write_rows([pending])
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE task_id = ? AND status = ?",
+                (TaskStatus.RUNNING.value, datetime.now().timestamp(), task_id, TaskStatus.PENDING.value),
+            )
+            return cursor.rowcount == 1
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._flusher.join(timeout=2)
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def create_task_store(config: Optional[Dict[str, Any]] = None) -> TaskStore:
+    """根据配置中的 async_tasks 段创建任务存储"""
+    config = config or {}
+    backend = (config.get("store") or "memory").lower()
+    if backend == "sqlite":
+        path = config.get("sqlite_path") or "data/tasks.db"
+        logger.info(f"Using SQLite task store at {path}")
+        return SQLiteTaskStore(
+            path,
+            flush_interval=float(config.get("flush_interval_seconds", 0.2)),
+            batch_size=int(config.get("batch_size", 100)),
+        )
+    if backend != "memory":
+        logger.warning(f"Unknown task store '{backend}', falling back to memory")
+    return InMemoryTaskStore()
@@ -1,7 +1,10 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import asyncio
 import logging
 from ..utils.exceptions import (
+    DegradedResponseError,
     EmptyTextError,
+    InvalidRequestError,
     ModelAPIError,
     ModelNotAvailableError,
     TranslateAPIException
@@ -35,11 +38,75 @@ class TranslationService:
             self._prompt_manager = prompt_manager
         return self._prompt_manager
 
-    async def zh2en(self, text: str, **kwargs) -> str:
-        """中文翻译成英文"""
+    async def _translate_chunked(self, translate, text: str, use_cache: bool, target_is_cjk: bool, **kwargs) -> str:
+        """长文档分块并发翻译，各分块单独经结果缓存后按原顺序拼接"""
+        from .chunking import translate_chunked, format_chunk_with_context
+
+        async def translate_chunk(chunk_text: str, neighbours: Optional[Dict[str, str]]) -> str:
+            return await translate(
+                format_chunk_with_context(chunk_text, neighbours),
+                use_cache=use_cache,
+                chunked=False,
+                **kwargs
+            )
+
+        return await translate_chunked(
+            text,
+            translate_chunk,
+            model_key=self.ai_manager.resolve_service_name(self.model_name),
+            target_is_cjk=target_is_cjk,
+        )
+
+    async def _summarize_long(self, mode: str, text: str, summarize_fn, finalize_fn=None) -> str:
+        """长文本分层总结（map_reduce / refine），中间总结单独经结果缓存"""
+        from .chunking import summarize_map_reduce, summarize_refine
+
+        if mode == "refine":
+            return await summarize_refine(text, summarize_fn, finalize_fn)
+        model_key = self.ai_manager.resolve_service_name(self.model_name)
+        return await summarize_map_reduce(text, summarize_fn, finalize_fn, model_key=model_key)
+
+    async def _call_model(self, prompt: str, **kwargs) -> str:
+        """调用模型补全（不经缓存），并发的相同调用合并为一次"""
+        from .single_flight import model_call_flight, make_flight_key
+
+        resolved_model = self.ai_manager.resolve_service_name(self.model_name)
+        key = make_flight_key("text_completion", resolved_model, prompt, kwargs)
+        return await model_call_flight.do(
+            key,
+            lambda: self.ai_manager.text_completion(prompt, service_name=self.model_name, **kwargs)
+        )
+
+    async def _complete(
+        self,
+        operation: str,
+        text: str,
+        prompt: str,
+        params: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        **kwargs
+    ) -> str:
+        """调用模型补全：结果经内容寻址缓存（失败不缓存），并发的相同调用合并为一次"""
+        from .result_cache import result_cache
+
+        return await result_cache.get_or_compute(
+            operation,
+            self.ai_manager.resolve_service_name(self.model_name),
+            text,
+            lambda: self._call_model(prompt, **kwargs),
+            params={**(params or {}), **kwargs},
+            use_cache=use_cache,
+        )
+
+    async def zh2en(self, text: str, use_cache: bool = True, chunked: Optional[bool] = None, **kwargs) -> str:
+        """中文翻译成英文（chunked 为 None 时超过阈值的长文本自动分块）"""
         if not text or not text.strip():
             raise EmptyTextError()
         
+        from .chunking import should_chunk
+        if should_chunk(text, chunked):
+            return await self._translate_chunked(self.zh2en, text, use_cache, target_is_cjk=False, **kwargs)
+        
         from .prompt.templates import TranslationPromptType
         
         try:
@@ -50,11 +117,7 @@ class TranslationService:
             )
             
             # 调用AI模型进行翻译
-            result = await self.ai_manager.text_completion(
-                prompt, 
-                service_name=self.model_name,
-                **kwargs
-            )
+            result = await self._complete("zh2en", text, prompt, use_cache=use_cache, **kwargs)
             
             return result.strip()
         except (ModelAPIError, ModelNotAvailableError, TranslateAPIException):
@@ -64,11 +127,15 @@ class TranslationService:
             logger.exception(f"Unexpected error in zh2en translation: {e}")
             raise ModelAPIError(f"Translation failed: {str(e)}", self.model_name, e)
 
-    async def en2zh(self, text: str, **kwargs) -> str:
-        """英文翻译成中文"""
+    async def en2zh(self, text: str, use_cache: bool = True, chunked: Optional[bool] = None, **kwargs) -> str:
+        """英文翻译成中文（chunked 为 None 时超过阈值的长文本自动分块）"""
         if not text or not text.strip():
             raise EmptyTextError()
         
+        from .chunking import should_chunk
+        if should_chunk(text, chunked):
+            return await self._translate_chunked(self.en2zh, text, use_cache, target_is_cjk=True, **kwargs)
+        
         from .prompt.templates import TranslationPromptType
         
         try:
@@ -79,11 +146,7 @@ class TranslationService:
             )
             
             # 调用AI模型进行翻译
-            result = await self.ai_manager.text_completion(
-                prompt, 
-                service_name=self.model_name,
-                **kwargs
-            )
+            result = await self._complete("en2zh", text, prompt, use_cache=use_cache, **kwargs)
             
             return result.strip()
         except (ModelAPIError, ModelNotAvailableError, TranslateAPIException):
@@ -92,96 +155,227 @@ class TranslationService:
             logger.exception(f"Unexpected error in en2zh translation: {e}")
             raise ModelAPIError(f"Translation failed: {str(e)}", self.model_name, e)
 
-    async def auto_translate(self, text: str, **kwargs) -> str:
+    async def auto_translate(self, text: str, use_cache: bool = True, **kwargs) -> str:
         """自动检测语言并翻译"""
         try:
-            from prompt.templates import TranslationPromptType
-            # 获取自动翻译提示词（使用枚举类型安全）
-            prompt = self.prompt_manager.get_translation_prompt(
-                TranslationPromptType.AUTO_TRANSLATE,
-                text=text
-            )
-            
-            # 调用AI模型进行翻译
-            result = await self.ai_manager.text_completion(
-                prompt, 
-                service_name=self.model_name,
-                **kwargs
-            )
-            
-            return result.strip()
+            return await self._auto_translate(text, use_cache=use_cache, **kwargs)
             
         except Exception as e:
             return f"Translation failed: {str(e)}"
 
-    async def summarize(self, text: str, max_length: int = 200, **kwargs) -> str:
-        """文本总结"""
+    async def _auto_translate(self, text: str, use_cache: bool = True, **kwargs) -> str:
+        """单次自动翻译调用（出错时抛出异常）"""
+        from .prompt.templates import TranslationPromptType
+        # 获取自动翻译提示词（使用枚举类型安全）
+        prompt = self.prompt_manager.get_translation_prompt(
+            TranslationPromptType.AUTO_TRANSLATE,
+            text=text
+        )
+        
+        # 调用AI模型进行翻译
+        result = await self._complete("auto_translate", text, prompt, use_cache=use_cache, **kwargs)
+        
+        return result.strip()
+
+    async def summarize(self, text: str, max_length: int = 200, use_cache: bool = True, mode: Optional[str] = None, **kwargs) -> str:
+        """文本总结（mode: single / map_reduce / refine，为 None 时超过阈值的长文本自动 map_reduce）"""
         try:
-            from .prompt.templates import SummarizationPromptType
-            # 获取总结提示词（使用枚举类型安全）
-            prompt = self.prompt_manager.get_summarization_prompt(
-                SummarizationPromptType.BASIC_SUMMARY,
-                text=text,
-                max_length=max_length
-            )
-            
-            # 调用AI模型进行总结
-            result = await self.ai_manager.text_completion(
-                prompt, 
-                service_name=self.model_name,
-                **kwargs
-            )
-            
-            return result.strip()
+            from .chunking import resolve_summary_mode
+            mode = resolve_summary_mode(text, mode)
+            if mode != "single":
+                # 分层总结的每一步出错即抛出，整个总结失败，不把错误提示文本当作中间总结
+                return await self._summarize_long(
+                    mode, text,
+                    lambda part: self._summarize(part, max_length=max_length, use_cache=use_cache, **kwargs),
+                )
+            return await self._summarize(text, max_length=max_length, use_cache=use_cache, **kwargs)
             
         except Exception as e:
             return f"Summarization failed: {str(e)}"
 
-    async def keyword_summary(self, text: str, summary_length: int = 100, **kwargs) -> str:
-        """关键词提取总结"""
+    async def _summarize(self, text: str, max_length: int = 200, use_cache: bool = True, **kwargs) -> str:
+        """单次总结调用（出错时抛出异常）"""
+        from .prompt.templates import SummarizationPromptType
+        # 获取总结提示词（使用枚举类型安全）
+        prompt = self.prompt_manager.get_summarization_prompt(
+            SummarizationPromptType.BASIC_SUMMARY,
+            text=text,
+            max_length=max_length
+        )
+        
+        # 调用AI模型进行总结
+        result = await self._complete(
+            "summarize", text, prompt, params={"max_length": max_length}, use_cache=use_cache, **kwargs
+        )
+        
+        return result.strip()
+
+    async def keyword_summary(self, text: str, summary_length: int = 100, use_cache: bool = True, mode: Optional[str] = None, **kwargs) -> str:
+        """关键词提取总结（长文本先分层总结，再对合并结果提取关键词）"""
         try:
-            from prompt.templates import SummarizationPromptType
-            # 获取关键词总结提示词（使用枚举类型安全）
-            prompt = self.prompt_manager.get_summarization_prompt(
-                SummarizationPromptType.KEYWORD_SUMMARY,
-                text=text,
-                summary_length=summary_length
-            )
-            
-            # 调用AI模型进行总结
-            result = await self.ai_manager.text_completion(
-                prompt, 
-                service_name=self.model_name,
-                **kwargs
-            )
-            
-            return result.strip()
+            from .chunking import resolve_summary_mode
+            mode = resolve_summary_mode(text, mode)
+            if mode != "single":
+                return await self._summarize_long(
+                    mode, text,
+                    lambda part: self._summarize(part, max_length=summary_length, use_cache=use_cache, **kwargs),
+                    lambda merged: self._keyword_summary(merged, summary_length=summary_length, use_cache=use_cache, **kwargs),
+                )
+            return await self._keyword_summary(text, summary_length=summary_length, use_cache=use_cache, **kwargs)
             
         except Exception as e:
             return f"Keyword summary failed: {str(e)}"
 
-    async def structured_summary(self, text: str, max_length: int = 300, **kwargs) -> str:
-        """结构化总结"""
+    async def _keyword_summary(self, text: str, summary_length: int = 100, use_cache: bool = True, **kwargs) -> str:
+        """单次关键词总结调用（出错时抛出异常）"""
+        from .prompt.templates import SummarizationPromptType
+        # 获取关键词总结提示词（使用枚举类型安全）
+        prompt = self.prompt_manager.get_summarization_prompt(
+            SummarizationPromptType.KEYWORD_SUMMARY,
+            text=text,
+            summary_length=summary_length
+        )
+        
+        # 调用AI模型进行总结
+        result = await self._complete(
+            "keyword", text, prompt, params={"summary_length": summary_length}, use_cache=use_cache, **kwargs
+        )
+        
+        return result.strip()
+
+    async def structured_summary(self, text: str, max_length: int = 300, use_cache: bool = True, mode: Optional[str] = None, **kwargs) -> str:
+        """结构化总结（长文本先分层总结，再对合并结果做结构化整理）"""
         try:
-            from .prompt.templates import SummarizationPromptType
-            # 获取结构化总结提示词（使用枚举类型安全）
-            prompt = self.prompt_manager.get_summarization_prompt(
-                SummarizationPromptType.STRUCTURED_SUMMARY,
-                text=text,
-                max_length=max_length
-            )
-            
-            # 调用AI模型进行总结
-            result = await self.ai_manager.text_completion(
-                prompt, 
-                service_name=self.model_name,
-                **kwargs
-            )
-            
-            return result.strip()
+            from .chunking import resolve_summary_mode
+            mode = resolve_summary_mode(text, mode)
+            if mode != "single":
+                return await self._summarize_long(
+                    mode, text,
+                    lambda part: self._summarize(part, max_length=max_length, use_cache=use_cache, **kwargs),
+                    lambda merged: self._structured_summary(merged, max_length=max_length, use_cache=use_cache, **kwargs),
+                )
+            return await self._structured_summary(text, max_length=max_length, use_cache=use_cache, **kwargs)
             
         except Exception as e:
             return f"Structured summary failed: {str(e)}"
+
+    async def _structured_summary(self, text: str, max_length: int = 300, use_cache: bool = True, **kwargs) -> str:
+        """单次结构化总结调用（出错时抛出异常）"""
+        from .prompt.templates import SummarizationPromptType
+        # 获取结构化总结提示词（使用枚举类型安全）
+        prompt = self.prompt_manager.get_summarization_prompt(
+            SummarizationPromptType.STRUCTURED_SUMMARY,
+            text=text,
+            max_length=max_length
+        )
+        
+        # 调用AI模型进行总结
+        result = await self._complete(
+            "structured", text, prompt, params={"max_length": max_length}, use_cache=use_cache, **kwargs
+        )
+        
+        return result.strip()
+    
+    async def batch_translate(self, segments: List[str], operation: str = "zh2en", use_cache: bool = True) -> Dict[str, Any]:
+        """批量翻译短文本：按 token 预算打包为少量模型调用并发发送，按编号拆回各条
+
+        重复条目只翻译一次；拆分失败或整包调用失败的条目单独重译。
+        """
+        from .batch_translate import BATCH_INSTRUCTIONS, pack_segments, build_batch_prompt, parse_batch_response
+        from .chunking import get_model_semaphore, should_chunk
+        from .langchain_service import is_successful_response
+        from .result_cache import result_cache, normalize_text
+
+        operation = getattr(operation, "value", operation)
+        if operation not in BATCH_INSTRUCTIONS:
+            raise InvalidRequestError(f"Unsupported batch operation: {operation}", field="operation")
+
+        model_key = self.ai_manager.resolve_service_name(self.model_name)
+        cache_op = f"batch_{operation}"
+        lookup_cache = use_cache and result_cache.enabled
+        translations = [""] * len(segments)
+        cached = 0
+
+        # 去重：相同文本只翻译一次，结果回填到所有位置
+        positions: Dict[str, List[int]] = {}
+        for index, segment in enumerate(segments):
+            if not segment or not segment.strip():
+                continue
+            positions.setdefault(normalize_text(segment), []).append(index)
+
+        pending: List[int] = []
+        for indices in positions.values():
+            first = indices[0]
+            hit = result_cache.get(result_cache.make_key(cache_op, model_key, segments[first])) if lookup_cache else None
+            if hit is not None:
+                cached += len(indices)
+                for index in indices:
+                    translations[index] = hit
+            else:
+                pending.append(first)
+
+        def fill(first: int, value: str) -> None:
+            for index in positions[normalize_text(segments[first])]:
+                translations[index] = value
+
+        packs = pack_segments(segments, pending)
+        semaphore = get_model_semaphore(model_key)
+        fallback: List[int] = []
+
+        async def run_pack(pack: List[int]) -> None:
+            prompt = build_batch_prompt(operation, segments, pack)
+            try:
+                async with semaphore:
+                    response = await self._call_model(prompt)
+            except Exception as e:
+                logger.warning(f"Batch pack of {len(pack)} segments failed, retrying individually: {e}")
+                fallback.extend(pack)
+                return
+            parsed = parse_batch_response(response, len(pack))
+            for n, index in enumerate(pack, start=1):
+                if n in parsed:
+                    fill(index, parsed[n])
+                    if lookup_cache:
+                        result_cache.set(result_cache.make_key(cache_op, model_key, segments[index]), parsed[n])
+                else:
+                    fallback.append(index)
+
+        await asyncio.gather(*(run_pack(pack) for pack in packs))
+
+        async def run_single(index: int) -> None:
+            if operation == "auto_translate":
+                # 自动翻译不分块；使用抛出异常的内部方法，失败不会被当作译文
+                async with semaphore:
+                    result = await self._auto_translate(segments[index], use_cache=use_cache)
+            elif should_chunk(segments[index]):
+                # 超长条目走分块流程，由各分块自行获取同一信号量；持有信号量再进入分块会互相等待而死锁
+                result = await getattr(self, operation)(segments[index], use_cache=use_cache)
+            else:
+                async with semaphore:
+                    result = await getattr(self, operation)(segments[index], use_cache=use_cache, chunked=False)
+            if not is_successful_response(result):
+                raise DegradedResponseError(result, self.model_name)
+            fill(index, result)
+
+        errors: List[Dict[str, Any]] = []
+        if fallback:
+            logger.info(f"Batch translate: {len(fallback)} segments re-sent individually")
+            # 单条失败只影响该条（及其重复条目），其余已完成的打包与单独重译结果照常返回
+            outcomes = await asyncio.gather(*(run_single(index) for index in fallback), return_exceptions=True)
+            for first, outcome in zip(fallback, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.warning(f"Batch translate: segment {first} failed: {outcome}")
+                    for index in positions[normalize_text(segments[first])]:
+                        errors.append({"index": index, "error": str(outcome)})
+            errors.sort(key=lambda item: item["index"])
+
+        return {
+            "translations": translations,
+            "packs": len(packs),
+            "cached": cached,
+            "fallbacks": len(fallback),
+            "errors": errors,
+        }
     
     def get_available_models(self) -> list:
         """获取可用的AI模型列表"""
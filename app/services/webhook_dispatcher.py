@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Webhook 投递
+任务完成或失败时把结果推送到提交时指定的 URL。投递在后台进行：
+- 所有投递共用一个 httpx 连接池，并发投递数有上限
+- 网络错误、408/429 与 5xx 按指数退避（带抖动，优先使用 Retry-After）重试，
+  等待重试期间不占用投递协程
+- 配置了 secret 时以 HMAC-SHA256 对 "时间戳.请求体" 签名
+- 用尽重试次数或遇到不可重试的响应时写入死信日志（JSON Lines）
+- URL 由调用方提供，提交与每次投递前校验目标主机：默认拒绝解析到回环、链路本地、
+  私有等非公网地址的主机（防止 SSRF）；配置 allowed_hosts 时只允许其中的主机；不跟随重定向
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from ..core.config import settings
+from .key_pool import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+_DEFAULTS: Dict[str, Any] = {
+    "max_concurrency": 8,
+    "max_attempts": 5,
+    "retry_base_delay_seconds": 1.0,
+    "retry_max_delay_seconds": 60.0,
+    "timeout_seconds": 10.0,
+    "secret": None,
+    "dead_letter_path": "logs/webhook_dead_letters.jsonl",
+    "allowed_hosts": [],
+    "allow_private_hosts": False,
+}
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    """计算签名；接收方以同样方式计算并用 hmac.compare_digest 比较 X-Webhook-Signature"""
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256)
+    return f"sha256={digest.hexdigest()}"
+
+
+def _is_public_address(address: ipaddress._BaseAddress) -> bool:
+    """是否为公网地址（排除回环、链路本地、私有、保留与组播地址）"""
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def _is_retryable_status(status_code: int) -> bool:
+    return status_code in (408, 429) or status_code >= 500
+
+
+class WebhookDelivery:
+    """一次 Webhook 投递（含重试）"""
+
+    __slots__ = ("delivery_id", "url", "event", "body", "attempts", "last_error", "created_ts")
+
+    def __init__(self, url: str, event: str, payload: Dict[str, Any]):
+        self.delivery_id = str(uuid.uuid4())
+        self.url = url
+        self.event = event
+        self.body = json.dumps(
+            {"event": event, "delivery_id": self.delivery_id, **payload}, ensure_ascii=False, default=str
+        ).encode("utf-8")
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.created_ts = time.time()
+
+
+class WebhookDispatcher:
+    """后台 Webhook 投递器"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        max_attempts: int = 5,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 60.0,
+        timeout: float = 10.0,
+        secret: Optional[str] = None,
+        dead_letter_path: Optional[str] = None,
+        allowed_hosts: Optional[List[str]] = None,
+        allow_private_hosts: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.timeout = timeout
+        self.secret = secret or None
+        self.dead_letter_path = Path(dead_letter_path) if dead_letter_path else None
+        self.allowed_hosts = {h.strip().lower() for h in (allowed_hosts or []) if h and h.strip()}
+        self.allow_private_hosts = bool(allow_private_hosts)
+        self._transport = transport
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._retry_timers: Dict[str, asyncio.TimerHandle] = {}
+        # 已提交但尚未投递成功或进入死信的数量
+        self._pending = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._dead_letters: Deque[Dict[str, Any]] = deque(maxlen=100)
+        self._stats = {"submitted": 0, "delivered": 0, "attempts": 0, "retries": 0, "dead_lettered": 0}
+
+    @classmethod
+    def from_settings(cls) -> "WebhookDispatcher":
+        config = dict(_DEFAULTS)
+        config.update(getattr(settings, "webhooks", None) or {})
+        return cls(
+            max_concurrency=config["max_concurrency"],
+            max_attempts=config["max_attempts"],
+            retry_base_delay=float(config["retry_base_delay_seconds"]),
+            retry_max_delay=float(config["retry_max_delay_seconds"]),
+            timeout=float(config["timeout_seconds"]),
+            secret=config["secret"],
+            dead_letter_path=config["dead_letter_path"],
+            allowed_hosts=config["allowed_hosts"],
+            allow_private_hosts=config["allow_private_hosts"],
+        )
+
+    def _ensure_started(self) -> None:
+        """在当前事件循环上启动投递协程；事件循环变化时（如测试中多次 asyncio.run）重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._queue is not None:
+            return
+        for timer in self._retry_timers.values():
+            timer.cancel()
+        self._retry_timers.clear()
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending = 0
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            transport=self._transport,
+            follow_redirects=False,
+        )
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+    async def validate_url(self, url: str) -> None:
+        """校验 Webhook 目标，不允许时抛出 ValueError（说明原因）"""
+        parsed = urlsplit(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError("must be an absolute http(s) URL")
+        host = parsed.hostname.lower()
+        if self.allowed_hosts:
+            if host not in self.allowed_hosts:
+                raise ValueError(f"host '{host}' is not in webhooks.allowed_hosts")
+            return
+        if self.allow_private_hosts:
+            return
+        try:
+            addresses = [ipaddress.ip_address(host)]
+        except ValueError:
+            try:
+                port = parsed.port or (443 if parsed.scheme == "https" else 80)
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except (socket.gaierror, UnicodeError, ValueError):
+                raise ValueError(f"host '{host}' cannot be resolved")
+            # IPv6 地址可能带有 %scope 后缀
+            addresses = [ipaddress.ip_address(info[4][0].split("%", 1)[0]) for info in infos]
+        for address in addresses:
+            if not _is_public_address(address):
+                raise ValueError(f"host '{host}' resolves to non-public address {address}")
+
+    def submit(self, url: str, event: str, payload: Dict[str, Any]) -> Optional[str]:
+        """提交一次投递，立即返回 delivery_id；需在事件循环中调用，否则记录告警并放弃"""
+        try:
+            self._ensure_started()
+        except RuntimeError:
+            logger.warning(f"Webhook {event} to {url} dropped: no running event loop")
+            return None
+        delivery = WebhookDelivery(url, event, payload)
+        self._pending += 1
+        self._idle.clear()
+        self._stats["submitted"] += 1
+        self._queue.put_nowait(delivery)
+        return delivery.delivery_id
+
+    async def _worker(self) -> None:
+        while True:
+            delivery = await self._queue.get()
+            try:
+                await self._attempt(delivery)
+            except Exception as e:
+                logger.error(f"Webhook worker error for {delivery.delivery_id}: {e}")
+                self._finish(delivery, delivered=False)
+            finally:
+                self._queue.task_done()
+
+    def _headers(self, delivery: WebhookDelivery) -> Dict[str, str]:
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Id": delivery.delivery_id,
+            "X-Webhook-Event": delivery.event,
+            "X-Webhook-Timestamp": timestamp,
+            "X-Webhook-Attempt": str(delivery.attempts),
+        }
+        if self.secret:
+            headers["X-Webhook-Signature"] = sign_payload(self.secret, timestamp, delivery.body)
+        return headers
+
+    async def _attempt(self, delivery: WebhookDelivery) -> None:
+        delivery.attempts += 1
+        self._stats["attempts"] += 1
+        retry_after = None
+        try:
+            # 每次投递前重新校验，避免提交后 DNS 记录被改指向内网
+            await self.validate_url(delivery.url)
+        except ValueError as e:
+            delivery.last_error = f"Blocked: {e}"
+            self._dead_letter(delivery)
+            return
+        try:
+            response = await self._client.post(delivery.url, content=delivery.body, headers=self._headers(delivery))
+        except httpx.HTTPError as e:
+            delivery.last_error = f"{type(e).__name__}: {e}"
+            retryable = True
+        else:
+            if response.status_code < 300:
+                self._finish(delivery, delivered=True)
+                return
+            delivery.last_error = f"HTTP {response.status_code}"
+            retryable = _is_retryable_status(response.status_code)
+            retry_after = retry_after_seconds(response)
+
+        if retryable and delivery.attempts < self.max_attempts:
+            self._schedule_retry(delivery, retry_after)
+        else:
+            self._dead_letter(delivery)
+
+    def _retry_delay(self, delivery: WebhookDelivery, retry_after: Optional[float]) -> float:
+        backoff = min(self.retry_max_delay, self.retry_base_delay * (2 ** (delivery.attempts - 1)))
+        delay = random.uniform(backoff / 2, backoff)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        return delay
+
+    def _schedule_retry(self, delivery: WebhookDelivery, retry_after: Optional[float]) -> None:
+        delay = self._retry_delay(delivery, retry_after)
+        self._stats["retries"] += 1
+        logger.info(
+            f"Webhook {delivery.delivery_id} to {delivery.url} failed ({delivery.last_error}), "
+            f"retrying in {delay:.1f}s (attempt {delivery.attempts + 1}/{self.max_attempts})"
+        )
+        self._retry_timers[delivery.delivery_id] = self._loop.call_later(delay, self._requeue, delivery)
+
+    def _requeue(self, delivery: WebhookDelivery) -> None:
+        self._retry_timers.pop(delivery.delivery_id, None)
+        self._queue.put_nowait(delivery)
+
+    def _dead_letter(self, delivery: WebhookDelivery) -> None:
+        record = {
+            "delivery_id": delivery.delivery_id,
+            "url": delivery.url,
+            "event": delivery.event,
+            "attempts": delivery.attempts,
+            "last_error": delivery.last_error,
+            "created_at": datetime.fromtimestamp(delivery.created_ts).isoformat(),
+            "dead_lettered_at": datetime.now().isoformat(),
+            "payload": json.loads(delivery.body),
+        }
+        self._dead_letters.append(record)
+        logger.error(
+            f"Webhook {delivery.delivery_id} to {delivery.url} dead-lettered after "
+            f"{delivery.attempts} attempts: {delivery.last_error}"
+        )
+        if self.dead_letter_path is not None:
+            try:
+                self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to write webhook dead letter: {e}")
+        self._finish(delivery, delivered=False)
+
+    def _finish(self, delivery: WebhookDelivery, delivered: bool) -> None:
+        self._stats["delivered" if delivered else "dead_lettered"] += 1
+        self._pending = max(0, self._pending - 1)
+        if self._pending == 0:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待所有已提交的投递结束（成功或进入死信）；超时返回 False"""
+        if self._idle is None or self._loop is not asyncio.get_running_loop():
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def shutdown(self, drain_timeout: float = 5.0) -> None:
+        """等待进行中的投递（最多 drain_timeout 秒）后停止投递协程并关闭连接池"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        if not await self.wait_idle(drain_timeout):
+            logger.warning(f"Webhook dispatcher shutting down with {self._pending} undelivered webhooks")
+        for timer in self._retry_timers.values():
+            timer.cancel()
+        self._retry_timers.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._queue = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "pending": self._pending,
+            "waiting_retry": len(self._retry_timers),
+            "max_concurrency": self.max_concurrency,
+            "recent_dead_letters": list(self._dead_letters)[-10:],
+        }
+
+
+# 全局 Webhook 投递器
+webhook_dispatcher = WebhookDispatcher.from_settings()
@@ -24,6 +24,11 @@ async def translate_api_exception_handler(request: Request, exc: TranslateAPIExc
         }
     )
     
+    # 限流/排队类错误通过 Retry-After 告知客户端重试时间
+    headers = None
+    if exc.details.get("retry_after") is not None:
+        headers = {"Retry-After": str(exc.details["retry_after"])}
+    
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -31,7 +36,8 @@ async def translate_api_exception_handler(request: Request, exc: TranslateAPIExc
             "status_code": exc.status_code,
             "details": exc.details,
             "path": request.url.path
-        }
+        },
+        headers=headers
     )
 
 
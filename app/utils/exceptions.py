@@ -42,16 +42,38 @@ class ModelAPIError(AIModelException):
             self.details["error_type"] = type(original_error).__name__
 
 
+class DegradedResponseError(ModelAPIError):
+    """模型调用返回了降级的错误提示文本而非正常结果（可重试）"""
+    def __init__(self, response: str, model_name: Optional[str] = None):
+        super().__init__(f"Model returned a failure response: {response[:200]}", model_name)
+        self.details["response"] = response[:200]
+
+
 class AuthenticationError(AIModelException):
     """认证错误（API密钥无效等）"""
     def __init__(self, message: str = "Authentication failed. Please check your API key", model_name: Optional[str] = None):
         super().__init__(message, model_name, status_code=401)
 
 
+class CircuitOpenError(AIModelException):
+    """所有候选模型均处于熔断状态"""
+    def __init__(self, models: list, retry_after: int):
+        super().__init__(
+            f"All candidate models are temporarily unavailable (circuit open): {', '.join(models)}",
+            model_name=models[0] if models else None,
+            status_code=503
+        )
+        self.details["models"] = list(models)
+        self.details["retry_after"] = retry_after
+
+
 class RateLimitError(AIModelException):
-    """速率限制错误"""
-    def __init__(self, message: str = "Rate limit exceeded", model_name: Optional[str] = None):
+    """速率限制错误（retry_after 为服务商 Retry-After 给出的等待秒数）"""
+    def __init__(self, message: str = "Rate limit exceeded", model_name: Optional[str] = None, retry_after: Optional[float] = None):
         super().__init__(message, model_name, status_code=429)
+        self.retry_after = retry_after
+        if retry_after is not None:
+            self.details["retry_after"] = retry_after
 
 
 class InvalidRequestError(TranslateAPIException):
@@ -92,6 +114,17 @@ class TaskAlreadyCompletedError(TranslateAPIException):
         self.details["task_id"] = task_id
 
 
+class TaskQueueFullError(TranslateAPIException):
+    """任务队列已满，稍后重试"""
+    def __init__(self, queue_size: int, retry_after: int):
+        super().__init__(
+            f"Task queue is full ({queue_size} tasks waiting), retry after {retry_after}s",
+            status_code=429
+        )
+        self.details["queue_size"] = queue_size
+        self.details["retry_after"] = retry_after
+
+
 class ConfigurationError(TranslateAPIException):
     """配置错误"""
     def __init__(self, message: str, config_key: Optional[str] = None):
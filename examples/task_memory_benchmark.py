@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保留任务的内存占用基准
+对比原先的 dataclass 任务记录与当前紧凑表示（__slots__ + epoch 时间戳 + 正文压缩）
+每个保留任务占用的字节数。
+
+用法：python examples/task_memory_benchmark.py [任务数] [输入字符数]
+"""
+import random
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.async_task_manager import TaskInfo, TaskStatus, TaskType
+
+
+@dataclass
+class LegacyTaskInfo:
+    """改造前的任务记录布局"""
+    task_id: str
+    task_type: TaskType
+    status: TaskStatus
+    created_at: datetime
+    updated_at: datetime
+    input_data: Dict[str, Any]
+    result: Optional[str] = None
+    error_message: Optional[str] = None
+    progress: int = 0
+    model_name: Optional[str] = None
+    use_chains: bool = True
+    retry_count: int = 0
+    max_retries: int = 3
+    priority: int = 0
+    failure_callback: Optional[Callable] = None
+
+
+# 随机抽取常用字 / 单词拼成正文，压缩率接近真实文本而不是重复串
+HANZI = [chr(c) for c in range(0x4E00, 0x4E00 + 2500)]
+WORDS = (
+    "the of and to in is that for it as with was on be by this are from or an which at not have has but "
+    "model translation document chunk service request latency provider result summary language system "
+    "their more will can one all would there been when who into other also than its only these after"
+).split()
+
+
+def _bodies(i: int, chars: int):
+    rng = random.Random(i)
+    text = "".join(rng.choice(HANZI) if n % 20 else "，" for n in range(chars))
+    words, length = [], 0
+    while length < chars * 2:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return text, " ".join(words)[:chars * 2]
+
+
+def retained_bytes(obj: Any, seen: Set[int]) -> int:
+    """对象及其独占引用的字节数；已计入的对象（共享的枚举、驻留的模型名等）不重复计算"""
+    if id(obj) in seen or obj is None or isinstance(obj, (bool, Enum)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(retained_bytes(k, seen) + retained_bytes(v, seen) for k, v in obj.items())
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += retained_bytes(vars(obj), seen)
+    elif hasattr(type(obj), "__slots__"):
+        size += sum(retained_bytes(getattr(obj, name, None), seen) for name in type(obj).__slots__)
+    return size
+
+
+def measure(cls, bodies: List[Tuple[str, str]]) -> float:
+    """返回每个保留任务的平均字节数（含输入、结果正文与时间戳对象）"""
+    model_names = ["dashscope", "openai"]
+    tasks = []
+    for i, (text, result) in enumerate(bodies):
+        now = datetime.now()
+        tasks.append(cls(
+            task_id=f"{i:08d}-0000-0000-0000-000000000000",
+            task_type=TaskType.ZH2EN,
+            status=TaskStatus.COMPLETED,
+            created_at=now,
+            updated_at=now,
+            input_data={"text": text, "chunked": None},
+            result=result,
+            model_name="".join(model_names[i % 2]),  # 模拟每个请求各自解析出的模型名
+            progress=100,
+        ))
+    seen: Set[int] = set()
+    return sum(retained_bytes(task, seen) for task in tasks) / len(tasks)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"{count} retained tasks")
+    for chars in ([int(sys.argv[2])] if len(sys.argv) > 2 else [200, 2000, 10000]):
+        bodies = [_bodies(i, chars) for i in range(count)]
+        before = measure(LegacyTaskInfo, bodies)
+        after = measure(TaskInfo, bodies)
+        print(
+            f"input {chars:>6} chars: dataclass {before:>10,.0f} B/task -> compact {after:>10,.0f} B/task "
+            f"({after / before:.1%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
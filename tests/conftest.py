@@ -1,6 +1,8 @@
 """
 测试配置和fixtures
 """
+import asyncio
+import time
 import pytest
 import os
 from unittest.mock import AsyncMock, MagicMock
@@ -26,6 +28,7 @@ def mock_ai_services():
     # Mock AIModelManager
     original_init = AIModelManager.__init__
     original_get_service = AIModelManager.get_service
+    original_service_for = AIModelManager._service_for
     original_get_available_services = AIModelManager.get_available_services
 
     def mock_init(self):
@@ -41,6 +44,7 @@ def mock_ai_services():
     # 替换方法
     AIModelManager.__init__ = mock_init
     AIModelManager.get_service = mock_get_service
+    AIModelManager._service_for = mock_get_service
     AIModelManager.get_available_services = mock_get_available_services
 
     yield
@@ -48,6 +52,7 @@ def mock_ai_services():
     # 恢复原始方法
     AIModelManager.__init__ = original_init
     AIModelManager.get_service = original_get_service
+    AIModelManager._service_for = original_service_for
     AIModelManager.get_available_services = original_get_available_services
 
 
@@ -68,4 +73,67 @@ def test_env():
 
     # 恢复原始环境变量
     os.environ.clear()
-    os.environ.update(original_env)
\ No newline at end of file
+    os.environ.update(original_env)
+
+
+@pytest.fixture
+def fake_service(monkeypatch):
+    """替换异步任务调用的 LangChainTranslationService，zh2en 返回 "EN:<原文>"
+
+    返回的 state 可在测试中调整：delay 为每次调用前的等待秒数；failures 为 {原文: 异常}，
+    默认 "坏" 抛出 ValueError("bad input")；fail_times 非 None 时每条原文只在前 fail_times 次调用时失败；
+    calls 按调用顺序记录原文。
+    """
+    state = {"calls": [], "delay": 0.0, "failures": {"坏": ValueError("bad input")}, "fail_times": None}
+
+    class FakeLangChainService:
+        def __init__(self, model_name=None, use_chains=True):
+            pass
+
+        async def zh2en(self, text, **kwargs):
+            state["calls"].append(text)
+            if state["delay"]:
+                await asyncio.sleep(state["delay"])
+            error = state["failures"].get(text)
+            if error is not None and (state["fail_times"] is None or state["calls"].count(text) <= state["fail_times"]):
+                raise error
+            return f"EN:{text}"
+
+    import app.services.langchain_translate as lct
+    monkeypatch.setattr(lct, "LangChainTranslationService", FakeLangChainService)
+    return state
+
+
+class Waiter:
+    """轮询等待异步条件成立，超时即 pytest.fail，而不是静默返回后由后续断言给出误导性的失败"""
+
+    def __init__(self, timeout: float = 2.0, interval: float = 0.01):
+        self.timeout = timeout
+        self.interval = interval
+
+    async def until(self, predicate, timeout=None, what="condition"):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() >= deadline:
+                pytest.fail(f"Timed out after {timeout}s waiting for {what}")
+            await asyncio.sleep(self.interval)
+
+    async def tasks_done(self, manager, task_ids, timeout=None):
+        """等待任务全部结束（已完成、已失败，或结束后已被删除）"""
+        from app.services.async_task_manager import TaskStatus
+
+        def finished():
+            tasks = [manager.store.get(task_id) for task_id in task_ids]
+            return all(t is None or t.status in (TaskStatus.COMPLETED, TaskStatus.FAILED) for t in tasks)
+
+        await self.until(finished, timeout, f"tasks {list(task_ids)} to finish")
+
+    async def job_done(self, manager, job_id, timeout=None):
+        await self.until(lambda: manager.get_job(job_id, limit=1)["done"], timeout, f"bulk job {job_id} to finish")
+
+
+@pytest.fixture
+def wait():
+    """异步等待工具，见 Waiter"""
+    return Waiter()
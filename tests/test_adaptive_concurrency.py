@@ -0,0 +1,171 @@
+"""
+测试按后端的 AIMD 自适应并发上限
+"""
+import asyncio
+import httpx
+import pytest
+from app.services.adaptive_concurrency import (
+    OVERLOAD,
+    SUCCESS,
+    AdaptiveConcurrencyLimiter,
+    ConcurrencyLimiterRegistry,
+    classify_error,
+    classify_status,
+)
+from app.services.ai_model import OpenAIService
+from app.services.key_pool import KeyPoolRegistry
+from app.utils.exceptions import RateLimitError
+
+
+def _saturate(limiter, latency=0.1, rounds=1):
+    """模拟上限被用满的一批成功调用"""
+    for _ in range(rounds):
+        limit = limiter.current_limit
+        for _ in range(limit):
+            limiter._in_flight += 1
+            limiter.release(SUCCESS, latency, in_flight=limit, generation=limiter._generation)
+
+
+def test_additive_increase_only_when_limit_is_used():
+    limiter = AdaptiveConcurrencyLimiter("m", initial_limit=2, min_samples=3)
+    # 未用满上限时不增大
+    limiter._in_flight += 1
+    limiter.release(SUCCESS, 0.1, in_flight=1)
+    assert limiter.limit == 2
+    _saturate(limiter, rounds=6)
+    assert 4 <= limiter.current_limit <= 6
+
+
+def test_overload_cuts_limit_once_per_generation():
+    limiter = AdaptiveConcurrencyLimiter("m", initial_limit=16, backoff_ratio=0.5)
+    generation = limiter._generation
+    for _ in range(3):
+        limiter._in_flight += 1
+        limiter.release(OVERLOAD, 0.1, generation=generation)
+    # 同一批在途请求的多次 429 只收缩一次
+    assert limiter.limit == 8
+    limiter._in_flight += 1
+    limiter.release(OVERLOAD, 0.1, generation=limiter._generation)
+    assert limiter.limit == 4
+    assert limiter.get_stats()["decreases"] == 2
+    for _ in range(10):
+        limiter._in_flight += 1
+        limiter.release(OVERLOAD, 0.1, generation=limiter._generation)
+    assert limiter.limit == limiter.min_limit == 1
+
+
+def test_latency_spike_cuts_limit_and_tokens_normalize_latency():
+    limiter = AdaptiveConcurrencyLimiter("m", initial_limit=8, min_samples=5, ewma_alpha=0.5)
+    for _ in range(5):
+        limiter._in_flight += 1
+        limiter.release(SUCCESS, 0.2, tokens=100, in_flight=1)
+    # 长文本耗时更长，但每 token 耗时不变，不视为尖峰
+    limiter._in_flight += 1
+    limiter.release(SUCCESS, 2.0, tokens=1000, in_flight=1)
+    assert limiter.limit == 8
+    generation = limiter._generation
+    for _ in range(3):
+        limiter._in_flight += 1
+        limiter.release(SUCCESS, 1.0, tokens=100, in_flight=1, generation=generation)
+    assert limiter.limit == 4
+
+
+def test_waiters_admitted_in_order_when_slots_free():
+    limiter = AdaptiveConcurrencyLimiter("m", initial_limit=1)
+    order = []
+
+    async def call(name, hold):
+        await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(hold)
+        limiter.release(SUCCESS, hold)
+
+    async def run():
+        await asyncio.gather(call("a", 0.02), call("b", 0), call("c", 0))
+
+    asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    stats = limiter.get_stats()
+    assert stats["queued"] == 2
+    assert stats["in_flight"] == 0
+    assert stats["waiting"] == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    limiter = AdaptiveConcurrencyLimiter("m", initial_limit=1)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release(SUCCESS, 0.1)
+
+    asyncio.run(run())
+    assert limiter.get_stats()["in_flight"] == 0
+    assert limiter.get_stats()["waiting"] == 0
+
+
+def test_waiter_cancelled_after_grant_returns_slot():
+    limiter = AdaptiveConcurrencyLimiter("m", initial_limit=1)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        # release 把名额转交给等待者，但结果要到下一轮事件循环才设置；此时取消
+        limiter.release(SUCCESS, 0.1)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.get_stats()["in_flight"] == 0
+        await asyncio.wait_for(limiter.acquire(), 1)
+        limiter.release(SUCCESS, 0.1)
+
+    asyncio.run(run())
+    assert limiter.get_stats()["in_flight"] == 0
+
+
+def test_classification():
+    assert classify_status(200) == SUCCESS
+    assert classify_status(429) == OVERLOAD
+    assert classify_status(503) == OVERLOAD
+    assert classify_status(400) != OVERLOAD
+    assert classify_error(httpx.ReadTimeout("slow")) == OVERLOAD
+    assert classify_error(ValueError("bad input")) != OVERLOAD
+
+
+def test_registry_uses_model_overrides_and_can_be_disabled():
+    registry = ConcurrencyLimiterRegistry()
+    limiter = registry.for_config({"name": "ollama", "concurrency": {"enabled": True, "initial_limit": 8, "max_limit": 2}})
+    assert limiter.current_limit == 2
+    assert registry.for_config({"name": "off", "concurrency": {"enabled": False}}) is None
+    # 默认关闭，未显式开启的模型不受限制
+    assert registry.for_config({"name": "default"}) is None
+    assert set(registry.get_stats()) == {"ollama"}
+
+
+def test_provider_429_shrinks_backend_limit(monkeypatch):
+    import app.services.ai_model as ai_model
+    registry = ConcurrencyLimiterRegistry()
+    monkeypatch.setattr(ai_model, "concurrency_limiters", registry)
+    monkeypatch.setattr(ai_model, "key_pools", KeyPoolRegistry())
+
+    def handler(request):
+        return httpx.Response(429, json={"error": "slow down"})
+
+    service = OpenAIService({"name": "gpt-aimd", "api_key": "k", "concurrency": {"enabled": True, "initial_limit": 8}})
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        with pytest.raises(RateLimitError):
+            await service.text_completion("hello")
+        await service.aclose()
+
+    asyncio.run(run())
+    stats = registry.get_stats()["gpt-aimd"]
+    assert stats["limit"] == 4
+    assert stats["overloads"] == 1
+    assert stats["in_flight"] == 0
@@ -0,0 +1,61 @@
+"""
+测试AI模型服务的连接池复用
+"""
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.ai_model import OpenAIService, OllamaService
+
+
+client = TestClient(app)
+
+
+def _make_openai_service(handler):
+    service = OpenAIService({
+        "name": "pool-test",
+        "api_key": "test-key",
+        "base_url": "http://upstream.test/v1",
+        "pool": {"max_connections": 3},
+    })
+    service._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler),
+        limits=service._pool_limits(),
+    )
+    return service
+
+
+def test_service_reuses_single_client():
+    """多次调用复用同一个客户端，并统计请求数"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    service = _make_openai_service(handler)
+    pooled_client = service.client
+
+    async def run():
+        results = await asyncio.gather(*(service.text_completion("hi") for _ in range(5)))
+        assert results == ["ok"] * 5
+        assert service.client is pooled_client
+        stats = service.get_pool_stats()
+        assert stats["total_requests"] == 5
+        assert stats["max_connections"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["pool_open"] is True
+        await service.aclose()
+        assert service.get_pool_stats()["pool_open"] is False
+
+    asyncio.run(run())
+
+
+def test_provider_default_pool_limits():
+    """不同厂商使用各自的默认连接池上限"""
+    ollama = OllamaService({"model": "llama2"})
+    openai = OpenAIService({"model": "gpt-3.5-turbo"})
+    assert ollama._pool_limits().max_connections < openai._pool_limits().max_connections
+
+
+def test_pool_stats_endpoint():
+    resp = client.get("/api/translate/models/pool")
+    assert resp.status_code == 200
+    assert "pools" in resp.json()
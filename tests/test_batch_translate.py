@@ -0,0 +1,136 @@
+"""
+测试批量翻译接口
+"""
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.ai_model import ai_model_manager
+from app.services.batch_translate import pack_segments, parse_batch_response
+from app.services.result_cache import result_cache
+
+
+client = TestClient(app)
+
+
+def _echo_batch(prompt, **kwargs):
+    """模拟模型：把打包的每条文本加上前缀返回"""
+    payload = prompt.split("待翻译内容：", 1)[1]
+    items = json.loads(payload[payload.index("["):payload.rindex("]") + 1])
+    return json.dumps([{"id": item["id"], "text": f"EN:{item['text']}"} for item in items], ensure_ascii=False)
+
+
+def test_pack_segments_respects_limits():
+    segments = ["短文本"] * 100
+    packs = pack_segments(segments, list(range(100)), max_tokens=10_000, max_items=30)
+    assert [len(p) for p in packs] == [30, 30, 30, 10]
+    assert sum(packs, []) == list(range(100))
+
+
+def test_parse_batch_response_tolerates_fences_and_gaps():
+    response = '```json\n[{"id": 1, "text": "a"}, {"id": 3, "text": "c"}, {"id": 9, "text": "x"}]\n```'
+    assert parse_batch_response(response, 3) == {1: "a", 3: "c"}
+    assert parse_batch_response("not json", 2) == {}
+    assert parse_batch_response('["a", "b"]', 2) == {1: "a", 2: "b"}
+
+
+def test_batch_endpoint_packs_and_splits():
+    result_cache.clear()
+    mock_service = ai_model_manager.get_service()
+    mock_service.text_completion.reset_mock()
+    original = mock_service.text_completion.side_effect
+    mock_service.text_completion.side_effect = _echo_batch
+    try:
+        segments = [f"第{i}条" for i in range(100)] + ["第0条", ""]
+        resp = client.post("/api/translate/batch", json={"segments": segments, "operation": "zh2en"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["translations"][:100] == [f"EN:第{i}条" for i in range(100)]
+        assert data["translations"][100] == "EN:第0条"
+        assert data["translations"][101] == ""
+        assert data["fallbacks"] == 0
+        assert mock_service.text_completion.await_count == data["packs"] < 10
+
+        # 再次请求全部命中缓存
+        resp = client.post("/api/translate/batch", json={"segments": segments[:5]})
+        assert resp.json()["cached"] == 5
+    finally:
+        mock_service.text_completion.side_effect = original
+
+
+def test_batch_failed_split_falls_back_per_segment():
+    result_cache.clear()
+    mock_service = ai_model_manager.get_service()
+    original = mock_service.text_completion.side_effect
+
+    def drop_second(prompt, **kwargs):
+        if "JSON 数组" in prompt:
+            return '[{"id": 1, "text": "one"}]'
+        return "single"
+
+    mock_service.text_completion.side_effect = drop_second
+    try:
+        resp = client.post("/api/translate/batch", json={"segments": ["一", "二"], "operation": "zh2en"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["translations"] == ["one", "single"]
+        assert data["fallbacks"] == 1
+    finally:
+        mock_service.text_completion.side_effect = original
+
+
+def test_long_fallback_segment_does_not_deadlock_on_model_semaphore(monkeypatch):
+    import app.services.chunking as chunking
+    from app.services.translate import TranslationService
+
+    result_cache.clear()
+    monkeypatch.setattr(chunking, "get_chunking_config", lambda: {
+        "concurrency_per_model": 1, "auto_threshold_tokens": 20, "max_chunk_tokens": 20,
+    })
+    mock_service = ai_model_manager.get_service()
+    original = mock_service.text_completion.side_effect
+
+    def fail_packs(prompt, **kwargs):
+        if "JSON 数组" in prompt:
+            return "not json"
+        return "EN"
+
+    mock_service.text_completion.side_effect = fail_packs
+    long_segment = "这是一段很长的中文句子。" * 6
+    try:
+        result = asyncio.run(asyncio.wait_for(
+            TranslationService().batch_translate(["短句", long_segment], use_cache=False), 5
+        ))
+    finally:
+        mock_service.text_completion.side_effect = original
+    assert result["translations"][0] == "EN"
+    assert result["translations"][1].count("EN") > 1
+
+
+def test_failed_fallback_segments_are_reported_without_dropping_others():
+    result_cache.clear()
+    mock_service = ai_model_manager.get_service()
+    original = mock_service.text_completion.side_effect
+
+    def partial(prompt, **kwargs):
+        if "JSON 数组" in prompt:
+            return '[{"id": 1, "text": "one"}]'
+        if "二" in prompt:
+            raise RuntimeError("upstream exploded")
+        return "Mock response for testing"
+
+    mock_service.text_completion.side_effect = partial
+    try:
+        resp = client.post(
+            "/api/translate/batch",
+            json={"segments": ["一", "二", "三", "二"], "operation": "auto_translate"},
+        )
+    finally:
+        mock_service.text_completion.side_effect = original
+    assert resp.status_code == 200
+    data = resp.json()
+    # 打包成功的条目保留；单独重译抛错或返回降级文本的条目为空并逐条报告
+    assert data["translations"] == ["one", "", "", ""]
+    assert [e["index"] for e in data["errors"]] == [1, 2, 3]
+    assert "upstream exploded" in data["errors"][0]["error"]
+    assert "failure response" in data["errors"][1]["error"]
@@ -0,0 +1,150 @@
+"""
+测试批量提交：一次创建整批任务、超出队列容量的条目逐步入队、作业汇总与分页结果
+"""
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.async_task_manager import AsyncTaskManager, TaskType
+from app.utils.exceptions import TaskQueueFullError
+
+
+def test_bulk_job_larger_than_queue_runs_every_item(fake_service, wait):
+    fake_service["delay"] = 0.001
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=2, max_queue_size=5)
+        items = [{"text": str(i)} for i in range(50)] + [{"text": "坏"}]
+        job = manager.create_bulk_job(TaskType.ZH2EN, items)
+        # 队列只容纳 5 个，其余等待入队
+        assert manager.get_queue_stats()["backlog"] == 46
+        await wait.job_done(manager, job.job_id, timeout=3.0)
+        first_page = manager.get_job(job.job_id, offset=0, limit=20)
+        last_page = manager.get_job(job.job_id, offset=40, limit=20)
+        stats = manager.get_queue_stats()
+        await manager.shutdown()
+        return job, first_page, last_page, stats
+
+    job, first_page, last_page, stats = asyncio.run(run())
+    assert first_page["total"] == 51
+    assert (first_page["completed"], first_page["failed"], first_page["progress"]) == (50, 1, 100.0)
+    assert [item["result"] for item in first_page["items"][:3]] == ["EN:0", "EN:1", "EN:2"]
+    assert first_page["next_offset"] == 20
+    assert last_page["next_offset"] is None
+    assert last_page["items"][-1] == {
+        "index": 50, "task_id": job.task_ids[50], "status": "failed", "progress": 0, "error": "bad input",
+    }
+    assert stats["backlog"] == 0
+
+
+def test_bulk_job_rejected_as_a_whole_when_backlog_is_full():
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=2, max_backlog_tasks=3)
+        with pytest.raises(TaskQueueFullError):
+            manager.create_bulk_job(TaskType.ZH2EN, [{"text": str(i)} for i in range(6)])
+        counts = manager.get_task_counts()["total"]
+        await manager.shutdown()
+        return counts
+
+    assert asyncio.run(run()) == 0
+
+
+def test_backlog_limit_counts_existing_backlog_once():
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=2, max_backlog_tasks=3)
+        manager.create_bulk_job(TaskType.ZH2EN, [{"text": str(i)} for i in range(4)])
+        # 现有 2 个待入队 + 新增 1 个，未超过上限 3
+        manager.create_bulk_job(TaskType.ZH2EN, [{"text": "新"}])
+        backlog = manager.get_queue_stats()["backlog"]
+        with pytest.raises(TaskQueueFullError):
+            manager.create_bulk_job(TaskType.ZH2EN, [{"text": "满"}])
+        await manager.shutdown()
+        return backlog
+
+    assert asyncio.run(run()) == 3
+
+
+def test_cancelling_running_item_counts_one_failure(fake_service, wait):
+    fake_service["delay"] = 10
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1)
+        job = manager.create_bulk_job(TaskType.ZH2EN, [{"text": "慢"}])
+        task_id = job.task_ids[0]
+        await wait.until(lambda: manager.store.get(task_id).status.value == "running", what="item to start")
+        assert manager.cancel_task(task_id)
+        await asyncio.sleep(0.05)
+        summary = manager.get_job(job.job_id, limit=1)
+        await manager.shutdown()
+        return summary
+
+    summary = asyncio.run(run())
+    assert (summary["failed"], summary["completed"], summary["done"]) == (1, 0, True)
+    assert summary["items"][0]["error"] == "Task cancelled by user"
+
+
+def test_bulk_endpoint_accepts_json_and_ndjson(monkeypatch):
+    import app.api.async_tasks.routes as routes
+    manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=10, max_bulk_items=3)
+    monkeypatch.setattr(routes, "task_manager", manager)
+    client = TestClient(app)
+
+    resp = client.post("/api/translate/async/bulk", json=["一", {"text": "二", "chunked": False}])
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["total"] == 2 and len(body["task_ids"]) == 2
+    assert manager.store.get(body["task_ids"][1]).input_data == {"text": "二", "chunked": False}
+
+    ndjson = '{"text": "长文一", "max_length": 50}\n{"text": "长文二"}\n'
+    resp = client.post(
+        "/api/translate/async/bulk?task_type=summarize",
+        content=ndjson.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    task_ids = resp.json()["task_ids"]
+    assert [manager.store.get(t).input_data["max_length"] for t in task_ids] == [50, 200]
+
+    job = client.get(resp.json()["job_url"], params={"limit": 1}).json()
+    assert job["total"] == 2 and len(job["items"]) == 1 and job["next_offset"] == 1
+
+    assert client.post("/api/translate/async/bulk", json=["a", "b", "c", "d"]).status_code == 400
+    assert client.post("/api/translate/async/bulk", json=["a", " "]).status_code == 400
+    assert client.post("/api/translate/async/bulk?task_type=nope", json=["a"]).status_code == 400
+    assert client.get("/api/translate/async/jobs/missing").status_code == 404
+
+
+@pytest.mark.parametrize("task_type,item,message", [
+    ("summarize", {"text": "a", "mode": "sideways"}, "Item 1: mode must be one of"),
+    ("summarize", {"text": "a", "max_length": "long"}, "Item 1: max_length must be a positive integer"),
+    ("structured_summary", {"text": "a", "max_length": 0}, "Item 1: max_length must be a positive integer"),
+    ("keyword_summary", {"text": "a", "summary_length": True}, "Item 1: summary_length must be a positive integer"),
+    ("zh2en", {"text": "a", "chunked": "yes"}, "Item 1: chunked must be a boolean"),
+])
+def test_bulk_endpoint_validates_item_parameters(monkeypatch, task_type, item, message):
+    import app.api.async_tasks.routes as routes
+    manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=10)
+    monkeypatch.setattr(routes, "task_manager", manager)
+    client = TestClient(app)
+
+    resp = client.post(f"/api/translate/async/bulk?task_type={task_type}", json=["ok", item])
+    assert resp.status_code == 400
+    assert message in resp.json()["error"]
+    # 整批拒绝，不创建任何任务
+    assert manager.store.counts()["by_status"] == {}
+
+
+def test_bulk_endpoint_coerces_summary_mode(monkeypatch):
+    import app.api.async_tasks.routes as routes
+    from app.schemas.translate import SummaryMode
+    manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=10)
+    monkeypatch.setattr(routes, "task_manager", manager)
+    client = TestClient(app)
+
+    resp = client.post(
+        "/api/translate/async/bulk?task_type=keyword_summary",
+        json=[{"text": "长文", "mode": "refine", "summary_length": 80}],
+    )
+    assert resp.status_code == 200
+    input_data = manager.store.get(resp.json()["task_ids"][0]).input_data
+    assert input_data == {"text": "长文", "summary_length": 80, "mode": SummaryMode.refine}
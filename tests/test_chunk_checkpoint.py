@@ -0,0 +1,198 @@
+"""
+测试分块检查点：已完成分块的结果随任务保存，重试时只重新处理失败的分块，进度按分块数报告
+"""
+import asyncio
+import pytest
+from app.services.async_task_manager import AsyncTaskManager, TaskStatus, TaskType
+from app.services.chunking import (
+    ChunkCheckpoint,
+    split_into_chunks,
+    summarize_map_reduce,
+    summarize_refine,
+    translate_chunked,
+    use_checkpoint,
+)
+from app.services.async_task_manager import is_retryable_error
+from app.services.task_store import SQLiteTaskStore
+from app.utils.exceptions import DegradedResponseError, NetworkError
+
+DOCUMENT = "\n\n".join(f"第{i}段内容，包含一些需要翻译的文字。这是第{i}段的第二句。" for i in range(8))
+
+
+def _flaky_translate(calls, fail_marker):
+    async def translate(text, context):
+        calls.append(text)
+        if fail_marker in text and calls.count(text) == 1:
+            raise NetworkError("connection reset")
+        return f"[{text}]"
+    return translate
+
+
+def test_retry_resends_only_failed_chunks():
+    chunks = split_into_chunks(DOCUMENT, max_tokens=30)
+    assert len(chunks) >= 4
+    calls = []
+    translate = _flaky_translate(calls, "第5段")
+    results = {}
+
+    async def attempt():
+        with use_checkpoint(ChunkCheckpoint(results)):
+            return await translate_chunked(DOCUMENT, translate, model_key="test-ckpt", max_chunk_tokens=30)
+
+    with pytest.raises(NetworkError):
+        asyncio.run(attempt())
+    first_attempt = len(calls)
+    assert len(results) == len(chunks) - 1
+
+    output = asyncio.run(attempt())
+    # 第二次只重新请求失败的那一块
+    assert len(calls) == first_attempt + 1
+    assert "第5段" in calls[-1]
+    assert output.count("[") == len(chunks)
+
+
+def test_refine_steps_resume_from_checkpoint():
+    text = "\n\n".join(f"第{i}部分。" * 20 for i in range(4))
+    seen = []
+    fail = {"armed": True}
+
+    async def summarize(part):
+        seen.append(part)
+        if len(seen) == 3 and fail["armed"]:
+            fail["armed"] = False
+            raise NetworkError("timeout")
+        return f"总结{len(seen)}"
+
+    results = {}
+
+    async def attempt():
+        with use_checkpoint(ChunkCheckpoint(results)):
+            return await summarize_refine(text, summarize, max_chunk_tokens=60)
+
+    with pytest.raises(NetworkError):
+        asyncio.run(attempt())
+    assert len(results) == 2
+    steps = len(split_into_chunks(text, 60))
+    asyncio.run(attempt())
+    # 前两步复用检查点，其余步骤各请求一次
+    assert len(seen) == 3 + (steps - 2)
+
+
+def test_map_reduce_progress_never_moves_backwards():
+    text = "\n\n".join(f"第{i}部分。" * 12 for i in range(16))
+    calls = []
+    ratios = []
+
+    async def summarize(part):
+        calls.append(part)
+        return f"第{len(calls)}个中间总结，内容较长以便需要多层归并。"
+
+    def on_update(cp):
+        if cp.total:
+            ratios.append(cp.done / cp.total)
+
+    async def run():
+        checkpoint = ChunkCheckpoint(on_update=on_update)
+        with use_checkpoint(checkpoint):
+            await summarize_map_reduce(text, summarize, lambda merged: asyncio.sleep(0, "final"),
+                                       model_key="test-mr-progress", max_chunk_tokens=60)
+        return checkpoint
+
+    checkpoint = asyncio.run(run())
+    chunks = [c for c in split_into_chunks(text, 60) if not c.is_blank]
+    # 至少经过两层归并，进度只增不减，最终总数收敛为实际调用数
+    assert len(calls) > len(chunks) + 2
+    assert ratios == sorted(ratios)
+    assert checkpoint.total == checkpoint.done == len(calls)
+    assert ratios[-1] == 1
+
+
+def test_degraded_chunk_response_fails_instead_of_being_reassembled(monkeypatch):
+    import app.services.chunking as chunking
+    from app.services.langchain_translate import LangChainTranslationService
+
+    monkeypatch.setattr(chunking, "get_chunking_config", lambda: {"max_chunk_tokens": 30, "auto_threshold_tokens": 30})
+    service = LangChainTranslationService(use_chains=False)
+    calls = []
+
+    async def generate_text(prompt, service_name=None, **kwargs):
+        calls.append(prompt)
+        if "第2段" in prompt and sum("第2段" in p for p in calls) == 1:
+            return "Text generation failed: Error code: 503 - upstream unavailable"
+        return "EN"
+
+    monkeypatch.setattr(service.langchain_manager, "generate_text", generate_text)
+    results = {}
+
+    async def attempt():
+        with use_checkpoint(ChunkCheckpoint(results)):
+            return await service.zh2en(DOCUMENT, use_cache=False)
+
+    with pytest.raises(DegradedResponseError) as excinfo:
+        asyncio.run(attempt())
+    assert is_retryable_error(excinfo.value)
+    assert "Text generation failed" not in "".join(results.values())
+    chunks = split_into_chunks(DOCUMENT, max_tokens=30)
+    assert len(results) == len(chunks) - 1
+
+    output = asyncio.run(attempt())
+    assert "failed" not in output and output.count("EN") == len(chunks)
+    assert len(calls) == len(chunks) + 1
+
+
+@pytest.fixture
+def chunked_service(monkeypatch):
+    state = {"calls": [], "progress": []}
+
+    class ChunkedLangChainService:
+        def __init__(self, model_name=None, use_chains=True):
+            pass
+
+        async def zh2en(self, text, **kwargs):
+            return await translate_chunked(
+                text, _flaky_translate(state["calls"], "第3段"), model_key="test-task-ckpt",
+                max_chunk_tokens=30, concurrency=1,
+            )
+
+    import app.services.langchain_translate as lct
+    monkeypatch.setattr(lct, "LangChainTranslationService", ChunkedLangChainService)
+    return state
+
+
+def test_task_retry_resumes_from_checkpoint_and_reports_chunk_progress(chunked_service, tmp_path):
+    store = SQLiteTaskStore(str(tmp_path / "tasks.db"), flush_interval=0.01)
+    seen_checkpoint = {}
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, store=store, retry_base_delay=0.01)
+        original = manager._on_chunk_progress
+
+        def spy(task, checkpoint):
+            original(task, checkpoint)
+            chunked_service["progress"].append(task.progress)
+            if task.checkpoint:
+                seen_checkpoint["persisted"] = store.get(task.task_id).checkpoint
+
+        manager._on_chunk_progress = spy
+        task_id = manager.create_task(TaskType.ZH2EN, {"text": DOCUMENT})
+        for _ in range(200):
+            if store.get(task_id).status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                break
+            await asyncio.sleep(0.01)
+        task = store.get(task_id)
+        await manager.shutdown()
+        return task
+
+    task = asyncio.run(run())
+    chunks = split_into_chunks(DOCUMENT, max_tokens=30)
+    calls = chunked_service["calls"]
+    assert task.status == TaskStatus.COMPLETED
+    assert task.retry_count == 1
+    # 每块只成功请求一次：失败块多请求一次，其余块在重试时来自检查点
+    assert len(calls) == len(chunks) + 1
+    assert task.result.count("[") == len(chunks)
+    assert task.progress == 100
+    assert task.checkpoint is None
+    assert seen_checkpoint["persisted"]
+    progress = chunked_service["progress"]
+    assert 0 < min(p for p in progress if p) < 99 and max(progress) <= 99
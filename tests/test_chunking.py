@@ -0,0 +1,186 @@
+"""
+测试长文档分块翻译
+"""
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.chunking import (
+    estimate_tokens,
+    split_into_chunks,
+    split_sentences,
+    reassemble,
+    translate_chunked,
+    summarize_map_reduce,
+    summarize_refine,
+    map_chunks,
+    TextChunk,
+)
+from app.services.translate import TranslationService
+from app.services.result_cache import result_cache
+from app.services.ai_model import ai_model_manager
+
+
+client = TestClient(app)
+
+DOCUMENT = ("第一段第一句。第二句比较长，包含逗号！\n\nHello world. This is English text. 混合内容。\n") * 40
+
+
+def test_split_respects_budget_and_roundtrips():
+    chunks = split_into_chunks(DOCUMENT, max_tokens=60)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c.text) <= 60 for c in chunks)
+    # 原样拼接即为原文（段落与换行保留）
+    assert reassemble(chunks, [c.text for c in chunks]) == DOCUMENT
+
+
+def test_split_sentences_mixed_languages():
+    assert split_sentences("你好。Hello world. How are you? 好！") == [
+        "你好。", "Hello world.", "How are you?", "好！"
+    ]
+
+
+def test_chunks_run_in_parallel_and_keep_order():
+    chunks = split_into_chunks(DOCUMENT, max_tokens=60)
+    active = []
+    peak = []
+
+    async def translate(text, context):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.05)
+        active.pop()
+        return text.upper()
+
+    start = time.monotonic()
+    result = asyncio.run(translate_chunked(
+        DOCUMENT, translate, model_key="test-parallel", max_chunk_tokens=60, concurrency=len(chunks)
+    ))
+    elapsed = time.monotonic() - start
+    assert elapsed < 0.05 * len(chunks) / 2
+    assert result.replace(" ", "") == DOCUMENT.upper().replace(" ", "")
+
+    peak.clear()
+    asyncio.run(translate_chunked(DOCUMENT, translate, model_key="test-limited", max_chunk_tokens=60, concurrency=2))
+    assert max(peak) <= 2
+
+
+def test_translation_service_chunks_long_text():
+    """长文本按分块分别调用模型，结果按顺序拼接"""
+    result_cache.clear()
+    mock_service = ai_model_manager.get_service()
+    mock_service.text_completion.reset_mock()
+
+    result = asyncio.run(TranslationService().zh2en(DOCUMENT, chunked=True, use_cache=False))
+    chunks = [c for c in split_into_chunks(DOCUMENT) if not c.is_blank]
+    assert len(chunks) > 1
+    assert mock_service.text_completion.await_count >= 1
+    assert result.count("Mocked translation") == len(chunks)
+
+
+def test_map_reduce_summary_tree_reduces_to_one_final_call():
+    text = "。".join(f"第{i}句内容比较充实，用于测试分层总结" for i in range(200)) + "。"
+    partial_calls = []
+    final_inputs = []
+
+    async def summarize(part):
+        partial_calls.append(part)
+        return "要点" * 10
+
+    async def finalize(merged):
+        final_inputs.append(merged)
+        return "最终总结"
+
+    result = asyncio.run(summarize_map_reduce(
+        text, summarize, finalize, model_key="test-mr", max_chunk_tokens=100
+    ))
+    chunk_count = len([c for c in split_into_chunks(text, 100) if not c.is_blank])
+    assert result == "最终总结"
+    assert len(final_inputs) == 1
+    # 分块总结之外还发生了至少一轮归并，最终输入不超过预算
+    assert len(partial_calls) > chunk_count
+    assert estimate_tokens(final_inputs[0]) <= 100
+
+
+def test_refine_summary_is_sequential():
+    text = "第一部分。" * 30 + "\n\n" + "第二部分。" * 30
+    seen = []
+
+    async def summarize(part):
+        seen.append(part)
+        return f"总结{len(seen)}"
+
+    result = asyncio.run(summarize_refine(text, summarize, max_chunk_tokens=100))
+    assert result == f"总结{len(seen)}"
+    assert len(seen) > 1
+    assert f"总结{len(seen) - 1}" in seen[-1]
+
+
+def test_summarize_endpoint_mode():
+    mock_service = ai_model_manager.get_service()
+    mock_service.text_completion.reset_mock()
+    resp = client.post(
+        "/api/translate/summarize?mode=map_reduce",
+        json={"text": DOCUMENT},
+        headers={"X-Cache-Bypass": "1"},
+    )
+    assert resp.status_code == 200
+    assert mock_service.text_completion.await_count > 1
+
+    resp = client.post("/api/translate/summarize?mode=unknown", json={"text": "短文本"})
+    assert resp.status_code == 422
+
+
+def test_failed_map_step_fails_the_whole_summary():
+    """某个分块总结失败时整体失败，错误提示不会混入中间总结"""
+    mock_service = ai_model_manager.get_service()
+    original = mock_service.text_completion.side_effect
+    text = "。".join(f"第{i}句内容比较充实，用于测试分层总结" for i in range(200)) + "。"
+    calls = []
+
+    def fail_one(prompt, **kwargs):
+        calls.append(prompt)
+        if len(calls) == 2:
+            raise RuntimeError("upstream unavailable")
+        return "要点"
+
+    mock_service.text_completion.side_effect = fail_one
+    try:
+        result = asyncio.run(TranslationService().summarize(text, mode="map_reduce", use_cache=False))
+    finally:
+        mock_service.text_completion.side_effect = original
+    assert result.startswith("Summarization failed:")
+    assert "upstream unavailable" in result
+    # 没有把错误提示作为中间总结送入归并
+    assert not any("Summarization failed" in prompt for prompt in calls)
+
+
+def test_first_failed_chunk_cancels_outstanding_siblings():
+    chunks = [TextChunk(index=i, text=f"chunk {i}") for i in range(4)]
+    cancelled = []
+
+    async def process(chunk):
+        if chunk.index == 1:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("chunk 1 failed")
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(chunk.index)
+            raise
+        return chunk.text
+
+    async def run():
+        start = time.monotonic()
+        try:
+            await map_chunks(chunks, process, model_key="test-cancel", concurrency=4)
+        except RuntimeError as e:
+            assert str(e) == "chunk 1 failed"
+        else:
+            raise AssertionError("map_chunks should raise")
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert elapsed < 1
+    # 其余仍在执行的分块已被取消并等待结束，不会在后台继续调用模型
+    assert sorted(cancelled) == [0, 2, 3]
@@ -0,0 +1,162 @@
+"""
+测试模型熔断器与故障转移
+"""
+import asyncio
+import httpx
+import pytest
+from app.services import circuit_breaker as cb
+from app.services.circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitState,
+    call_with_failover,
+    is_provider_failure,
+)
+from app.services.langchain_service import LangChainManager
+from app.utils.exceptions import CircuitOpenError, EmptyTextError, ModelAPIError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cb.time, "monotonic", fake.monotonic)
+    return fake
+
+
+def _breaker(**kwargs):
+    options = dict(window_size=4, min_calls=4, failure_rate_threshold=0.5, open_seconds=10, half_open_max_calls=2)
+    options.update(kwargs)
+    return CircuitBreaker("m", **options)
+
+
+def test_opens_on_error_rate_and_recovers_through_half_open(clock):
+    breaker = _breaker()
+    for ok in (True, False, True, False):
+        assert breaker.allow_request()
+        (breaker.record_success if ok else breaker.record_failure)(0.1)
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_after() == pytest.approx(10)
+
+    clock.now += 10
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.allow_request() and breaker.allow_request()
+    # 探测名额用尽
+    assert not breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _breaker(min_calls=1, window_size=1)
+    breaker.record_failure(0.1)
+    assert breaker.state == CircuitState.OPEN
+    clock.now += 10
+    assert breaker.allow_request()
+    breaker.record_failure(0.1)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.retry_after() == pytest.approx(10)
+
+
+def test_slow_calls_open_circuit(clock):
+    breaker = _breaker(slow_call_seconds=5, slow_call_rate_threshold=0.75)
+    for latency in (6, 7, 1, 8):
+        breaker.record_success(latency)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.get_stats()["slow_call_rate"] == 0.75
+
+
+def test_client_errors_do_not_count_as_provider_failures():
+    assert not is_provider_failure(EmptyTextError())
+    request = httpx.Request("POST", "http://x")
+    bad_request = httpx.HTTPStatusError("bad", request=request, response=httpx.Response(400, request=request))
+    throttled = httpx.HTTPStatusError("429", request=request, response=httpx.Response(429, request=request))
+    assert not is_provider_failure(bad_request)
+    assert is_provider_failure(throttled)
+    assert is_provider_failure(ModelAPIError("boom"))
+
+
+def test_failover_skips_open_circuit_without_calling_it():
+    registry = CircuitBreakerRegistry()
+    registry.get("primary")._open(cb.time.monotonic(), "test")
+    calls = []
+
+    async def invoke(name):
+        calls.append(name)
+        return f"result from {name}"
+
+    result = asyncio.run(call_with_failover(["primary", "backup"], invoke, registry=registry))
+    assert result == "result from backup"
+    assert calls == ["backup"]
+    assert registry.get("primary").get_stats()["rejected"] == 1
+
+
+def test_failover_on_error_and_all_open_fails_fast():
+    registry = CircuitBreakerRegistry()
+
+    async def invoke(name):
+        if name == "primary":
+            raise ModelAPIError("down", name)
+        return "ok"
+
+    assert asyncio.run(call_with_failover(["primary", "backup"], invoke, registry=registry)) == "ok"
+    assert registry.get("primary").get_stats()["failure_rate"] == 1.0
+
+    for name in ("primary", "backup"):
+        registry.get(name)._open(cb.time.monotonic(), "test")
+    with pytest.raises(CircuitOpenError) as exc_info:
+        asyncio.run(call_with_failover(["primary", "backup"], invoke, registry=registry))
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.details["models"] == ["primary", "backup"]
+    assert exc_info.value.details["retry_after"] >= 1
+
+
+def test_client_error_is_raised_without_failover():
+    registry = CircuitBreakerRegistry()
+    calls = []
+
+    async def invoke(name):
+        calls.append(name)
+        raise EmptyTextError()
+
+    with pytest.raises(EmptyTextError):
+        asyncio.run(call_with_failover(["primary", "backup"], invoke, registry=registry))
+    assert calls == ["primary"]
+
+
+def test_langchain_manager_fails_over_on_failure_response(monkeypatch):
+    monkeypatch.setattr(cb, "circuit_breakers", CircuitBreakerRegistry())
+
+    class FakeService:
+        def __init__(self, reply):
+            self.reply = reply
+            self.calls = 0
+
+        async def generate_text(self, prompt, **kwargs):
+            self.calls += 1
+            return self.reply
+
+    manager = LangChainManager()
+    manager.services = {}
+    dead = FakeService("Text generation failed: connection refused")
+    healthy = FakeService("translated")
+    manager.register_service("dead", dead)
+    manager.register_service("healthy", healthy)
+
+    async def run():
+        return [await manager.generate_text(f"prompt {i}", service_name="dead") for i in range(8)]
+
+    assert asyncio.run(run()) == ["translated"] * 8
+    # 熔断后不再调用故障模型
+    assert dead.calls == cb.get_circuit_breaker_config()["min_calls"]
+    assert healthy.calls == 8
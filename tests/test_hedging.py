@@ -0,0 +1,115 @@
+"""
+测试对冲请求：超过 p95 后向第二个后端发出副本，取先返回者并取消落败方
+"""
+import asyncio
+import contextvars
+import pytest
+from app.services.hedging import HedgingController, enter_route
+
+
+def _controller(**kwargs):
+    options = dict(enabled=True, budget_ratio=1.0, min_samples=5, min_delay_ms=1)
+    options.update(kwargs)
+    controller = HedgingController(**options)
+    for _ in range(10):
+        controller.observe("slow", 0.01)
+    return controller
+
+
+def _in_route(coro_fn, path="/api/translate/zh2en"):
+    """在同步接口作用域内运行"""
+    async def run():
+        enter_route(path)
+        return await coro_fn()
+    return asyncio.run(run())
+
+
+def test_hedge_wins_and_loser_is_cancelled():
+    controller = _controller()
+    state = {"cancelled": []}
+
+    async def backend(name, delay):
+        try:
+            await asyncio.sleep(delay)
+            return name
+        except asyncio.CancelledError:
+            state["cancelled"].append(name)
+            raise
+
+    async def attempt(names):
+        return await backend(names[0], 0.5 if names[0] == "slow" else 0.01)
+
+    result = _in_route(lambda: controller.run(["slow", "fast"], attempt))
+    assert result == "fast"
+    assert state["cancelled"] == ["slow"]
+    stats = controller.get_stats()
+    assert stats["hedges_sent"] == 1
+    assert stats["hedge_wins"] == 1
+    assert stats["hedge_win_rate"] == 1.0
+
+
+def test_fast_primary_is_not_hedged():
+    controller = _controller()
+    calls = []
+
+    async def attempt(names):
+        calls.append(names[0])
+        return names[0]
+
+    assert _in_route(lambda: controller.run(["slow", "fast"], attempt)) == "slow"
+    assert calls == ["slow"]
+    assert controller.get_stats()["hedges_sent"] == 0
+
+
+def test_budget_limits_extra_requests():
+    controller = _controller(budget_ratio=0.05)
+    calls = []
+
+    async def attempt(names):
+        calls.append(names[0])
+        await asyncio.sleep(0.05 if names[0] == "slow" else 0)
+        return names[0]
+
+    async def run_many():
+        return [await controller.run(["slow", "fast"], attempt) for _ in range(10)]
+
+    results = _in_route(run_many)
+    # 10 次请求只累积 0.5 次预算，不足以发出对冲
+    assert results == ["slow"] * 10
+    assert "fast" not in calls
+    stats = controller.get_stats()
+    assert stats["hedges_sent"] == 0
+    assert stats["budget_exhausted"] >= 1
+
+
+def test_no_hedging_outside_sync_routes_or_without_samples():
+    controller = _controller()
+    calls = []
+
+    async def attempt(names):
+        calls.append(names[0])
+        await asyncio.sleep(0.03)
+        return names[0]
+
+    # 异步任务等后台调用不在同步接口作用域内
+    ctx = contextvars.Context()
+    assert ctx.run(asyncio.run, controller.run(["slow", "fast"], attempt)) == "slow"
+    # 样本不足的模型不对冲
+    assert _in_route(lambda: controller.run(["cold", "fast"], attempt)) == "cold"
+    # 路由白名单
+    restricted = _controller(routes=["/api/translate/en2zh"])
+    assert _in_route(lambda: restricted.run(["slow", "fast"], attempt)) == "slow"
+    assert calls == ["slow", "cold", "slow"]
+
+
+def test_primary_result_used_when_hedge_fails():
+    controller = _controller()
+
+    async def attempt(names):
+        if names[0] == "fast":
+            raise RuntimeError("hedge backend down")
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    assert _in_route(lambda: controller.run(["slow", "fast"], attempt)) == "primary"
+    assert controller.get_stats()["primary_wins"] == 1
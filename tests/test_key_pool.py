@@ -0,0 +1,162 @@
+"""
+测试同一服务商的 API Key 池：按负载选择 Key、按 Key 限流与 429 冷却
+"""
+import asyncio
+import httpx
+import pytest
+from app.services import key_pool as kp
+from app.services import rate_limiter as rl
+from app.services.ai_model import AIModelFactory
+from app.services.key_pool import KeyPool, KeyPoolRegistry, normalize_model_config
+from app.services.langchain_service import BaseLangChainService
+from app.services.rate_limiter import RateLimiterRegistry
+from app.utils.exceptions import RateLimitError
+
+
+def test_normalize_accepts_lists():
+    config = normalize_model_config({"name": "m", "api_key": ["k1", "k2"], "base_url": "https://a"})
+    assert config["api_keys"] == ["k1", "k2"]
+    assert config["api_key"] == "k1"
+    assert config["base_url"] == "https://a"
+    assert normalize_model_config({"api_keys": ["k1"]})["api_key"] == "k1"
+
+
+def test_keys_and_urls_pair_cyclically():
+    pool = KeyPool("m", {"api_keys": ["k1", "k2", "k3"], "base_urls": ["https://a", "https://b"], "rpm": 5})
+    assert [(s.api_key, s.base_url) for s in pool.slots] == [
+        ("k1", "https://a"), ("k2", "https://b"), ("k3", "https://a"),
+    ]
+    assert pool.slots[1].limiter_config == {"name": "m#key1", "rpm": 5, "tpm": None}
+    # 单 Key 沿用模型级限流器
+    single = KeyPool("m", {"name": "m", "api_key": "k", "rpm": 5})
+    assert not single.pooled
+    assert single.slots[0].limiter_config["name"] == "m"
+
+
+def test_least_loaded_and_round_robin_selection():
+    pool = KeyPool("m", {"api_keys": ["k1", "k2"]})
+    with pool.use() as first:
+        with pool.use() as second:
+            assert {first.api_key, second.api_key} == {"k1", "k2"}
+    rr = KeyPool("m", {"api_keys": ["k1", "k2", "k3"], "key_strategy": "round_robin"})
+    picked = []
+    for _ in range(4):
+        with rr.use() as slot:
+            picked.append(slot.api_key)
+    assert picked == ["k1", "k2", "k3", "k1"]
+
+
+def test_rate_limited_key_cools_down():
+    pool = KeyPool("m", {"api_keys": ["k1", "k2"], "key_cooldown_seconds": 60})
+    pool.cool_down(pool.slots[0])
+    for _ in range(3):
+        with pool.use() as slot:
+            assert slot.api_key == "k2"
+    # 全部冷却时选最早恢复的 Key
+    pool.cool_down(pool.slots[1], retry_after=5)
+    with pool.use() as slot:
+        assert slot.api_key == "k2"
+    stats = pool.get_stats()["keys"]
+    assert stats[0]["rate_limited"] == 1
+    assert stats[0]["cooldown_remaining_seconds"] > 0
+
+
+@pytest.fixture
+def registries(monkeypatch):
+    import app.services.ai_model as ai_model
+    import app.services.langchain_service as langchain_service
+    pools, limiters = KeyPoolRegistry(), RateLimiterRegistry()
+    for module in (ai_model, langchain_service):
+        monkeypatch.setattr(module, "key_pools", pools)
+        monkeypatch.setattr(module, "rate_limiter_registry", limiters)
+    monkeypatch.setattr(kp, "key_pools", pools)
+    monkeypatch.setattr(rl, "rate_limiter_registry", limiters)
+    return pools, limiters
+
+
+def test_provider_rotates_keys_and_skips_rate_limited_one(registries):
+    pools, limiters = registries
+    seen = []
+
+    def handler(request):
+        key = request.headers["Authorization"].split()[-1]
+        seen.append((key, request.url.host))
+        if key == "k1":
+            return httpx.Response(429, headers={"Retry-After": "30"}, json={"error": "slow down"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": key}}]})
+
+    service = AIModelFactory.create_service("openai", {
+        "name": "gpt", "api_keys": ["k1", "k2"], "base_urls": ["https://a.test/v1", "https://b.test/v1"], "rpm": 60,
+    })
+    assert service.api_key == "k1"
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        with pytest.raises(RateLimitError):
+            await service.text_completion("hi")
+        results = [await service.text_completion("hi") for _ in range(3)]
+        await service.aclose()
+        return results
+
+    assert asyncio.run(run()) == ["k2"] * 3
+    assert seen == [("k1", "a.test")] + [("k2", "b.test")] * 3
+    stats = pools.get_stats()["gpt"]["keys"]
+    assert stats[0]["rate_limited"] == 1
+    assert stats[0]["cooldown_remaining_seconds"] > 25
+    assert limiters.get_stats()["gpt#key1"]["admitted"] == 3
+
+
+def test_selected_key_rebuilds_auth_header_only(registries):
+    seen = []
+
+    def handler(request):
+        seen.append(dict(request.headers))
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    # 默认 Key 恰好是其他请求头取值的一部分，不能按字符串替换
+    service = AIModelFactory.create_service("azure_openai", {
+        "name": "azure", "api_keys": ["app", "k2"], "key_strategy": "round_robin",
+        "endpoint": "https://azure.test", "deployment_name": "d",
+    })
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        for _ in range(2):
+            await service.text_completion("hi")
+        await service.aclose()
+
+    asyncio.run(run())
+    assert [h["api-key"] for h in seen] == ["app", "k2"]
+    assert all(h["content-type"] == "application/json" and "authorization" not in h for h in seen)
+
+
+def test_langchain_service_uses_client_of_selected_key(registries):
+    pools, _ = registries
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    class FakeLLM:
+        def __init__(self, name):
+            self.name = name
+
+        async def ainvoke(self, prompt):
+            if self.name == "k1":
+                raise RateLimited("429")
+            return self.name
+
+    service = BaseLangChainService({"name": "qwen", "api_keys": ["k1", "k2"]})
+    service.llms = [FakeLLM("k1"), FakeLLM("k2")]
+    service.llm = service.llms[0]
+
+    async def call():
+        async with service.use_llm("hi") as (llm, lease):
+            return await llm.ainvoke("hi")
+
+    async def run():
+        with pytest.raises(RateLimited):
+            await call()
+        return [await call() for _ in range(2)]
+
+    assert asyncio.run(run()) == ["k2", "k2"]
+    assert pools.get_stats()["qwen"]["keys"][0]["rate_limited"] == 1
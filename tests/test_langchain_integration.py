@@ -176,6 +176,35 @@ class TestLangChainServices:
         except Exception as e:
             pytest.fail(f"LangChain翻译服务创建失败: {e}")
 
+    def test_services_share_one_manager(self):
+        """测试翻译服务复用进程级共享的LangChain管理器"""
+        from app.services.langchain_service import langchain_manager
+        from app.services.langchain_translate import (
+            LangChainTranslationService,
+            get_shared_translation_service,
+        )
+        assert LangChainTranslationService().langchain_manager is langchain_manager
+        assert get_shared_translation_service() is get_shared_translation_service()
+
+    def test_model_override_is_call_argument(self, monkeypatch):
+        """测试按调用参数覆盖模型，不修改共享实例"""
+        import asyncio
+        from app.services.langchain_translate import get_shared_translation_service
+
+        service = get_shared_translation_service()
+        calls = []
+
+        async def fake_generate_text(prompt, service_name=None, **kwargs):
+            calls.append(service_name)
+            return "ok"
+
+        monkeypatch.setattr(service, "use_chains", False)
+        monkeypatch.setattr(service.langchain_manager, "generate_text", fake_generate_text)
+        result = asyncio.run(service.zh2en("你好", model_name="other-model"))
+        assert result == "ok"
+        assert calls == ["other-model"]
+        assert service.model_name is None
+
 
 class TestLangChainSchemas:
     """LangChain相关Schema测试"""
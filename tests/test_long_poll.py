@@ -0,0 +1,63 @@
+"""
+测试长轮询获取任务结果：任务结束即返回，未结束则等待到超时
+"""
+import asyncio
+import time
+import pytest
+from app.services.async_task_manager import AsyncTaskManager, TaskStatus, TaskType
+
+
+@pytest.fixture
+def gated_service(fake_service):
+    fake_service["delay"] = 0.2
+    return fake_service
+
+
+def test_wait_returns_as_soon_as_task_completes(gated_service):
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1)
+        task_id = manager.create_task(TaskType.ZH2EN, {"text": "一"})
+        started = time.monotonic()
+        results = await asyncio.gather(
+            manager.wait_for_result(task_id, 5), manager.wait_for_result(task_id, 5)
+        )
+        elapsed = time.monotonic() - started
+        pending_events = len(manager._completion_events)
+        await manager.shutdown()
+        return results, elapsed, pending_events
+
+    results, elapsed, pending_events = asyncio.run(run())
+    assert all(r["status"] == TaskStatus.COMPLETED and r["result"] == "EN:一" for r in results)
+    assert 0.15 <= elapsed < 1
+    assert pending_events == 0
+
+
+def test_wait_times_out_with_current_status(gated_service):
+    gated_service["delay"] = 1
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1)
+        task_id = manager.create_task(TaskType.ZH2EN, {"text": "一"})
+        started = time.monotonic()
+        result = await manager.wait_for_result(task_id, 0.1)
+        elapsed = time.monotonic() - started
+        # 取消同样会唤醒等待者
+        waiter = asyncio.ensure_future(manager.wait_for_result(task_id, 5))
+        await asyncio.sleep(0.01)
+        manager.cancel_task(task_id)
+        cancelled = await asyncio.wait_for(waiter, 1)
+        await manager.shutdown()
+        return result, elapsed, cancelled
+
+    result, elapsed, cancelled = asyncio.run(run())
+    assert result["status"] in (TaskStatus.PENDING, TaskStatus.RUNNING)
+    assert 0.1 <= elapsed < 0.5
+    assert cancelled["status"] == TaskStatus.FAILED
+
+
+def test_wait_for_unknown_task_returns_none():
+    async def run():
+        manager = AsyncTaskManager()
+        return await manager.wait_for_result("missing", 1)
+
+    assert asyncio.run(run()) is None
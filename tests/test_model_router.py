@@ -0,0 +1,88 @@
+"""
+测试路由组内按 EWMA 延迟 × 在途请求数选择后端
+"""
+import asyncio
+import pytest
+from app.services import model_router as mr
+from app.services.ai_model import AIModelManager
+from app.services.circuit_breaker import CircuitBreakerRegistry
+from app.services.model_router import ModelRouter
+
+
+def test_prefers_lower_latency_backend():
+    router = ModelRouter({"qwen": ["a", "b"]}, ewma_alpha=0.5)
+    router._backend("a").observe(2.0, router.ewma_alpha)
+    router._backend("b").observe(0.5, router.ewma_alpha)
+    assert router.rank("qwen") == ["b", "a"]
+    # EWMA 平滑：b 变慢后逐渐让位给 a
+    router._backend("b").observe(5.0, router.ewma_alpha)
+    assert router._backend("b").ewma_latency == pytest.approx(2.75)
+    assert router.rank("qwen") == ["a", "b"]
+
+
+def test_in_flight_requests_spread_load():
+    router = ModelRouter({"qwen": ["a", "b"]})
+    router._backend("a").observe(1.0, 1)
+    router._backend("b").observe(1.5, 1)
+    assert router.rank("qwen")[0] == "a"
+    router._backend("a").in_flight = 1  # 得分 2.0 > 1.5
+    assert router.rank("qwen")[0] == "b"
+
+
+def test_unavailable_backends_sorted_last_and_unknown_group_passthrough():
+    router = ModelRouter({"qwen": ["a", "b"]})
+    router._backend("a").observe(0.1, 1)
+    assert router.rank("qwen", available=lambda name: name != "a") == ["b", "a"]
+    assert router.candidates("qwen", ["a", "b", "other"]) == ["a", "b", "other"]
+    assert router.candidates("plain", ["plain", "other"]) == ["plain", "other"]
+    assert router.candidates("qwen", ["other"]) == []
+
+
+def test_measure_tracks_in_flight_latency_and_errors():
+    router = ModelRouter({"qwen": ["a"]})
+
+    async def run():
+        async def ok():
+            assert router._backend("a").in_flight == 1
+            return "done"
+
+        async def boom():
+            raise RuntimeError("down")
+
+        assert await router.measure("a", ok) == "done"
+        with pytest.raises(RuntimeError):
+            await router.measure("a", boom)
+
+    asyncio.run(run())
+    backend = router.get_stats()["qwen"]["backends"][0]
+    assert backend["in_flight"] == 0
+    assert backend["requests"] == 2
+    assert backend["errors"] == 1
+    assert backend["ewma_latency_ms"] is not None
+
+
+def test_manager_routes_group_to_fastest_backend(monkeypatch):
+    router = ModelRouter({"qwen": ["slow", "fast"]})
+    router._backend("slow").observe(3.0, 1)
+    router._backend("fast").observe(0.2, 1)
+    import app.services.ai_model as ai_model
+    import app.services.circuit_breaker as cb
+    monkeypatch.setattr(ai_model, "model_router", router)
+    monkeypatch.setattr(cb, "circuit_breakers", CircuitBreakerRegistry())
+
+    class Backend:
+        def __init__(self, name):
+            self.name = name
+
+        async def text_completion(self, prompt, **kwargs):
+            return self.name
+
+    manager = AIModelManager()
+    manager._services = {"slow": Backend("slow"), "fast": Backend("fast")}
+    manager._default_service = "slow"
+    monkeypatch.setattr(AIModelManager, "_service_for", lambda self, name: self._services[name])
+
+    assert manager.resolve_service_name("qwen") == "qwen"
+    assert manager.failover_candidates("qwen") == ["fast", "slow"]
+    assert asyncio.run(manager.text_completion("hi", service_name="qwen")) == "fast"
+    assert router._backend("fast").requests == 1
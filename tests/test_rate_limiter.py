@@ -0,0 +1,120 @@
+"""
+测试按模型的 RPM/TPM 令牌桶限流
+"""
+import asyncio
+import httpx
+import pytest
+from app.services import rate_limiter as rl
+from app.services.ai_model import OpenAIService
+from app.services.rate_limiter import (
+    ModelRateLimiter,
+    RateLimiterRegistry,
+    TokenBucket,
+    estimate_request_tokens,
+    extract_usage,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rl.time, "monotonic", fake.monotonic)
+    return fake
+
+
+def test_token_bucket_waits_in_arrival_order(clock):
+    bucket = TokenBucket(per_minute=60)  # 1/s，容量 60
+    assert bucket.reserve(60) == 0
+    # 额度耗尽后，后到者等待时间依次递增
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)
+    clock.now += 2
+    assert bucket.available == pytest.approx(0.0)
+
+
+def test_oversized_request_waits_instead_of_failing(clock):
+    bucket = TokenBucket(per_minute=600)  # 10/s
+    assert bucket.reserve(900) == pytest.approx(30.0)
+
+
+def test_settle_refunds_overestimate(clock):
+    limiter = ModelRateLimiter("m", tpm=1000)
+    asyncio.run(limiter.acquire(800))
+    assert limiter.tokens.available == pytest.approx(200)
+    limiter.settle(800, 300)
+    assert limiter.tokens.available == pytest.approx(700)
+    # 实际用量超出估算时追加扣减
+    limiter.settle(100, 400)
+    assert limiter.tokens.available == pytest.approx(400)
+
+
+def test_cancelled_waiter_returns_quota(clock):
+    limiter = ModelRateLimiter("m", rpm=1)
+
+    async def run():
+        await limiter.acquire(1)
+        waiter = asyncio.ensure_future(limiter.acquire(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(run())
+    assert limiter.requests.available == pytest.approx(0.0)
+    assert limiter.get_stats()["waiting"] == 0
+
+
+def test_registry_shares_limiter_by_model_name():
+    registry = RateLimiterRegistry()
+    first = registry.for_config({"name": "qwen", "rpm": 10})
+    second = registry.for_config({"name": "qwen", "rpm": 10, "service_type": "dashscope"})
+    assert first is second
+    assert registry.for_config({"name": "unlimited"}) is None
+    assert set(registry.get_stats()) == {"qwen"}
+
+
+def test_extract_usage_formats():
+    assert extract_usage({"usage": {"total_tokens": 42}}) == 42
+    assert extract_usage({"usage": {"input_tokens": 10, "output_tokens": 5}}) == 15
+    assert extract_usage({"prompt_eval_count": 3, "eval_count": 4}) == 7
+    assert extract_usage({"choices": []}) is None
+
+    class Message:
+        usage_metadata = {"input_tokens": 1, "output_tokens": 2, "total_tokens": 3}
+
+    assert extract_usage(Message()) == 3
+    assert estimate_request_tokens("你好世界", max_tokens=2) == 6
+
+
+def test_provider_calls_share_budget_and_use_reported_usage(monkeypatch):
+    monkeypatch.setattr(rl, "rate_limiter_registry", RateLimiterRegistry())
+    import app.services.ai_model as ai_model
+    monkeypatch.setattr(ai_model, "rate_limiter_registry", rl.rate_limiter_registry)
+
+    def handler(request):
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "ok"}}],
+            "usage": {"total_tokens": 20},
+        })
+
+    service = OpenAIService({"name": "gpt", "api_key": "k", "rpm": 60, "tpm": 10000})
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        results = await asyncio.gather(*(service.text_completion("hello world") for _ in range(3)))
+        await service.aclose()
+        return results
+
+    assert asyncio.run(run()) == ["ok"] * 3
+    stats = rl.rate_limiter_registry.get_stats()["gpt"]
+    assert stats["admitted"] == 3
+    assert stats["actual_tokens"] == 60
+    assert stats["delayed"] == 0
@@ -0,0 +1,93 @@
+"""
+测试翻译/总结结果缓存
+"""
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.result_cache import ResultCache, result_cache
+from app.services.ai_model import ai_model_manager
+
+
+client = TestClient(app)
+
+
+def test_key_is_content_addressed():
+    """相同操作/模型/参数/规范化文本得到相同键，任一不同则键不同"""
+    key = ResultCache.make_key("zh2en", "dashscope", "  你好\r\n世界 ")
+    assert key == ResultCache.make_key("zh2en", "dashscope", "你好\n世界")
+    assert key != ResultCache.make_key("en2zh", "dashscope", "你好\n世界")
+    assert key != ResultCache.make_key("zh2en", "openai", "你好\n世界")
+    assert (
+        ResultCache.make_key("summarize", None, "text", {"max_length": 100})
+        != ResultCache.make_key("summarize", None, "text", {"max_length": 200})
+    )
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = ResultCache(max_entries=2, max_bytes=10_000)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a 变为最近使用
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get_stats()["evictions"] == 1
+
+    small = ResultCache(max_entries=100, max_bytes=15)
+    small.set("k1", "x" * 8)
+    small.set("k2", "y" * 8)
+    assert small.get("k1") is None
+    assert small.get_stats()["bytes"] <= 15
+
+
+def test_ttl_expiry():
+    cache = ResultCache(ttl_seconds=60)
+    cache.set("short", "v", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_get_or_compute_skips_failures_and_bypass():
+    cache = ResultCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return "result"
+
+    async def run():
+        await cache.get_or_compute("zh2en", "m", "t", compute)
+        await cache.get_or_compute("zh2en", "m", "t", compute)
+        assert len(calls) == 1
+        await cache.get_or_compute("zh2en", "m", "t", compute, use_cache=False)
+        assert len(calls) == 2
+        await cache.get_or_compute("en2zh", "m", "t", compute, cacheable=lambda r: False)
+        await cache.get_or_compute("en2zh", "m", "t", compute, cacheable=lambda r: False)
+        assert len(calls) == 4
+
+    asyncio.run(run())
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["bypasses"] == 1
+
+
+def test_repeat_request_served_from_cache():
+    """重复请求不再调用模型；带绕过请求头时强制调用"""
+    result_cache.clear()
+    mock_service = ai_model_manager.get_service()
+    mock_service.text_completion.reset_mock()
+    payload = {"text": "缓存测试文本-独一无二"}
+
+    assert client.post("/api/translate/zh2en", json=payload).status_code == 200
+    assert client.post("/api/translate/zh2en", json=payload).status_code == 200
+    assert mock_service.text_completion.await_count == 1
+
+    resp = client.post("/api/translate/zh2en", json=payload, headers={"X-Cache-Bypass": "1"})
+    assert resp.status_code == 200
+    assert mock_service.text_completion.await_count == 2
+
+    stats = client.get("/api/translate/cache/stats").json()
+    assert stats["hits"] >= 1
+    assert "evictions" in stats
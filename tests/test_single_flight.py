@@ -0,0 +1,145 @@
+"""
+测试相同请求的并发合并（single-flight）
+"""
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight, make_flight_key
+from app.services.translate import TranslationService
+from app.services.result_cache import result_cache
+from app.services.ai_model import ai_model_manager
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        key = make_flight_key("zh2en", "m", "你好")
+        results = await asyncio.gather(*[flight.do(key, upstream) for _ in range(5)])
+        assert results == ["result"] * 5
+        # 调用结束后不再合并
+        assert await flight.do(key, upstream) == "result"
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert flight.get_stats()["coalesced"] == 4
+    assert flight.in_flight() == 0
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight("test")
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        key = make_flight_key("k")
+        first = asyncio.create_task(flight.do(key, upstream))
+        second = asyncio.create_task(flight.do(key, upstream))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "done"
+        assert first.cancelled()
+
+    asyncio.run(run())
+
+
+def test_errors_propagate_to_all_waiters():
+    flight = SingleFlight("test")
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        key = make_flight_key("err")
+        results = await asyncio.gather(
+            flight.do(key, upstream), flight.do(key, upstream), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(run())
+
+
+def test_translation_service_coalesces_concurrent_requests():
+    """并发的相同翻译请求只调用一次模型"""
+    result_cache.clear()
+    mock_service = ai_model_manager.get_service()
+    mock_service.text_completion.reset_mock()
+    original = mock_service.text_completion.side_effect
+
+    async def slow_completion(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return "Hello"
+
+    mock_service.text_completion.side_effect = slow_completion
+    try:
+        service = TranslationService()
+
+        async def run():
+            return await asyncio.gather(
+                *[service.zh2en("合并测试文本-独一无二", use_cache=False) for _ in range(3)]
+            )
+
+        assert asyncio.run(run()) == ["Hello"] * 3
+        assert mock_service.text_completion.await_count == 1
+    finally:
+        mock_service.text_completion.side_effect = original
+
+
+def test_last_cancelled_waiter_cancels_shared_call():
+    flight = SingleFlight("test")
+    state = {"cancelled": False}
+
+    async def upstream():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def run():
+        waiter = asyncio.create_task(flight.do(make_flight_key("lonely"), upstream))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        assert flight.in_flight() == 0
+
+    asyncio.run(run())
+    assert state["cancelled"]
+
+
+def test_join_after_last_waiter_cancelled_starts_new_call():
+    flight = SingleFlight("test")
+    key = make_flight_key("rejoin")
+    calls = []
+
+    async def upstream():
+        calls.append(len(calls))
+        try:
+            await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            # 模拟取消时的清理（如关闭连接）需要一些时间
+            await asyncio.sleep(0.01)
+            raise
+        return f"result-{len(calls)}"
+
+    async def run():
+        waiter = asyncio.create_task(flight.do(key, upstream))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # 被取消的共享调用尚未结束时加入的新调用方发起新的调用，而不是收到取消
+        return await flight.do(key, upstream)
+
+    assert asyncio.run(run()) == "result-2"
+    assert len(calls) == 2
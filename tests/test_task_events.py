@@ -0,0 +1,73 @@
+"""
+测试多任务事件订阅：按任务投递、进度合并、结束事件与 SSE 输出
+"""
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.async_task_manager import AsyncTaskManager, TaskType
+from app.services.task_events import TaskEventHub
+
+
+def test_hub_delivers_only_to_watchers_and_coalesces():
+    async def run():
+        hub = TaskEventHub()
+        a = hub.subscribe(["t1", "t2"])
+        b = hub.subscribe(["t2"])
+        hub.publish({"event": "status", "task_id": "t1", "progress": 10})
+        hub.publish({"event": "status", "task_id": "t1", "progress": 30})
+        hub.publish({"event": "completed", "task_id": "t2"})
+        hub.publish({"event": "status", "task_id": "t3"})
+        first = await a.next_events(0.1)
+        second = await b.next_events(0.1)
+        empty = await b.next_events(0.01)
+        return hub, a, b, first, second, empty
+
+    hub, a, b, first, second, empty = asyncio.run(run())
+    # 同一任务只保留最新事件
+    assert first == [{"event": "status", "task_id": "t1", "progress": 30}, {"event": "completed", "task_id": "t2"}]
+    assert second == [{"event": "completed", "task_id": "t2"}]
+    assert empty == [] and b.done and not a.done
+    # 结束事件后任务索引已移除
+    assert hub.get_stats()["watched_tasks"] == 1
+    hub.unsubscribe(a)
+    hub.unsubscribe(b)
+    assert hub.get_stats() == {"subscriptions": 0, "watched_tasks": 0, "published_events": 3}
+
+
+def test_manager_streams_status_and_completion_for_many_tasks(fake_service):
+    fake_service["delay"] = 0.05
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=4)
+        ids = [manager.create_task(TaskType.ZH2EN, {"text": t}) for t in ["一", "二", "坏"]]
+        subscription = manager.subscribe(ids + ["missing"])
+        received = []
+        while not subscription.done:
+            received.extend(await asyncio.wait_for(subscription.next_events(1), 2))
+        stats = manager.get_queue_stats()["events"]
+        manager.events.unsubscribe(subscription)
+        await manager.shutdown()
+        return ids, received, stats
+
+    ids, received, stats = asyncio.run(run())
+    final = {}
+    for event in received:
+        final[event["task_id"]] = event
+    assert final[ids[0]]["event"] == "completed" and final[ids[0]]["result"] == "EN:一"
+    assert final[ids[1]]["result"] == "EN:二"
+    assert final[ids[2]]["event"] == "failed"
+    assert final["missing"]["event"] == "not_found"
+    assert stats["subscriptions"] == 1
+
+
+def test_events_endpoint_uses_sse_framing():
+    client = TestClient(app)
+    with client.stream("GET", "/api/translate/async/events", params={"ids": "missing-1,missing-2"}) as resp:
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        body = "".join(resp.iter_text())
+    frames = [f for f in body.split("\n\n") if f]
+    assert [f.split("\n")[0] for f in frames] == ["event: not_found", "event: not_found", "event: end"]
+    assert json.loads(frames[0].split("data: ", 1)[1]) == {"event": "not_found", "task_id": "missing-1"}
+    assert client.post("/api/translate/async/events", json={"task_ids": []}).status_code == 422
@@ -0,0 +1,91 @@
+"""
+测试任务过期：到期时间堆按时删除、失败任务更短的保留期与按 LRU 的保留上限
+"""
+import asyncio
+import pytest
+from app.services.async_task_manager import AsyncTaskManager, TaskStatus, TaskType
+
+SECOND = 1 / 3600  # 以小时为单位的 TTL 参数中的一秒
+
+
+pytestmark = pytest.mark.usefixtures("fake_service")
+
+
+def test_tasks_are_deleted_at_their_deadline(wait):
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=2, task_ttl_hours=0.3 * SECOND)
+        first = manager.create_task(TaskType.ZH2EN, {"text": "一"})
+        await asyncio.sleep(0.15)
+        second = manager.create_task(TaskType.ZH2EN, {"text": "二"})
+        await wait.tasks_done(manager, [first, second])
+        await asyncio.sleep(0.25)
+        # 第一个任务已到期删除，第二个尚未到期
+        assert manager.get_task_status(first) is None
+        assert manager.get_task_status(second)["status"] == TaskStatus.COMPLETED
+        await asyncio.sleep(0.2)
+        stats = manager.get_queue_stats()
+        await manager.shutdown()
+        return manager, second, stats
+
+    manager, second, stats = asyncio.run(run())
+    assert manager.get_task_status(second) is None
+    assert stats["expired_tasks"] == 2
+    assert stats["retained_tasks"] == 0
+    assert manager._expiry_heap == []
+
+
+def test_failed_tasks_use_shorter_ttl(wait):
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=2, task_ttl_hours=1, failed_task_ttl_hours=0.2 * SECOND)
+        ok = manager.create_task(TaskType.ZH2EN, {"text": "好"})
+        bad = manager.create_task(TaskType.ZH2EN, {"text": "坏"})
+        await wait.tasks_done(manager, [ok, bad])
+        assert manager.get_task_status(bad)["status"] == TaskStatus.FAILED
+        await asyncio.sleep(0.35)
+        result = manager.get_task_status(ok), manager.get_task_status(bad)
+        await manager.shutdown()
+        return result
+
+    ok_status, bad_status = asyncio.run(run())
+    assert ok_status["status"] == TaskStatus.COMPLETED
+    assert bad_status is None
+
+
+def test_retention_cap_evicts_least_recently_used_finished_tasks(wait):
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_retained_tasks=3)
+        ids = []
+        for text in ["一", "二", "三"]:
+            ids.append(manager.create_task(TaskType.ZH2EN, {"text": text}))
+            await wait.tasks_done(manager, ids)
+        # 访问最早的任务，使其成为最近使用
+        assert manager.get_task_result(ids[0])["result"] == "EN:一"
+        for text in ["四", "五"]:
+            ids.append(manager.create_task(TaskType.ZH2EN, {"text": text}))
+            await wait.tasks_done(manager, ids[-1:])
+        retained = [i for i in ids if manager.get_task_status(i) is not None]
+        stats = manager.get_queue_stats()
+        await manager.shutdown()
+        return ids, retained, stats
+
+    ids, retained, stats = asyncio.run(run())
+    assert retained == [ids[0], ids[3], ids[4]]
+    assert stats["evicted_tasks"] == 2
+    assert stats["retained_tasks"] == 3
+
+
+def test_retention_cap_never_evicts_unfinished_tasks(wait):
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=10, max_retained_tasks=1)
+        # 同步创建的任务都尚未执行，不受上限淘汰
+        pending = [manager.create_task(TaskType.ZH2EN, {"text": str(i)}) for i in range(3)]
+        assert all(manager.store.get(i) is not None for i in pending)
+        await wait.tasks_done(manager, pending[-1:])
+        await asyncio.sleep(0.01)
+        stats = manager.get_queue_stats()
+        await manager.shutdown()
+        return pending, stats
+
+    pending, stats = asyncio.run(run())
+    assert stats["retained_tasks"] == 1
+    assert stats["evicted_tasks"] == 2
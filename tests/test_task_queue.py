@@ -0,0 +1,82 @@
+"""
+测试异步任务的有界队列与固定 worker 池
+"""
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.async_task_manager import AsyncTaskManager, TaskStatus, TaskType, task_manager
+from app.utils.exceptions import TaskQueueFullError
+
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def slow_service(monkeypatch):
+    state = {"active": 0, "peak": 0}
+
+    class SlowLangChainService:
+        def __init__(self, model_name=None, use_chains=True):
+            pass
+
+        async def zh2en(self, text, **kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.02)
+            state["active"] -= 1
+            return f"EN:{text}"
+
+    import app.services.langchain_translate as lct
+    monkeypatch.setattr(lct, "LangChainTranslationService", SlowLangChainService)
+    return state
+
+
+def test_fixed_workers_bound_concurrency(slow_service):
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=2, max_queue_size=10)
+        ids = [manager.create_task(TaskType.ZH2EN, {"text": f"文本{i}"}) for i in range(6)]
+        assert manager.queue_depth() == 6
+        for _ in range(100):
+            if all(manager.get_task_status(i)["status"] == TaskStatus.COMPLETED for i in ids):
+                break
+            await asyncio.sleep(0.01)
+        stats = manager.get_queue_stats()
+        await manager.shutdown()
+        return ids, manager, stats
+
+    ids, manager, stats = asyncio.run(run())
+    assert slow_service["peak"] == 2
+    assert [manager.get_task_result(i)["result"] for i in ids] == [f"EN:文本{i}" for i in range(6)]
+    assert stats["queue_depth"] == 0
+    assert stats["queue_wait_ms_max"] > 0
+
+
+def test_full_queue_rejects_with_retry_after(slow_service):
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=2)
+        manager.create_task(TaskType.ZH2EN, {"text": "一"})
+        manager.create_task(TaskType.ZH2EN, {"text": "二"})
+        with pytest.raises(TaskQueueFullError) as exc_info:
+            manager.create_task(TaskType.ZH2EN, {"text": "三"})
+        await manager.shutdown()
+        return exc_info.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert error.details["retry_after"] >= 1
+
+
+def test_submit_endpoint_returns_429_when_full(monkeypatch):
+    monkeypatch.setattr(task_manager, "max_queue_size", 0)
+    resp = client.post("/api/translate/async/zh2en", json={"text": "你好"})
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+
+    resp = client.post("/api/translate/async/summarize", json={"text": "你好"})
+    assert resp.status_code == 429
+
+
+def test_stats_expose_queue():
+    stats = client.get("/api/translate/async/stats").json()
+    assert {"queue_depth", "queue_capacity", "queue_wait_ms_avg"} <= set(stats["queue"])
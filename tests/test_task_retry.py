@@ -0,0 +1,153 @@
+"""
+测试异步任务的延迟重试：失败任务释放 worker，按退避或 Retry-After 重新入队
+"""
+import asyncio
+import httpx
+import pytest
+from app.services.async_task_manager import (
+    AsyncTaskManager,
+    TaskStatus,
+    TaskType,
+    error_retry_after,
+    is_retryable_error,
+)
+from app.utils.exceptions import (
+    InvalidRequestError,
+    NetworkError,
+    RateLimitError,
+    TimeoutError as CustomTimeoutError,
+)
+
+
+@pytest.fixture
+def flaky_service(fake_service):
+    # 每条原文只在第一次调用时失败，重试即成功
+    fake_service["fail_times"] = 1
+    return fake_service
+
+
+def test_retry_releases_worker_and_honors_retry_after(flaky_service, wait):
+    flaky_service["failures"]["一"] = RateLimitError("slow down", retry_after=0.2)
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=10)
+        first = manager.create_task(TaskType.ZH2EN, {"text": "一"})
+        second = manager.create_task(TaskType.ZH2EN, {"text": "二"})
+        await asyncio.sleep(0.1)
+        # 第一个任务等待重试期间，唯一的 worker 已执行完第二个任务
+        assert manager.get_task_status(second)["status"] == TaskStatus.COMPLETED
+        assert manager.get_task_status(first)["status"] == TaskStatus.PENDING
+        assert manager.get_queue_stats()["delayed_retries"] == 1
+        await wait.tasks_done(manager, [first])
+        await manager.shutdown()
+        return manager, first
+
+    manager, first = asyncio.run(run())
+    assert flaky_service["calls"] == ["一", "二", "一"]
+    result = manager.get_task_status(first)
+    assert result["status"] == TaskStatus.COMPLETED
+    assert result["retry_count"] == 1
+
+
+def test_non_retryable_error_fails_immediately(flaky_service, wait):
+    flaky_service["failures"]["坏"] = InvalidRequestError("connection field is invalid")
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=10)
+        task_id = manager.create_task(TaskType.ZH2EN, {"text": "坏"})
+        await wait.tasks_done(manager, [task_id])
+        await manager.shutdown()
+        return manager.get_task_status(task_id)
+
+    status = asyncio.run(run())
+    assert status["status"] == TaskStatus.FAILED
+    assert status["retry_count"] == 0
+
+
+def test_cancel_stops_pending_retry(flaky_service):
+    flaky_service["failures"]["一"] = NetworkError("down")
+
+    async def run():
+        manager = AsyncTaskManager(max_concurrent_tasks=1, max_queue_size=10, retry_base_delay=5)
+        task_id = manager.create_task(TaskType.ZH2EN, {"text": "一"})
+        await asyncio.sleep(0.05)
+        assert manager.cancel_task(task_id)
+        stats = manager.get_queue_stats()
+        await manager.shutdown()
+        return stats
+
+    assert asyncio.run(run())["delayed_retries"] == 0
+    assert flaky_service["calls"] == ["一"]
+
+
+def test_retry_classification_uses_exception_types():
+    assert is_retryable_error(RateLimitError())
+    assert is_retryable_error(CustomTimeoutError())
+    assert is_retryable_error(httpx.ConnectError("refused"))
+    request = httpx.Request("POST", "https://example.test")
+    unavailable = httpx.HTTPStatusError(
+        "503", request=request, response=httpx.Response(503, request=request, headers={"Retry-After": "7"})
+    )
+    assert is_retryable_error(unavailable)
+    assert error_retry_after(unavailable) == 7
+    bad_request = httpx.HTTPStatusError("400", request=request, response=httpx.Response(400, request=request))
+    assert not is_retryable_error(bad_request)
+    # 错误信息中含 "timeout" 等字样不再决定是否重试
+    assert not is_retryable_error(ValueError("timeout value must be positive"))
+
+
+def test_langchain_provider_errors_keep_their_retry_classification(monkeypatch):
+    import app.services.circuit_breaker as cb
+    import app.services.langchain_service as ls
+    from app.services.circuit_breaker import CircuitBreakerRegistry
+    from app.services.langchain_service import BaseLangChainService, LangChainManager
+
+    monkeypatch.setattr(cb, "circuit_breakers", CircuitBreakerRegistry())
+    request = httpx.Request("POST", "https://example.test")
+    errors = {
+        "limited": httpx.HTTPStatusError(
+            "429", request=request, response=httpx.Response(429, request=request, headers={"Retry-After": "3"})
+        ),
+        "slow": httpx.ReadTimeout("read timed out", request=request),
+        "rejected": httpx.HTTPStatusError("400", request=request, response=httpx.Response(400, request=request)),
+    }
+
+    class FailingLLM:
+        def __init__(self, error):
+            self.error = error
+
+        async def ainvoke(self, prompt):
+            raise self.error
+
+    monkeypatch.setattr(ls, "LANGCHAIN_AVAILABLE", True)
+
+    def raised(name):
+        manager = LangChainManager()
+        manager.services = {}
+        service = BaseLangChainService({"name": f"retry-{name}", "model": f"retry-{name}", "service_type": "none"})
+        service.llm = FailingLLM(errors[name])
+        service.llms = [service.llm]
+        manager.register_service(name, service)
+        with pytest.raises(Exception) as excinfo:
+            asyncio.run(manager.generate_text("你好", service_name=name))
+        return excinfo.value
+
+    limited = raised("limited")
+    assert isinstance(limited, RateLimitError) and error_retry_after(limited) == 3
+    assert isinstance(raised("slow"), CustomTimeoutError)
+    rejected = raised("rejected")
+    assert isinstance(rejected, InvalidRequestError) and not is_retryable_error(rejected)
+
+
+def test_backoff_grows_with_jitter_and_cap():
+    manager = AsyncTaskManager(retry_base_delay=1, retry_max_delay=8)
+
+    class Task:
+        retry_count = 0
+
+    task = Task()
+    for retry_count, upper in [(1, 1), (2, 2), (3, 4), (6, 8)]:
+        task.retry_count = retry_count
+        delays = [manager._retry_delay(task, NetworkError()) for _ in range(20)]
+        assert all(upper / 2 <= d <= upper for d in delays)
+    assert 3 <= manager._retry_delay(task, RateLimitError(retry_after=3)) <= 4
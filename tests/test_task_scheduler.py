@@ -0,0 +1,125 @@
+"""
+测试异步任务调度策略（fifo / priority / sjf）
+"""
+import asyncio
+import pytest
+from app.services import task_scheduler
+from app.services.async_task_manager import AsyncTaskManager, TaskStatus, TaskType
+from app.services.task_scheduler import (
+    FifoTaskQueue,
+    PriorityTaskQueue,
+    ShortestJobFirstTaskQueue,
+    create_task_queue,
+)
+
+
+def _drain(queue):
+    return [queue.get_nowait() for _ in range(queue.qsize())]
+
+
+def test_fifo_keeps_submission_order():
+    async def run():
+        queue = create_task_queue("fifo")
+        for item in [("a", 5, 900), ("b", 0, 10), ("c", 9, 1)]:
+            queue.put_nowait(item)
+        return queue, _drain(queue)
+
+    queue, order = asyncio.run(run())
+    assert isinstance(queue, FifoTaskQueue)
+    assert order == ["a", "b", "c"]
+
+
+def test_priority_orders_by_priority_then_submission():
+    async def run():
+        queue = create_task_queue("priority")
+        for item in [("low", -1, 0), ("a", 0, 0), ("high", 5, 0), ("b", 0, 0)]:
+            queue.put_nowait(item)
+        return queue, _drain(queue)
+
+    queue, order = asyncio.run(run())
+    assert isinstance(queue, PriorityTaskQueue)
+    assert order == ["high", "a", "b", "low"]
+
+
+def test_sjf_runs_short_jobs_first():
+    async def run():
+        queue = create_task_queue("sjf", config={"sjf_aging_tokens_per_second": 0})
+        for item in [("long", 0, 5000), ("short", 0, 10), ("medium", 0, 300)]:
+            queue.put_nowait(item)
+        return queue, _drain(queue)
+
+    queue, order = asyncio.run(run())
+    assert isinstance(queue, ShortestJobFirstTaskQueue)
+    assert order == ["short", "medium", "long"]
+
+
+def test_sjf_aging_prevents_starvation(monkeypatch):
+    now = {"t": 1000.0}
+    monkeypatch.setattr(task_scheduler.time, "monotonic", lambda: now["t"])
+
+    async def run():
+        queue = create_task_queue("sjf", config={"sjf_aging_tokens_per_second": 100})
+        queue.put_nowait(("long", 0, 2000))
+        # 大任务已等待 30 秒，老化量（3000）超过代价差
+        now["t"] += 30
+        queue.put_nowait(("short", 0, 10))
+        return _drain(queue)
+
+    assert asyncio.run(run()) == ["long", "short"]
+
+
+def test_unknown_policy_falls_back_to_fifo():
+    async def run():
+        return create_task_queue("lottery", maxsize=3)
+
+    queue = asyncio.run(run())
+    assert isinstance(queue, FifoTaskQueue)
+    assert queue.maxsize == 3
+
+
+@pytest.fixture
+def recording_service(monkeypatch):
+    order = []
+
+    class RecordingLangChainService:
+        def __init__(self, model_name=None, use_chains=True):
+            pass
+
+        async def zh2en(self, text, **kwargs):
+            order.append(text)
+            await asyncio.sleep(0)
+            return text
+
+    import app.services.langchain_translate as lct
+    monkeypatch.setattr(lct, "LangChainTranslationService", RecordingLangChainService)
+    return order
+
+
+@pytest.mark.parametrize("scheduling, expected", [
+    ("fifo", ["长" * 400, "中" * 50, "短"]),
+    ("priority", ["短", "中" * 50, "长" * 400]),
+    ("sjf", ["短", "中" * 50, "长" * 400]),
+])
+def test_manager_dispatches_by_policy(recording_service, scheduling, expected):
+    async def run():
+        manager = AsyncTaskManager(
+            max_concurrent_tasks=1,
+            scheduling=scheduling,
+            scheduling_options={"sjf_aging_tokens_per_second": 0},
+        )
+        ids = [
+            manager.create_task(TaskType.ZH2EN, {"text": "长" * 400}, priority=-1),
+            manager.create_task(TaskType.ZH2EN, {"text": "中" * 50}, priority=0),
+            manager.create_task(TaskType.ZH2EN, {"text": "短"}, priority=3),
+        ]
+        for _ in range(100):
+            if all(manager.get_task_status(i)["status"] == TaskStatus.COMPLETED for i in ids):
+                break
+            await asyncio.sleep(0.01)
+        stats = manager.get_queue_stats()
+        await manager.shutdown()
+        return stats
+
+    stats = asyncio.run(run())
+    assert recording_service == expected
+    assert stats["scheduling"] == scheduling
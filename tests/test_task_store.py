@@ -0,0 +1,274 @@
+"""
+测试异步任务存储（内存 / SQLite）
+"""
+import asyncio
+from datetime import datetime, timedelta
+from app.services.async_task_manager import AsyncTaskManager, TaskInfo, TaskStatus, TaskType
+from app.services.task_store import InMemoryTaskStore, SQLiteTaskStore, create_task_store
+
+
+def _task(task_id: str, status: TaskStatus = TaskStatus.PENDING, age_hours: float = 0) -> TaskInfo:
+    created = datetime.now() - timedelta(hours=age_hours)
+    return TaskInfo(
+        task_id=task_id,
+        task_type=TaskType.ZH2EN,
+        status=status,
+        created_at=created,
+        updated_at=created,
+        input_data={"text": "你好", "chunked": None},
+    )
+
+
+def test_sqlite_store_persists_across_reopen(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(path, flush_interval=10)
+    store.save(_task("a"))
+    # 未落盘前本进程可读到缓冲中的最新写入
+    assert store.get("a").status == TaskStatus.PENDING
+    done = _task("b", TaskStatus.COMPLETED, age_hours=1)
+    done.result = "Hello"
+    store.save(done)
+    store.close()
+
+    reopened = SQLiteTaskStore(path)
+    assert reopened.get("b").result == "Hello"
+    assert reopened.get("a").input_data == {"text": "你好", "chunked": None}
+    assert [t.task_id for t in reopened.list()] == ["a", "b"]
+    assert [t.task_id for t in reopened.list(TaskStatus.COMPLETED)] == ["b"]
+    journal = reopened._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal.lower() == "wal"
+    reopened.close()
+
+
+def test_claim_is_exclusive_across_connections(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    worker_a = SQLiteTaskStore(path)
+    worker_b = SQLiteTaskStore(path)
+    worker_a.save(_task("shared"))
+    assert worker_a.claim("shared") is True
+    assert worker_b.claim("shared") is False
+    assert worker_b.get("shared").status == TaskStatus.RUNNING
+    worker_a.close()
+    worker_b.close()
+
+    memory = InMemoryTaskStore()
+    memory.save(_task("m"))
+    assert memory.claim("m") is True
+    assert memory.claim("m") is False
+
+
+def test_stale_buffered_row_does_not_override_other_worker(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    worker_a = SQLiteTaskStore(path, flush_interval=10)
+    worker_b = SQLiteTaskStore(path, flush_interval=10)
+    worker_a.save(_task("shared"))
+    worker_a.flush()
+    # worker_a 还有一条未落盘的 pending 写入，期间 worker_b 认领并完成了任务
+    worker_a.save(_task("shared"))
+    assert worker_b.claim("shared") is True
+    done = worker_b.get("shared")
+    done.status = TaskStatus.COMPLETED
+    done.result = "Hello"
+    worker_b.save(done)
+    worker_b.flush()
+
+    assert worker_a.claim("shared") is False
+    worker_a.save(_task("shared"))
+    worker_a.flush()
+    assert worker_b.get("shared").status == TaskStatus.COMPLETED
+
+    # 认领后重试写回 pending（retry_count 增加）仍然生效
+    worker_b.save(_task("retry"))
+    worker_b.flush()
+    assert worker_a.claim("retry") is True
+    retry = worker_a.get("retry")
+    retry.status = TaskStatus.PENDING
+    retry.retry_count = 1
+    worker_a.save(retry)
+    worker_a.flush()
+    assert worker_b.claim("retry") is True
+    worker_a.close()
+    worker_b.close()
+
+
+def test_sqlite_store_adds_priority_column_to_old_schema(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "tasks.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE tasks (task_id TEXT PRIMARY KEY, task_type TEXT NOT NULL, status TEXT NOT NULL, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL, input_data TEXT NOT NULL, result TEXT, "
+        "error_message TEXT, progress INTEGER NOT NULL DEFAULT 0, model_name TEXT, "
+        "use_chains INTEGER NOT NULL DEFAULT 1, retry_count INTEGER NOT NULL DEFAULT 0, "
+        "max_retries INTEGER NOT NULL DEFAULT 3)"
+    )
+    conn.execute(
+        "INSERT INTO tasks (task_id, task_type, status, created_at, updated_at, input_data) "
+        "VALUES ('old', 'zh2en', 'pending', 0, 0, '{}')"
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteTaskStore(path)
+    assert store.get("old").priority == 0
+    task = _task("new")
+    task.priority = 7
+    store.save(task)
+    store.flush()
+    assert store.get("new").priority == 7
+    store.close()
+
+
+def test_delete_created_before(tmp_path):
+    for store in (InMemoryTaskStore(), SQLiteTaskStore(str(tmp_path / "tasks.db"))):
+        store.save(_task("old", age_hours=48))
+        store.save(_task("new"))
+        assert store.delete_created_before(datetime.now() - timedelta(hours=24)) == ["old"]
+        assert store.get("old") is None
+        assert store.get("new") is not None
+        store.close()
+
+
+def test_pending_tasks_requeued_on_startup(tmp_path, fake_service, wait):
+    path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(path)
+    store.save(_task("left-over"))
+    store.close()
+
+    async def run():
+        manager = AsyncTaskManager(store=create_task_store({"store": "sqlite", "sqlite_path": path}))
+        assert await manager.startup() == 1
+        await wait.tasks_done(manager, ["left-over"])
+        await manager.shutdown()
+
+    asyncio.run(run())
+    reopened = SQLiteTaskStore(path)
+    task = reopened.get("left-over")
+    assert task.status == TaskStatus.COMPLETED
+    assert task.result == "EN:你好"
+    reopened.close()
+
+
+def test_stale_running_tasks_recovered_on_startup(tmp_path, fake_service, wait):
+    path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(path)
+    # 进程崩溃遗留的 running 任务：可重试的重新入队，重试次数用尽的标记失败
+    store.save(_task("crashed", TaskStatus.RUNNING, age_hours=1))
+    exhausted = _task("exhausted", TaskStatus.RUNNING, age_hours=1)
+    exhausted.retry_count = exhausted.max_retries
+    store.save(exhausted)
+    # 租约未过期的 running 任务仍由其他 worker 执行
+    store.save(_task("live", TaskStatus.RUNNING))
+    store.close()
+
+    async def run():
+        manager = AsyncTaskManager(
+            store=create_task_store({"store": "sqlite", "sqlite_path": path}), running_lease_seconds=60
+        )
+        assert await manager.startup() == 1
+        await wait.tasks_done(manager, ["crashed"])
+        await manager.shutdown()
+
+    asyncio.run(run())
+    reopened = SQLiteTaskStore(path)
+    crashed = reopened.get("crashed")
+    assert crashed.status == TaskStatus.COMPLETED
+    assert crashed.result == "EN:你好"
+    assert crashed.retry_count == 1
+    exhausted = reopened.get("exhausted")
+    assert exhausted.status == TaskStatus.FAILED
+    assert "interrupted" in exhausted.error_message
+    assert reopened.get("live").status == TaskStatus.RUNNING
+    reopened.close()
+
+
+def test_query_pages_by_cursor_with_filters(tmp_path):
+    for store in (InMemoryTaskStore(), SQLiteTaskStore(str(tmp_path / "tasks.db"))):
+        for i in range(7):
+            task = _task(f"t{i}", TaskStatus.COMPLETED if i % 2 else TaskStatus.PENDING, age_hours=7 - i)
+            if i == 6:
+                task.task_type = TaskType.SUMMARIZE
+            store.save(task)
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = store.query(limit=3, cursor=cursor)
+            seen.extend(t.task_id for t in page)
+            if cursor is None:
+                break
+        assert seen == [f"t{i}" for i in range(6, -1, -1)]
+
+        page, cursor = store.query(status=TaskStatus.COMPLETED, limit=2)
+        assert [t.task_id for t in page] == ["t5", "t3"]
+        page, cursor = store.query(status=TaskStatus.COMPLETED, limit=2, cursor=cursor)
+        assert [t.task_id for t in page] == ["t1"] and cursor is None
+        page, _ = store.query(status=TaskStatus.PENDING, task_type=TaskType.ZH2EN)
+        assert [t.task_id for t in page] == ["t4", "t2", "t0"]
+        store.close()
+
+
+def test_counts_follow_state_changes(tmp_path):
+    for store in (InMemoryTaskStore(), SQLiteTaskStore(str(tmp_path / "tasks.db"))):
+        for task_id in ("a", "b", "c"):
+            store.save(_task(task_id))
+        assert store.claim("a")
+        done = store.get("b")
+        done.status = TaskStatus.COMPLETED
+        store.save(done)
+        store.delete("c")
+        counts = store.counts()
+        assert counts["by_status"] == {"running": 1, "completed": 1}
+        assert counts["by_type"] == {"zh2en": 2}
+        assert [t.task_id for t in store.list(TaskStatus.RUNNING)] == ["a"]
+        store.close()
+
+
+def test_tasks_endpoint_projects_fields_and_paginates(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.async_task_manager import task_manager
+
+    store = InMemoryTaskStore()
+    for i in range(3):
+        task = _task(f"api{i}", TaskStatus.COMPLETED, age_hours=3 - i)
+        task.result = "很长的结果"
+        store.save(task)
+    monkeypatch.setattr(task_manager, "store", store)
+    client = TestClient(app)
+
+    body = client.get("/api/translate/async/tasks", params={"limit": 2}).json()
+    assert [t["task_id"] for t in body["tasks"]] == ["api2", "api1"]
+    assert "result" not in body["tasks"][0] and "input_data" not in body["tasks"][0]
+    body = client.get(
+        "/api/translate/async/tasks", params={"cursor": body["next_cursor"], "fields": "task_id,result"}
+    ).json()
+    assert body["tasks"] == [{"task_id": "api0", "result": "很长的结果"}]
+    assert body["next_cursor"] is None
+    assert client.get("/api/translate/async/tasks", params={"fields": "secret"}).status_code == 400
+    assert client.get("/api/translate/async/tasks", params={"cursor": "%%%"}).status_code == 400
+
+    stats = client.get("/api/translate/async/stats").json()
+    assert stats["total_tasks"] == 3
+    assert stats["by_status"] == {"completed": 3}
+
+
+def test_task_record_is_compact_and_compresses_large_bodies(monkeypatch):
+    monkeypatch.setattr(TaskInfo, "compress_threshold", 64)
+    task = _task("c")
+    assert not hasattr(task, "__dict__")
+    assert isinstance(task._created_ts, float)
+    assert abs(task.created_at.timestamp() - task.created_ts) < 1e-5
+
+    long_text = "这是一段需要压缩保存的长文本。" * 50
+    task.input_data = {"text": long_text, "chunked": True}
+    task.result = "A long translated result. " * 50
+    assert isinstance(task._input_data, bytes) and isinstance(task._result, bytes)
+    assert len(task._result) < len(task.result)
+    assert task.input_data == {"text": long_text, "chunked": True}
+    # 列表投影不包含正文时不解压
+    assert "result" not in task.to_dict(["task_id", "status"])
+
+    short = _task("s")
+    short.result = "Hello"
+    assert short._result == "Hello"
+    assert short.to_dict()["created_at"] == short.created_at.isoformat()
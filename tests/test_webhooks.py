@@ -0,0 +1,181 @@
+"""
+测试任务完成/失败 Webhook：后台投递、重试退避、HMAC 签名与死信日志
+使用本地 asyncio HTTP 服务作为接收方
+"""
+import asyncio
+import json
+import pytest
+from app.services.async_task_manager import AsyncTaskManager, TaskType
+from app.services.webhook_dispatcher import WebhookDispatcher, sign_payload
+
+
+class LocalReceiver:
+    """最小的本地 HTTP 接收方：按预设状态码依次响应，并记录收到的请求"""
+
+    def __init__(self, statuses=None):
+        self.statuses = list(statuses or [])
+        self.requests = []
+        self.connections = 0
+        self._server = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def url(self, path="/hook"):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode().split("\r\n")
+                headers = {k.lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests.append((lines[0], headers, body))
+                status = self.statuses.pop(0) if self.statuses else 200
+                writer.write(f"HTTP/1.1 {status} X\r\ncontent-length: 0\r\n\r\n".encode())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def test_success_and_failure_webhooks_are_signed_and_pooled(fake_service):
+    dispatcher = WebhookDispatcher(max_concurrency=2, secret="s3cret", dead_letter_path=None, allow_private_hosts=True)
+
+    async def run():
+        async with LocalReceiver() as receiver:
+            manager = AsyncTaskManager(max_concurrent_tasks=2, webhook_dispatcher=dispatcher)
+            hooks = {"success": receiver.url("/ok"), "failure": receiver.url("/fail")}
+            ids = [manager.create_task(TaskType.ZH2EN, {"text": t}, webhooks=hooks) for t in ["一", "二", "坏"]]
+            await asyncio.sleep(0.1)
+            assert await dispatcher.wait_idle(2)
+            await manager.shutdown()
+            await dispatcher.shutdown()
+            return ids, receiver
+
+    ids, receiver = asyncio.run(run())
+    assert len(receiver.requests) == 3
+    # 连接池复用连接，不为每次投递新建连接
+    assert receiver.connections <= 2
+    by_task = {}
+    for request_line, headers, body in receiver.requests:
+        expected = sign_payload("s3cret", headers["x-webhook-timestamp"], body)
+        assert headers["x-webhook-signature"] == expected
+        payload = json.loads(body)
+        by_task[payload["task_id"]] = (request_line, payload)
+    assert by_task[ids[0]][0].startswith("POST /ok")
+    assert by_task[ids[0]][1]["event"] == "task.completed"
+    assert by_task[ids[0]][1]["result"] == "EN:一"
+    assert by_task[ids[2]][0].startswith("POST /fail")
+    assert by_task[ids[2]][1]["error_message"] == "bad input"
+    assert dispatcher.get_stats()["delivered"] == 3
+
+
+def test_retries_with_backoff_then_delivers():
+    dispatcher = WebhookDispatcher(retry_base_delay=0.02, max_attempts=4, dead_letter_path=None, allow_private_hosts=True)
+
+    async def run():
+        async with LocalReceiver(statuses=[503, 429]) as receiver:
+            dispatcher.submit(receiver.url(), "task.completed", {"task_id": "t1"})
+            assert await dispatcher.wait_idle(2)
+            await dispatcher.shutdown()
+            return receiver
+
+    receiver = asyncio.run(run())
+    assert [h["x-webhook-attempt"] for _, h, _ in receiver.requests] == ["1", "2", "3"]
+    # 每次重试的 delivery_id 相同，便于接收方去重
+    assert len({h["x-webhook-id"] for _, h, _ in receiver.requests}) == 1
+    stats = dispatcher.get_stats()
+    assert stats["delivered"] == 1 and stats["retries"] == 2 and stats["dead_lettered"] == 0
+
+
+def test_exhausted_or_rejected_deliveries_go_to_dead_letter(tmp_path):
+    path = tmp_path / "dead.jsonl"
+    dispatcher = WebhookDispatcher(retry_base_delay=0.01, max_attempts=2, dead_letter_path=str(path), allow_private_hosts=True)
+
+    async def run():
+        async with LocalReceiver(statuses=[500, 500, 400, 302]) as receiver:
+            dispatcher.submit(receiver.url(), "task.completed", {"task_id": "t1"})
+            assert await dispatcher.wait_idle(2)
+            # 4xx（非 408/429）不重试
+            dispatcher.submit(receiver.url(), "task.failed", {"task_id": "t2"})
+            assert await dispatcher.wait_idle(2)
+            # 不跟随重定向
+            dispatcher.submit(receiver.url(), "task.failed", {"task_id": "t3"})
+            assert await dispatcher.wait_idle(2)
+            await dispatcher.shutdown()
+            return receiver
+
+    receiver = asyncio.run(run())
+    assert len(receiver.requests) == 4
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(r["payload"]["task_id"], r["attempts"], r["last_error"]) for r in records] == [
+        ("t1", 2, "HTTP 500"), ("t2", 1, "HTTP 400"), ("t3", 1, "HTTP 302"),
+    ]
+    assert dispatcher.get_stats()["dead_lettered"] == 3
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.10/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://0.0.0.0/hook",
+    "ftp://example.com/hook",
+    "http:///hook",
+])
+def test_private_and_malformed_targets_are_rejected(url):
+    dispatcher = WebhookDispatcher(dead_letter_path=None)
+    with pytest.raises(ValueError):
+        asyncio.run(dispatcher.validate_url(url))
+
+
+def test_allowed_hosts_restrict_targets():
+    dispatcher = WebhookDispatcher(dead_letter_path=None, allowed_hosts=["hooks.internal"])
+    asyncio.run(dispatcher.validate_url("https://hooks.internal/cb"))
+    with pytest.raises(ValueError):
+        asyncio.run(dispatcher.validate_url("https://93.184.216.34/cb"))
+    asyncio.run(WebhookDispatcher(dead_letter_path=None).validate_url("https://93.184.216.34/cb"))
+
+
+def test_blocked_target_is_dead_lettered_without_a_request():
+    dispatcher = WebhookDispatcher(dead_letter_path=None)
+
+    async def run():
+        async with LocalReceiver() as receiver:
+            dispatcher.submit(receiver.url(), "task.completed", {"task_id": "t1"})
+            assert await dispatcher.wait_idle(2)
+            await dispatcher.shutdown()
+            return receiver
+
+    receiver = asyncio.run(run())
+    assert receiver.requests == []
+    stats = dispatcher.get_stats()
+    assert stats["dead_lettered"] == 1
+    assert stats["recent_dead_letters"][0]["last_error"].startswith("Blocked:")
+
+
+def test_submit_endpoint_rejects_metadata_webhook():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    resp = client.post(
+        "/api/translate/async/en2zh",
+        params={"success_webhook_url": "http://169.254.169.254/latest/meta-data/"},
+        json={"text": "hello"},
+    )
+    assert resp.status_code == 400
+    assert "non-public" in resp.json()["error"]